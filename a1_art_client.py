@@ -1,6 +1,8 @@
 import requests
 import os
 import logging
+from key_pool import key_pools
+from rate_limit import observe_rate_limit
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +12,8 @@ class A1ArtClient:
             self.api_keys = [api_keys]
         else:
             self.api_keys = [k for k in api_keys if k]
+        # Requests rotate across the keys; a rate-limited key cools down for its Retry-After
+        self.key_pool = key_pools.pool("a1_art", self.api_keys)
         self.model = model
         # Base URL for A1.art image generation
         self.base_url = "https://a1.art/open-api/v1/a1/images/generate"
@@ -17,7 +21,7 @@ class A1ArtClient:
     def generate_image(self, prompt):
         """
         Generates an image/logo from a prompt using A1.art API.
-        Tries all available API keys.
+        Tries each API key that is not cooling down.
         Returns the image URL or None.
         """
         if not self.api_keys:
@@ -38,7 +42,8 @@ class A1ArtClient:
             "height": 1024
         }
 
-        for api_key in self.api_keys:
+        keys = self.key_pool.available_keys()
+        for api_key in keys:
             try:
                 headers = {
                     "apiKey": api_key,
@@ -47,9 +52,15 @@ class A1ArtClient:
                 
                 logger.info(f"🎨 A1.art Request with key {api_key[:8]}... : {enhanced_prompt}")
                 response = requests.post(self.base_url, headers=headers, json=payload, timeout=60)
+                throttled = observe_rate_limit(response, self.key_pool, api_key) is not None
                 
+                if throttled:
+                    logger.warning(f"✗ A1.art rate limit hit for key {api_key[:8]}. Trying next key...")
+                    continue
                 if response.status_code != 200:
                     logger.error(f"✗ A1.art API error ({response.status_code}) with key {api_key[:8]}: {response.text}")
+                    if response.status_code in (401, 403):
+                        self.key_pool.disable(api_key)
                     continue # Try next key
                     
                 data = response.json()
@@ -81,4 +92,6 @@ class A1ArtClient:
                 logger.error(f"✗ A1.art key {api_key[:8]} critical error: {e}")
                 continue # Try next key
 
+        if not keys:
+            logger.error("A1.art API keys are all rate limited.")
         return None
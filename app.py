@@ -2,50 +2,41 @@ from dotenv import load_dotenv
 import os
 load_dotenv()
 
-from flask import Flask, render_template, request, jsonify, send_from_directory, redirect, send_file
+from flask import Flask, render_template, request, jsonify, send_from_directory, redirect, send_file, Response, stream_with_context, g
+from werkzeug.utils import secure_filename
+from urllib.parse import urlparse
 from flask_cors import CORS
 import json
 import requests
-import io
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
-from gemini_client import GeminiClient
-from openrouter_client import OpenRouterClient
+import time
 from system_control import SystemControl
 from weather_service import WeatherService
 from news_service import NewsService
-from imagen_client import ImagenClient
-from stability_client import StabilityClient
 from crypto_service import CryptoService
 from stock_service import StockService
-from runway_client import RunwayClient
-from freepik_client import FreepikClient
-from huggingface_client import HuggingFaceClient
-from veo_client import VeoClient
 from youtube_service import YouTubeService
-from kling_client import KlingClient
-from replicate_client import ReplicateClient
-from github_client import GitHubClient
-from clipdrop_client import ClipDropClient
-from deepai_client import DeepAIClient
-from picsart_client import PicsartClient
-from picwish_client import PicWishClient
-from groq_client import GroqClient
-from comet_client import CometClient
-from a1_art_client import A1ArtClient
-from pollinations_client import PollinationsClient
-from logo_dev_client import LogoDevClient
-from chutes_client import ChutesClient
-from ollama_client import OllamaClient
-from bytez_client import BytezClient
-from search_engine_client import search_client
 from wikipedia_client import WikipediaClient
 from nasa_client import NASAClient
 from emoji_service import emoji_service
 from google_sheets_service import sheets_service
 from google_docs_history_service import docs_history_service
 from qr_service import qr_service
-import razorpay
+from media_proxy import media_proxy
+from blob_store import blob_store, sniff_upload_type, UnsupportedType
+from image_pipeline import enhance_pipeline, LOCAL_PROVIDER
+from local_upscaler import local_upscaler
+from prefetch_scheduler import prefetch_scheduler
+from ticker_index import ticker_index
+from city_gazetteer import city_gazetteer
+from provider_registry import providers
+from key_pool import key_pools
+from rate_limit import RateLimited
+from metrics import metrics, http_requests, http_latency, record_tier, record_provider
+from text_pipeline import (detect_command, image_request_kind, is_video_request, clean_image_prompt,
+                           clean_video_prompt, extract_qr_content, clean_model_response)
+import tracing
+import profiling
+from profiling import memory_tracker
 import hmac
 import hashlib
 import json
@@ -85,6 +76,26 @@ except Exception as e:
 app = Flask(__name__)
 CORS(app)
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    tracing.start_trace()
+    profiling.start_request_profile()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.get('request_start')
+    if start is not None:
+        # The URL rule, not the path, keeps /media/<name> and unknown paths to one series each
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        http_requests.inc(route, request.method, str(response.status_code))
+        http_latency.observe(time.perf_counter() - start, route, request.method)
+    return profiling.finish_request_profile(tracing.finish_trace(response))
+
+@app.teardown_request
+def release_request_profile(exc):
+    profiling.discard_request_profile(exc)
+
 @app.after_request
 def add_security_headers(response):
     # Fix for Google Login COOP errors
@@ -110,13 +121,16 @@ def safe_init(name, func):
 
 # Load API keys
 API_KEY = os.getenv("GEMINI_API_KEY") 
+# Every configured Gemini key is pooled in one client that rotates across them
+GEMINI_KEYS = [k for k in [os.getenv("GEMINI_API_KEY_6"), API_KEY] + [os.getenv(f"GEMINI_API_KEY_{i}") for i in range(2, 6)] if k]
 GOOGLE_CLIENT_ID = (os.getenv("GOOGLE_CLIENT_ID") or "").strip()
 GOOGLE_CLIENT_SECRET = (os.getenv("GOOGLE_CLIENT_SECRET") or "").strip()
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
 
 # Initialize Clients Safely
-gemini = safe_init("Gemini", lambda: GeminiClient(API_KEY))
+# AI and media clients are registered here but only imported and constructed on first use
+gemini = providers.register("Gemini", "gemini_client", "GeminiClient", GEMINI_KEYS)
 system = safe_init("System", lambda: SystemControl())
 weather = safe_init("Weather", lambda: WeatherService(os.getenv("OPENWEATHER_API_KEY")))
 news = safe_init("News", lambda: NewsService(os.getenv("NEWS_API_KEY")))
@@ -126,42 +140,71 @@ youtube = safe_init("YouTube", lambda: YouTubeService(os.getenv("YOUTUBE_API_KEY
 wikipedia = safe_init("Wikipedia", lambda: WikipediaClient(os.getenv("WIKIPEDIA_URL", "https://www.wikipedia.org/")))
 nasa = safe_init("NASA", lambda: NASAClient(os.getenv("NASA_API_KEY"), os.getenv("NASA_BASE_URL", "https://api.nasa.gov/")))
 
+search_client = providers.register_instance("Search", "search_engine_client", "search_client")
+# Fetches and ranks the pages behind search results; opt-in because it adds a few seconds per search
+WEB_RETRIEVAL_ENABLED = os.getenv("WEB_RETRIEVAL_ENABLED", "false").lower() == "true"
+web_retriever = providers.register_instance("Web Retrieval", "web_retrieval", "web_retriever")
+
+# Background refresh of global answers (news, top cryptos, trending, APOD) so /ask serves them from memory.
+# Off on Vercel, where functions are frozen between requests and a background thread cannot run.
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false" if os.environ.get('VERCEL') else "true").lower() == "true"
+if PREFETCH_ENABLED:
+    if news and news.api_key and news.api_key != "YOUR_NEWS_API_KEY":
+        prefetch_scheduler.add_job("news", int(os.getenv("PREFETCH_NEWS_INTERVAL", "240")), news.refresh_top_news)
+    if crypto and crypto.api_key:
+        prefetch_scheduler.add_job("top_cryptos", int(os.getenv("PREFETCH_CRYPTO_INTERVAL", "45")), crypto.refresh_top_cryptos)
+        # Hourly check; the map itself is only downloaded once the copy on disk is older than CRYPTO_MAP_TTL
+        prefetch_scheduler.add_job("crypto_map", min(crypto.map_ttl, 3600), crypto.load_symbol_map)
+    if youtube and youtube.api_key:
+        prefetch_scheduler.add_job("youtube_trending", int(os.getenv("PREFETCH_YOUTUBE_INTERVAL", "3600")), youtube.refresh_trending)
+    if nasa and nasa.api_key:
+        prefetch_scheduler.add_job("nasa_apod", int(os.getenv("PREFETCH_APOD_INTERVAL", "10800")), nasa.refresh_apod)
+    prefetch_scheduler.start()
+
 # ClipDrop
 clipdrop_keys = [k for k in [os.getenv("CLIPDROP_API_KEY"), os.getenv("CLIPDROP_API_KEY_2"), os.getenv("CLIPDROP_API_KEY_3")] if k]
-clipdrop_assistant = safe_init("ClipDrop", lambda: ClipDropClient(clipdrop_keys)) if clipdrop_keys else None
+clipdrop_assistant = providers.register("ClipDrop", "clipdrop_client", "ClipDropClient", clipdrop_keys) if clipdrop_keys else None
 
 # DeepAI
 DEEPAI_API_KEY = os.getenv("DEEPAI_API_KEY")
-deepai_assistant = safe_init("DeepAI", lambda: DeepAIClient(DEEPAI_API_KEY)) if DEEPAI_API_KEY else None
+deepai_assistant = providers.register("DeepAI", "deepai_client", "DeepAIClient", DEEPAI_API_KEY) if DEEPAI_API_KEY else None
 
 # Picsart
 picsart_keys = [k for k in [os.getenv("PICSART_API_KEY"), os.getenv("PICSART_API_KEY_2")] if k]
-picsart_assistant = safe_init("Picsart", lambda: PicsartClient(picsart_keys)) if picsart_keys else None
+picsart_assistant = providers.register("Picsart", "picsart_client", "PicsartClient", picsart_keys) if picsart_keys else None
 
 # PicWish
 PICWISH_API_KEY = os.getenv("PICWISH_API_KEY")
-picwish_assistant = safe_init("PicWish", lambda: PicWishClient(PICWISH_API_KEY)) if PICWISH_API_KEY else None
+picwish_assistant = providers.register("PicWish", "picwish_client", "PicWishClient", PICWISH_API_KEY) if PICWISH_API_KEY else None
 
 # Initialize A1.art Logo Maker
 a1_keys = [k for k in [os.getenv("LOGO_MAKER_API_KEY"), os.getenv("LOGO_MAKER_API_KEY_2"), os.getenv("LOGO_MAKER_API_KEY_3"), os.getenv("LOGO_MAKER_API_KEY_4")] if k]
 A1_ART_MODEL = os.getenv("LOGO_MAKER_MODEL") or "A1.art"
-a1_art_assistant = safe_init("A1.art", lambda: A1ArtClient(a1_keys, A1_ART_MODEL)) if a1_keys else None
+a1_art_assistant = providers.register("A1.art", "a1_art_client", "A1ArtClient", a1_keys, A1_ART_MODEL) if a1_keys else None
 
 # Initialize Pollinations Assistant
 pollinations_keys = [k for k in [os.getenv("POLLINATIONS_API_KEY"), os.getenv("POLLINATIONS_API_KEY_2"), os.getenv("POLLINATIONS_API_KEY_3"), os.getenv("POLLINATIONS_API_KEY_4")] if k]
-pollinations_assistant = safe_init("Pollinations", lambda: PollinationsClient(pollinations_keys)) if pollinations_keys else None
+pollinations_assistant = providers.register("Pollinations", "pollinations_client", "PollinationsClient", pollinations_keys) if pollinations_keys else None
 
 # Initialize Logo.dev Assistant
 logo_dev_keys = [{"pk": os.getenv(f"LOGO_DEV_PUBLISHABLE_KEY{'_' + str(i) if i > 1 else ''}"), "sk": os.getenv(f"LOGO_DEV_SECRET_KEY{'_' + str(i) if i > 1 else ''}")} for i in range(1, 5)]
 logo_dev_keys = [kp for kp in logo_dev_keys if kp.get("pk")]
-logo_dev_assistant = safe_init("Logo.dev", lambda: LogoDevClient(logo_dev_keys)) if logo_dev_keys else None
+logo_dev_assistant = providers.register("Logo.dev", "logo_dev_client", "LogoDevClient", logo_dev_keys) if logo_dev_keys else None
 
 # Razorpay Configuration
-razorpay_client = safe_init("Razorpay", lambda: razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))) if RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET else None
+razorpay_client = providers.register("Razorpay", "razorpay", "Client", auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET)) if RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET else None
 
 # Initialize AI Assistants - 23 Tier Fallback System
 ai_tiers = []
 
+def pooled(pool_name, name, module, attr, key, *args, **kwargs):
+    """
+    Registers a provider whose key belongs to a shared key pool, so tiers of that pool running the same
+    model are rotated per request. The client records 429s and quota headers on the pool through rate_limit.py.
+    """
+    pool = key_pools.pool(pool_name)
+    return pool.add(key, providers.register(name, module, attr, key, *args, key_pool=pool, **kwargs))
+
 # Helper for safe client selection
 def get_tier_client(index, fallback=None):
     try:
@@ -176,70 +219,76 @@ for i in range(1, 6):
     key = os.getenv(f"OPENROUTER_API_KEY{'_' + str(i) if i > 1 else ''}")
     model = os.getenv(f"OPENROUTER_MODEL{'_' + str(i) if i > 1 else ''}")
     if key and "your_api_key" not in key:
-        safe_init(f"Tier {i}", lambda: ai_tiers.append({"client": OpenRouterClient(key, model), "name": f"Tier {i} (OR)", "tier": i}))
+        ai_tiers.append({"client": pooled("openrouter", f"Tier {i} (OR)", "openrouter_client", "OpenRouterClient", key, model), "name": f"Tier {i} (OR)", "tier": i, "model": model})
 
 # Tier 6: Gemini
-safe_init("Tier 6", lambda: ai_tiers.append({"client": GeminiClient(os.getenv("GEMINI_API_KEY_6") or API_KEY), "name": "Tier 6 (Gemini)", "tier": 6}))
+if GEMINI_KEYS:
+    ai_tiers.append({"client": gemini, "name": "Tier 6 (Gemini)", "tier": 6})
 
 # Tier 7: OpenRouter Secondary
 key7 = os.getenv("OPENROUTER_API_KEY_7")
-if key7: safe_init("Tier 7", lambda: ai_tiers.append({"client": OpenRouterClient(key7, os.getenv("OPENROUTER_MODEL_7")), "name": "Tier 7 (OR)", "tier": 7}))
+if key7: ai_tiers.append({"client": pooled("openrouter", "Tier 7 (OR)", "openrouter_client", "OpenRouterClient", key7, os.getenv("OPENROUTER_MODEL_7")), "name": "Tier 7 (OR)", "tier": 7, "model": os.getenv("OPENROUTER_MODEL_7")})
 
 # Tier 8, 10, 12, 13: Groq
 for i, suffix in [(8, ""), (10, "_2"), (12, "_3"), (13, "_4")]:
     key = os.getenv(f"GROQ_API_KEY{suffix}")
-    if key: safe_init(f"Tier {i}", lambda: ai_tiers.append({"client": GroqClient(key, os.getenv(f"GROQ_MODEL{suffix}")), "name": f"Tier {i} (Groq)", "tier": i}))
+    if key: ai_tiers.append({"client": pooled("groq", f"Tier {i} (Groq)", "groq_client", "GroqClient", key, os.getenv(f"GROQ_MODEL{suffix}")), "name": f"Tier {i} (Groq)", "tier": i, "model": os.getenv(f"GROQ_MODEL{suffix}")})
 
 # Tier 9, 14, 15, 16: GitHub
 for i, suffix in [(9, ""), (14, "_2"), (15, "_3"), (16, "_4")]:
     key = os.getenv(f"GITHUB_ACCESS_TOKEN{suffix}")
-    if key: safe_init(f"Tier {i}", lambda: ai_tiers.append({"client": GitHubClient(key), "name": f"Tier {i} (GitHub)", "tier": i}))
+    if key: ai_tiers.append({"client": pooled("github", f"Tier {i} (GitHub)", "github_client", "GitHubClient", key), "name": f"Tier {i} (GitHub)", "tier": i})
 
 # Tier 11: Comet
 ckey = os.getenv("COMET_API_KEY")
-if ckey: safe_init("Tier 11", lambda: ai_tiers.append({"client": CometClient(ckey), "name": "Tier 11 (Comet)", "tier": 11}))
+if ckey: ai_tiers.append({"client": pooled("comet", "Tier 11 (Comet)", "comet_client", "CometClient", ckey), "name": "Tier 11 (Comet)", "tier": 11})
 
 # Tier 17: Chutes
 ckey = os.getenv("CHUTES_API_KEY")
-if ckey: safe_init("Tier 17", lambda: ai_tiers.append({"client": ChutesClient(ckey, os.getenv("CHUTES_MODEL")), "name": "Tier 17 (Chutes)", "tier": 17}))
+if ckey: ai_tiers.append({"client": pooled("chutes", "Tier 17 (Chutes)", "chutes_client", "ChutesClient", ckey, os.getenv("CHUTES_MODEL")), "name": "Tier 17 (Chutes)", "tier": 17})
 
 # Tier 18-21: Ollama
 for i, suffix in [(18, ""), (19, "_2"), (20, "_3"), (21, "_4")]:
     key = os.getenv(f"OLLAMA_API_KEY{suffix}")
-    if key: safe_init(f"Tier {i}", lambda: ai_tiers.append({"client": OllamaClient(key, os.getenv("OLLAMA_MODEL")), "name": f"Tier {i} (Ollama)", "tier": i}))
+    if key: ai_tiers.append({"client": pooled("ollama", f"Tier {i} (Ollama)", "ollama_client", "OllamaClient", key, os.getenv("OLLAMA_MODEL")), "name": f"Tier {i} (Ollama)", "tier": i})
 
 # Tier 22-23: Bytez
 for i, suffix in [(22, ""), (23, "_2")]:
     key = os.getenv(f"BYTEZ_API_KEY{suffix}")
-    if key: safe_init(f"Tier {i}", lambda: ai_tiers.append({"client": BytezClient(key), "name": f"Tier {i} (Bytez)", "tier": i}))
+    if key: ai_tiers.append({"client": pooled("bytez", f"Tier {i} (Bytez)", "bytez_client", "BytezClient", key), "name": f"Tier {i} (Bytez)", "tier": i})
 
 logger.info(f"Total AI tiers available: {len(ai_tiers)}")
+
+# Long-lived servers can pay the SDK imports in the background instead of on the first request
+if os.getenv("PROVIDERS_PRELOAD", "false").lower() == "true":
+    import threading
+    threading.Thread(target=providers.warm, daemon=True, name="providers-preload").start()
 first_ai = get_tier_client(0)
 second_ai = get_tier_client(1)
 third_ai = get_tier_client(2)
 
 # Media Assistant Assignments
-imagen_assistant = safe_init("Imagen", lambda: ImagenClient(os.getenv("IMAGEN_API_KEY"), os.getenv("IMAGEN_MODEL"))) if os.getenv("IMAGEN_API_KEY") else None
-stability_assistant = safe_init("Stability", lambda: StabilityClient(os.getenv("STABILITY_API_KEY"), os.getenv("STABILITY_MODEL"))) if os.getenv("STABILITY_API_KEY") else None
-kling_assistant = safe_init("Kling Primary", lambda: KlingClient(os.getenv("KLING_ACCESS_KEY"), os.getenv("KLING_SECRET_KEY"))) if os.getenv("KLING_ACCESS_KEY") else None
-kling_assistant_2 = safe_init("Kling Tier 2", lambda: KlingClient(os.getenv("KLING_ACCESS_KEY_2"), os.getenv("KLING_SECRET_KEY_2"))) if os.getenv("KLING_ACCESS_KEY_2") else None
-kling_assistant_3 = safe_init("Kling Tier 3", lambda: KlingClient(os.getenv("KLING_ACCESS_KEY_3"), os.getenv("KLING_SECRET_KEY_3"))) if os.getenv("KLING_ACCESS_KEY_3") else None
-kling_assistant_4 = safe_init("Kling Tier 4", lambda: KlingClient(os.getenv("KLING_ACCESS_KEY_4"), os.getenv("KLING_SECRET_KEY_4"))) if os.getenv("KLING_ACCESS_KEY_4") else None
-github_video_assistant = safe_init("GitHub Video", lambda: GitHubClient(os.getenv("GITHUB_ACCESS_TOKEN"))) if os.getenv("GITHUB_ACCESS_TOKEN") else None
-replicate_assistant = safe_init("Replicate Primary", lambda: ReplicateClient(os.getenv("REPLICATE_API_TOKEN"), os.getenv("REPLICATE_MODEL") or "minimax/video-01")) if os.getenv("REPLICATE_API_TOKEN") else None
-replicate_assistant_2 = safe_init("Replicate Tier 2", lambda: ReplicateClient(os.getenv("REPLICATE_API_TOKEN_2"), os.getenv("REPLICATE_MODEL") or "minimax/video-01")) if os.getenv("REPLICATE_API_TOKEN_2") else None
-replicate_assistant_3 = safe_init("Replicate Tier 3", lambda: ReplicateClient(os.getenv("REPLICATE_API_TOKEN_3"), os.getenv("REPLICATE_MODEL") or "minimax/video-01")) if os.getenv("REPLICATE_API_TOKEN_3") else None
-replicate_assistant_4 = safe_init("Replicate Tier 4", lambda: ReplicateClient(os.getenv("REPLICATE_API_TOKEN_4"), os.getenv("REPLICATE_MODEL") or "minimax/video-01")) if os.getenv("REPLICATE_API_TOKEN_4") else None
-runway_assistant = safe_init("Runway", lambda: RunwayClient(os.getenv("RUNWAYML_API_KEY"))) if os.getenv("RUNWAYML_API_KEY") else None
-veo_assistant = safe_init("Veo Tier 1", lambda: VeoClient(os.getenv("VEO_API_KEY"), os.getenv("VEO_MODEL") or "veo3")) if os.getenv("VEO_API_KEY") else None
-veo_assistant_2 = safe_init("Veo Tier 2", lambda: VeoClient(os.getenv("VEO_API_KEY_2"), os.getenv("VEO_MODEL") or "veo3")) if os.getenv("VEO_API_KEY_2") else None
-veo_assistant_3 = safe_init("Veo Tier 3", lambda: VeoClient(os.getenv("VEO_API_KEY_3"), os.getenv("VEO_MODEL") or "veo3")) if os.getenv("VEO_API_KEY_3") else None
-veo_assistant_4 = safe_init("Veo Tier 4", lambda: VeoClient(os.getenv("VEO_API_KEY_4"), os.getenv("VEO_MODEL") or "veo3")) if os.getenv("VEO_API_KEY_4") else None
-freepik_assistant = safe_init("Freepik Tier 1", lambda: FreepikClient(os.getenv("FREEPIK_API_KEY"))) if os.getenv("FREEPIK_API_KEY") else None
-freepik_assistant_2 = safe_init("Freepik Tier 2", lambda: FreepikClient(os.getenv("FREEPIK_API_KEY_2"))) if os.getenv("FREEPIK_API_KEY_2") else None
-freepik_assistant_3 = safe_init("Freepik Tier 3", lambda: FreepikClient(os.getenv("FREEPIK_API_KEY_3"))) if os.getenv("FREEPIK_API_KEY_3") else None
-freepik_assistant_4 = safe_init("Freepik Tier 4", lambda: FreepikClient(os.getenv("FREEPIK_API_KEY_4"))) if os.getenv("FREEPIK_API_KEY_4") else None
-huggingface_assistant = safe_init("HuggingFace", lambda: HuggingFaceClient(os.getenv("HUGGINGFACE_API_KEY"))) if os.getenv("HUGGINGFACE_API_KEY") else None
+imagen_assistant = providers.register("Imagen", "imagen_client", "ImagenClient", os.getenv("IMAGEN_API_KEY"), os.getenv("IMAGEN_MODEL")) if os.getenv("IMAGEN_API_KEY") else None
+stability_assistant = providers.register("Stability", "stability_client", "StabilityClient", os.getenv("STABILITY_API_KEY"), os.getenv("STABILITY_MODEL")) if os.getenv("STABILITY_API_KEY") else None
+kling_assistant = pooled("kling", "Kling Primary", "kling_client", "KlingClient", os.getenv("KLING_ACCESS_KEY"), os.getenv("KLING_SECRET_KEY")) if os.getenv("KLING_ACCESS_KEY") else None
+kling_assistant_2 = pooled("kling", "Kling Tier 2", "kling_client", "KlingClient", os.getenv("KLING_ACCESS_KEY_2"), os.getenv("KLING_SECRET_KEY_2")) if os.getenv("KLING_ACCESS_KEY_2") else None
+kling_assistant_3 = pooled("kling", "Kling Tier 3", "kling_client", "KlingClient", os.getenv("KLING_ACCESS_KEY_3"), os.getenv("KLING_SECRET_KEY_3")) if os.getenv("KLING_ACCESS_KEY_3") else None
+kling_assistant_4 = pooled("kling", "Kling Tier 4", "kling_client", "KlingClient", os.getenv("KLING_ACCESS_KEY_4"), os.getenv("KLING_SECRET_KEY_4")) if os.getenv("KLING_ACCESS_KEY_4") else None
+github_video_assistant = providers.register("GitHub Video", "github_client", "GitHubClient", os.getenv("GITHUB_ACCESS_TOKEN")) if os.getenv("GITHUB_ACCESS_TOKEN") else None
+replicate_assistant = pooled("replicate", "Replicate Primary", "replicate_client", "ReplicateClient", os.getenv("REPLICATE_API_TOKEN"), os.getenv("REPLICATE_MODEL") or "minimax/video-01") if os.getenv("REPLICATE_API_TOKEN") else None
+replicate_assistant_2 = pooled("replicate", "Replicate Tier 2", "replicate_client", "ReplicateClient", os.getenv("REPLICATE_API_TOKEN_2"), os.getenv("REPLICATE_MODEL") or "minimax/video-01") if os.getenv("REPLICATE_API_TOKEN_2") else None
+replicate_assistant_3 = pooled("replicate", "Replicate Tier 3", "replicate_client", "ReplicateClient", os.getenv("REPLICATE_API_TOKEN_3"), os.getenv("REPLICATE_MODEL") or "minimax/video-01") if os.getenv("REPLICATE_API_TOKEN_3") else None
+replicate_assistant_4 = pooled("replicate", "Replicate Tier 4", "replicate_client", "ReplicateClient", os.getenv("REPLICATE_API_TOKEN_4"), os.getenv("REPLICATE_MODEL") or "minimax/video-01") if os.getenv("REPLICATE_API_TOKEN_4") else None
+runway_assistant = providers.register("Runway", "runway_client", "RunwayClient", os.getenv("RUNWAYML_API_KEY")) if os.getenv("RUNWAYML_API_KEY") else None
+veo_assistant = pooled("veo", "Veo Tier 1", "veo_client", "VeoClient", os.getenv("VEO_API_KEY"), os.getenv("VEO_MODEL") or "veo3") if os.getenv("VEO_API_KEY") else None
+veo_assistant_2 = pooled("veo", "Veo Tier 2", "veo_client", "VeoClient", os.getenv("VEO_API_KEY_2"), os.getenv("VEO_MODEL") or "veo3") if os.getenv("VEO_API_KEY_2") else None
+veo_assistant_3 = pooled("veo", "Veo Tier 3", "veo_client", "VeoClient", os.getenv("VEO_API_KEY_3"), os.getenv("VEO_MODEL") or "veo3") if os.getenv("VEO_API_KEY_3") else None
+veo_assistant_4 = pooled("veo", "Veo Tier 4", "veo_client", "VeoClient", os.getenv("VEO_API_KEY_4"), os.getenv("VEO_MODEL") or "veo3") if os.getenv("VEO_API_KEY_4") else None
+freepik_assistant = pooled("freepik", "Freepik Tier 1", "freepik_client", "FreepikClient", os.getenv("FREEPIK_API_KEY")) if os.getenv("FREEPIK_API_KEY") else None
+freepik_assistant_2 = pooled("freepik", "Freepik Tier 2", "freepik_client", "FreepikClient", os.getenv("FREEPIK_API_KEY_2")) if os.getenv("FREEPIK_API_KEY_2") else None
+freepik_assistant_3 = pooled("freepik", "Freepik Tier 3", "freepik_client", "FreepikClient", os.getenv("FREEPIK_API_KEY_3")) if os.getenv("FREEPIK_API_KEY_3") else None
+freepik_assistant_4 = pooled("freepik", "Freepik Tier 4", "freepik_client", "FreepikClient", os.getenv("FREEPIK_API_KEY_4")) if os.getenv("FREEPIK_API_KEY_4") else None
+huggingface_assistant = providers.register("HuggingFace", "huggingface_client", "HuggingFaceClient", os.getenv("HUGGINGFACE_API_KEY")) if os.getenv("HUGGINGFACE_API_KEY") else None
 
 @app.route('/health')
 def health():
@@ -249,6 +298,87 @@ def health():
         "timestamp": datetime.now().isoformat()
     })
 
+@app.route('/health/prefetch')
+def prefetch_status():
+    """Refresh timings and failures of the background prefetch jobs"""
+    return jsonify(dict(prefetch_scheduler.status(), enabled=PREFETCH_ENABLED))
+
+def ops_authorized():
+    """Bearer METRICS_TOKEN or X-Admin-Secret; with neither configured, ops details stay private."""
+    token = os.getenv("METRICS_TOKEN")
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return True
+    return profiling.is_admin()
+
+@app.route('/health/providers')
+def providers_status():
+    """Which provider clients have been loaded so far, and how long each took (ops token required)"""
+    if not ops_authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(providers.status())
+
+@app.route('/health/keys')
+def key_pool_status():
+    """Per-key usage and rate-limit cooldowns of every pooled provider (ops token required)"""
+    if not ops_authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(key_pools.status())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint; set METRICS_TOKEN to require a bearer token"""
+    token = os.getenv("METRICS_TOKEN")
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/debug/threads')
+def debug_thread_dump():
+    """Stacks of every thread in this worker (X-Admin-Secret required)"""
+    if not profiling.is_admin():
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(profiling.thread_dump(), mimetype='text/plain')
+
+@app.route('/admin/debug/profile')
+def debug_profile_worker():
+    """Samples all threads for ?seconds= (default 10) and returns collapsed stacks"""
+    if not profiling.is_admin():
+        return jsonify({"error": "Unauthorized"}), 401
+    seconds = min(max(request.args.get('seconds', 10, type=float), 0.1), 60)
+    profiler = profiling.profile_all_threads(seconds, request.args.get('interval_ms', type=float))
+    return Response(profiler.collapsed(), mimetype='text/plain', headers={
+        "Content-Disposition": f"attachment; filename=worker-{int(time.time())}.folded",
+        "X-Profile-Samples": str(profiler.samples),
+    })
+
+@app.route('/admin/debug/tracemalloc', methods=['GET', 'POST', 'DELETE'])
+def debug_tracemalloc():
+    """
+    POST starts tracing (?frames=), DELETE stops it, GET returns the top allocation sites
+    (?group_by=lineno|filename|traceback&limit=25&compare=1 for growth since the last snapshot).
+    """
+    if not profiling.is_admin():
+        return jsonify({"error": "Unauthorized"}), 401
+    if request.method == 'POST':
+        return jsonify(memory_tracker.start(request.args.get('frames', type=int)))
+    if request.method == 'DELETE':
+        return jsonify(memory_tracker.stop())
+    group_by = request.args.get('group_by', 'lineno')
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        return jsonify({"error": "group_by must be lineno, filename or traceback"}), 400
+    report = memory_tracker.snapshot(group_by, request.args.get('limit', 25, type=int),
+                                     request.args.get('compare', '').lower() in ('1', 'true', 'yes'))
+    if report is None:
+        return jsonify({"error": "tracemalloc is not running; POST to this endpoint to start it"}), 409
+    return jsonify(report)
+
+@app.route('/health/youtube')
+def youtube_quota_status():
+    """Estimated YouTube Data API quota usage and cache hit rates for today"""
+    if not youtube:
+        return jsonify({"error": "YouTube service unavailable"}), 503
+    return jsonify(youtube.quota_status())
+
 @app.route('/')
 def index():
     return render_template('index.html', google_client_id=GOOGLE_CLIENT_ID or "YOUR_GOOGLE_CLIENT_ID", razorpay_key_id=RAZORPAY_KEY_ID)
@@ -445,6 +575,9 @@ def google_auth():
         session.mount("https://", retry_strategy)
         session.mount("http://", retry_strategy)
         
+        # google-auth is only needed for sign-in, so it is imported here rather than on every cold start
+        from google.oauth2 import id_token
+        from google.auth.transport import requests as google_requests
         request_adapter = google_requests.Request(session=session)
         
         # Verify the token
@@ -917,13 +1050,17 @@ def video_status():
         "Veo_Tier_3": "Enabled" if veo_assistant_3 else "Disabled",
         "Veo_Tier_4": "Enabled" if veo_assistant_4 else "Disabled",
         "RunwayML": "Enabled" if runway_assistant else "Disabled",
-        "GitHub_Models": "Enabled" if github_assistant else "Disabled",
+        "GitHub_Models": "Enabled" if github_video_assistant else "Disabled",
         "HuggingFace": "Enabled" if huggingface_assistant else "Disabled",
         "VEO_MODEL": VEO_MODEL,
         "Is_PRO_Request": "N/A"
     }
     return jsonify(status), 200
 
+def wants_inline_images(data):
+    """Generated images are returned as /media URLs unless the caller or INLINE_GENERATED_IMAGES opts into inline base64"""
+    return bool(data.get('inline_images')) or os.getenv("INLINE_GENERATED_IMAGES", "false").lower() == "true"
+
 @app.route('/ask', methods=['POST'])
 def ask():
     data = request.json
@@ -934,6 +1071,8 @@ def ask():
     if user_input is None:
         user_input = ''
     
+    inline_images = wants_inline_images(data)
+    
     logger.info(f"Incoming /ask request: prompt='{user_input}', email='{data.get('email')}'")
 
     # Safe extraction of email and prompt
@@ -947,64 +1086,44 @@ def ask():
     current_images, current_videos = 0, 0
     
     try:
-        pro_emails = sheets_service.get_pro_emails() or []
-        db_user = local_db.get_user_by_email(email)
-        # Check if email is in sheets or if DB plan_type contains "Pro"
-        is_pro = email in pro_emails or (db_user and 'Pro' in str(db_user.get('plan_type', 'Free')))
-        
-        current_images, current_videos = local_db.get_usage(email)
+        with tracing.span("pro_lookup"):
+            pro_emails = sheets_service.get_pro_emails() or []
+            db_user = local_db.get_user_by_email(email)
+            # Check if email is in sheets or if DB plan_type contains "Pro"
+            is_pro = email in pro_emails or (db_user and 'Pro' in str(db_user.get('plan_type', 'Free')))
+        
+        with tracing.span("usage_lookup"):
+            current_images, current_videos = local_db.get_usage(email)
     except Exception as usage_err:
         logger.error(f"Error checking pro/usage status: {usage_err}")
         # Default to safe values if DB/Sheets fail
         is_pro = False 
         current_images, current_videos = 0, 0
     
+    # Intent routing; a branch that answers directly returns with this span still open, which closes it
+    tracing.begin("intent")
+    command = detect_command(user_input)
     # Check for system commands first (conceptual)
-    if "screenshot" in user_input.lower():
+    if command == "screenshot":
         system.take_screenshot()
         return jsonify({"response": emoji_service.augment_text_with_emojis("Screenshot taken successfully.", "Neutral"), "emotion": "Neutral"})
-    elif "camera" in user_input.lower() or "photo" in user_input.lower():
+    elif command == "camera":
         system.capture_camera()
         return jsonify({"response": emoji_service.augment_text_with_emojis("Camera image captured.", "Neutral"), "emotion": "Neutral"})
-    elif "open" in user_input.lower():
+    elif command == "open":
         app_name = user_input.lower().split("open")[-1].strip()
         response_text = system.open_app(app_name)
         return jsonify({"response": emoji_service.augment_text_with_emojis(response_text, "Neutral"), "emotion": "Neutral"})
-    elif "weather" in user_input.lower():
-        # Enhanced city extraction
-        import re
-        user_input_low = user_input.lower().strip().strip('?').strip('.')
-        city = "London" # Default fallback
-        
-        # Scenario 1: Look for connecting words (e.g., "weather in Delhi", "weather for Mumbai")
-        if " in " in user_input_low:
-            city = user_input_low.split(" in ")[-1].strip()
-        elif " for " in user_input_low:
-            city = user_input_low.split(" for ")[-1].strip()
-        elif " at " in user_input_low:
-            city = user_input_low.split(" at ")[-1].strip()
-        else:
-            # Scenario 2: Keyword cleaning (e.g., "Delhi weather details", "Weather Mumbai")
-            # Remove noise words to find the city name
-            noise_words = ["weather", "details", "info", "report", "today", "check", "now", "current", "temperature", "tell", "me", "the", "about"]
-            cleaned_city = user_input_low
-            for word in noise_words:
-                cleaned_city = re.sub(r'\b' + word + r'\b', '', cleaned_city).strip()
-            
-            if cleaned_city:
-                city = cleaned_city
+    elif command == "weather":
+        # One pass over the question against the offline gazetteer; unknown cities are sent by name
+        known_city, city_name = city_gazetteer.extract(user_input)
         
-        # Clean up any remaining connecting words at the start
-        for word in ["in", "at", "for", "of"]:
-            if city.startswith(f"{word} "):
-                city = city[len(word)+1:].strip()
-                
-        weather_info = weather.get_weather(city)
+        weather_info = weather.get_weather(known_city or city_name)
         return jsonify({"response": emoji_service.augment_text_with_emojis(weather_info, "Neutral"), "emotion": "Neutral"})
-    elif "news" in user_input.lower():
+    elif command == "news":
         news_info = news.get_top_news()
         return jsonify({"response": emoji_service.augment_text_with_emojis(news_info, "Neutral"), "emotion": "Neutral"})
-    elif "price of" in user_input.lower() or "price for" in user_input.lower():
+    elif command == "crypto_price":
         # Try to extract crypto symbol
         words = user_input.lower().split()
         symbol = None
@@ -1014,32 +1133,36 @@ def ask():
             symbol = words[words.index("for") + 1].strip("?").strip(".")
         
         if symbol:
-            # Map common names to symbols
-            mapping = {"bitcoin": "BTC", "ethereum": "ETH", "solana": "SOL", "dogecoin": "DOGE", "cardano": "ADA"}
-            symbol = mapping.get(symbol, symbol)
+            # Resolve names/slugs/tickers offline via the CMC map; several coins are priced in one request
+            symbols = crypto.find_symbols(user_input) or [crypto.resolve_symbol(symbol)]
             
-            crypto_info = crypto.get_price(symbol)
+            crypto_info = crypto.get_prices(symbols)
             return jsonify({"response": emoji_service.augment_text_with_emojis(crypto_info, "Neutral"), "emotion": "Neutral"})
-    elif "crypto" in user_input.lower() or "cryptocurrency" in user_input.lower():
+    elif command == "crypto":
          top_cryptos = crypto.get_top_cryptos()
          return jsonify({"response": emoji_service.augment_text_with_emojis(top_cryptos, "Neutral"), "emotion": "Neutral"})
-    elif "stock" in user_input.lower() or "share price" in user_input.lower():
-        # Try to extract stock symbol
-        words = user_input.lower().split()
-        symbol = None
-        if "of" in words:
-            symbol = words[words.index("of") + 1].strip("?").strip(".")
-        elif "for" in words:
-            symbol = words[words.index("for") + 1].strip("?").strip(".")
-        
-        if symbol:
-            stock_info = stock.get_stock_price(symbol)
+    elif command == "stock":
+        # Resolve company names and tickers offline, so "stock price of apple" queries AAPL
+        symbols = ticker_index.find_symbols(user_input)
+        if not symbols:
+            # Fall back to the word after "of"/"for" when it is shaped like a ticker we do not know yet
+            words = user_input.lower().split()
+            word = None
+            if "of" in words and words.index("of") + 1 < len(words):
+                word = words[words.index("of") + 1].strip("?").strip(".")
+            elif "for" in words and words.index("for") + 1 < len(words):
+                word = words[words.index("for") + 1].strip("?").strip(".")
+            if word and ticker_index.looks_like_symbol(word):
+                symbols = [word.upper()]
+        
+        if symbols:
+            stock_info = "\n".join(stock.get_stock_price(symbol) for symbol in symbols[:3])
             return jsonify({"response": emoji_service.augment_text_with_emojis(stock_info, "Neutral"), "emotion": "Neutral"})
         else:
             news_info = stock.get_market_news()
             return jsonify({"response": emoji_service.augment_text_with_emojis(news_info, "Neutral"), "emotion": "Neutral"})
     
-    elif "youtube" in user_input.lower():
+    elif command == "youtube":
         if "trending" in user_input.lower() or "popular" in user_input.lower():
             trending = youtube.get_trending_videos()
             return jsonify({"response": emoji_service.augment_text_with_emojis(trending, "Happy"), "emotion": "Happy"})
@@ -1052,7 +1175,7 @@ def ask():
         results = youtube.search_videos(query)
         return jsonify({"response": emoji_service.augment_text_with_emojis(results, "Happy"), "emotion": "Happy"})
     
-    elif "what is my name" in user_input.lower():
+    elif command == "my_name":
          user_name = "User"
          if email != 'guest':
              try:
@@ -1064,13 +1187,13 @@ def ask():
          
          return jsonify({"response": emoji_service.augment_text_with_emojis(f"Your name is {user_name}.", "Happy"), "emotion": "Happy"})
     
-    elif any(kw in user_input.lower() for kw in ["wikipedia", "wekippidea", "wekipedia", "weikedia"]):
+    elif command == "wikipedia":
          return jsonify({
              "response": f"Here is the link to Wikipedia: {wikipedia.get_link()}",
              "emotion": "Happy"
          })
     
-    elif any(kw in user_input.lower() for kw in ["nasa", "space", "astronomy", "apod", "galaxy", "planet"]):
+    elif command == "nasa":
         logger.info(f"[NASA] Space query detected for user {email}")
         apod_data = nasa.get_apod()
         if apod_data:
@@ -1086,23 +1209,20 @@ def ask():
             })
     
     # QR Code Generation
-    elif any(kw in user_input.lower() for kw in ["generate qr code", "genrate qr code", "create qr code", "make qr code", "qr code for"]):
-        # Extract the content for the QR code using a more robust regex
-        import re
-        # Remove common "generate a qr code for" prefixes
-        # This handles optional "a", "an", and connecting words like "for", "of", "with"
-        pattern = r'(?i)\b(generate|genrate|create|make|show|give|want|need)\b\s+(a\s+|an\s+)?qr\s+code\s+(for\s+|of\s+|with\s+|to\s+)?'
-        qr_content = re.sub(pattern, '', user_input).strip()
-        
-        # Clean up any leading/trailing punctuation or noise
-        qr_content = qr_content.strip(': ').strip()
+    elif command == "qr":
+        # Strip "generate a qr code for"-style prefixes and surrounding punctuation
+        qr_content = extract_qr_content(user_input)
         
         if not qr_content:
             return jsonify({"response": "Please specify what content (URL or text) you want for the QR code.", "emotion": "Neutral"})
             
         try:
             logger.info(f"[QR] Generating QR code for content: '{qr_content}'")
-            qr_image_data = qr_service.generate_qr(qr_content)
+            qr_format = "svg" if "svg" in user_input.lower() else "png"
+            qr_image_data = qr_service.generate_qr(qr_content, fmt=qr_format)
+            # SVG stays a data URL: /media only renders raster images inline
+            if not inline_images and qr_format != "svg":
+                qr_image_data = blob_store.publish(qr_image_data)
             return jsonify({
                 "response": f"I've generated a QR code for your request! You can view and download it below. \n\n![QR Code]({qr_image_data})",
                 "emotion": "Happy",
@@ -1117,26 +1237,17 @@ def ask():
     # Image Generation (Consolidated & Fuzzy Detection)
     # This block catches variations including typos like "genrate", "enrate", "genrrate"
     # Enhanced to better detect logo requests and all image-related requests
-    is_image_request = False
+    image_kind = image_request_kind(user_input)
     
-    # Check if it's a logo request (high priority)
-    if "logo" in user_input.lower():
-        is_image_request = True
+    # Logo requests take priority, then explicit keywords, then implicit ones ("I want a picture of...")
+    if image_kind == "logo":
         logger.info(f"[Image] Logo request detected for user {email}")
-    
-    # Check for general image generation keywords
-    elif (any(trig in user_input.lower() for trig in ["generate", "genraitve", "genrate", "create", "make", "paint", "draw", "render", "show me", "enrate", "genrrate", "generrate", "design", "imagine", "visualize"]) and \
-         any(img_kw in user_input.lower() for img_kw in ["image", "picture", "photo", "art", "illustration", "portrait", "landscape", "sketch", "drawing", "painting", "wallpaper", "avatar", "masterpiece", "cyber", "icon", "graphic"])):
-        is_image_request = True
+    elif image_kind == "explicit":
         logger.info(f"[Image] Image generation request detected for user {email}")
-    
-    # Check for implicit image requests (e.g., "show me a car", "I want a picture of...")
-    elif (any(img_kw in user_input.lower() for img_kw in ["image", "picture", "photo", "art", "illustration", "sketch", "painting", "visual"]) and \
-          any(action in user_input.lower() for action in ["me", "give", "want", "need", "could you"])):
-        is_image_request = True
+    elif image_kind == "implicit":
         logger.info(f"[Image] Implicit image request detected for user {email}")
     
-    if is_image_request:
+    if image_kind:
         
         # Sequential Image Fallback System (All Tiers)
         image_assistants = [
@@ -1153,14 +1264,11 @@ def ask():
             ("Imagen", imagen_assistant)
         ]
         image_assistants = [a for a in image_assistants if a is not None and a[1] is not None]
+        # Spread requests over the Freepik keys instead of always starting with Tier 1
+        image_assistants = key_pools.order(image_assistants, member=lambda a: a[1])
         
         # Extract prompt using word boundaries
-        import re
-        prompt = user_input.lower()
-        # Expanded keywords for cleaning, including typos
-        keywords = ["generate", "genraitve", "genrate", "create", "make", "paint", "draw", "render", "show", "me", "an", "a", "of", "image", "picture", "photo", "art", "illustration", "portrait", "landscape", "sketch", "drawing", "painting", "wallpaper", "avatar", "enrate", "genrrate", "generrate", "logo", "design", "imagine", "visualize", "could", "you", "please", "give", "want"]
-        pattern = r'\b(' + '|'.join(keywords) + r')\b'
-        prompt = re.sub(pattern, '', prompt).strip()
+        prompt = clean_image_prompt(user_input)
         
         logger.info(f"[Image] Cleaned Image Prompt: '{prompt}' for user {email}")
 
@@ -1175,10 +1283,18 @@ def ask():
              })
         
         for name, assistant in image_assistants:
-            if assistant:
+            if assistant and key_pools.is_cooling(assistant):
+                logger.info(f"[Skip] {name} is rate limited")
+                record_provider("image", name, "skipped")
+            elif assistant:
+                provider_start = time.perf_counter()
                 try:
                     logger.info(f"[Processing] Attempting image generation with {name}...")
                     image_data = assistant.generate_image(prompt)
+                    record_provider("image", name, "success" if image_data else "empty", time.perf_counter() - provider_start)
+                    if image_data and not inline_images:
+                        # Serve the bytes from /media instead of embedding base64 twice in the JSON
+                        image_data = blob_store.publish(image_data)
                     if image_data:
                         logger.info(f"[OK] Image generated with {name}!")
                         local_db.increment_usage(email, 'image')
@@ -1189,14 +1305,12 @@ def ask():
                         })
                 except Exception as e:
                     logger.error(f"[FAIL] {name} failure: {e}")
+                    record_provider("image", name, "error", time.perf_counter() - provider_start)
         
         return jsonify({"response": "I'm sorry, I couldn't generate that image with any of my available services. Please try a different description.", "emotion": "Sad"})
     
     # Video Generation (Consolidated & Fuzzy Detection)
-    elif (any(trig in user_input.lower() for trig in ["generate", "create", "make", "animate", "render", "show me", "genrate", "enrate", "genrrate", "generrate"]) or \
-         (any(vid_kw in user_input.lower() for vid_kw in ["video", "clip", "movie", "animation", "motion"]) and \
-          any(action in user_input.lower() for action in ["me", "give", "want", "need", "animate"]))) and \
-         any(vid_kw in user_input.lower() for vid_kw in ["video", "clip", "movie", "animate", "animation", "motion", "clip"]):
+    elif is_video_request(user_input):
         
         video_assistants = [
             ("Replicate Primary", replicate_assistant),
@@ -1212,25 +1326,25 @@ def ask():
             ("Veo Tier 2", veo_assistant_2),
             ("Veo Tier 3", veo_assistant_3),
             ("Veo Tier 4", veo_assistant_4),
-            ("GitHub Models", github_assistant),
+            ("GitHub Models", github_video_assistant),
             ("Hugging Face", huggingface_assistant)
         ]
+        video_assistants = key_pools.order(video_assistants, member=lambda a: a[1])
         
         # Extract prompt using word boundaries
-        import re
-        prompt = user_input.lower()
-        # Expanded keywords for cleaning, including typos
-        keywords = ["generate", "create", "make", "animate", "render", "show", "me", "a", "an", "of", "video", "clip", "movie", "animation", "motion", "enrate", "genrate", "genrrate", "generrate"]
-        pattern = r'\b(' + '|'.join(keywords) + r')\b'
-        prompt = re.sub(pattern, '', prompt).strip()
+        prompt = clean_video_prompt(user_input)
         
         if not prompt:
             prompt = "Animate this image" if data.get('file') else "A cinematic scene"
             
         file_data = data.get('file')
         image_url = None
-        if file_data and file_data.get('type', '').startswith('image/'):
-            image_url = file_data.get('data')
+        if file_data and file_data.get('type', '').startswith('image/') and file_data.get('data'):
+            # Video providers only take a URL, so blob handles are inlined here
+            try:
+                image_url = blob_store.as_data_url(file_data.get('data'), file_data.get('type'))
+            except (FileNotFoundError, ValueError):
+                return jsonify({"response": "That image has expired from storage. Please upload it again.", "emotion": "Neutral"})
         
         # Check usage limit
         if not is_pro and current_videos >= FREE_VIDEO_LIMIT:
@@ -1241,10 +1355,15 @@ def ask():
 
         errors = []
         for name, assistant in video_assistants:
-            if assistant:
+            if assistant and key_pools.is_cooling(assistant):
+                logger.info(f"[Skip] {name} is rate limited")
+                record_provider("video", name, "skipped")
+            elif assistant:
+                provider_start = time.perf_counter()
                 try:
                     logger.info(f"[Processing] Attempting video generation with {name} for prompt: {prompt}")
                     video_url = assistant.generate_video(prompt, image_url=image_url)
+                    record_provider("video", name, "success" if video_url else "empty", time.perf_counter() - provider_start)
                     if video_url:
                         logger.info(f"[OK] Video generated with {name}!")
                         local_db.increment_usage(email, 'video')
@@ -1263,6 +1382,7 @@ def ask():
                     error_msg_short = str(e).split('\n')[0]
                     errors.append(f"{name}: {error_msg_short}")
                     logger.error(f"[FAIL] {name} failure: {e}")
+                    record_provider("video", name, "error", time.perf_counter() - provider_start)
         
         # Video Idea Generator
         video_ideas = [
@@ -1294,6 +1414,8 @@ def ask():
         logger.error(f"[FAIL] All video services failed for prompt: {prompt}")
         return jsonify({"response": error_msg, "emotion": "Sad"})
     
+    tracing.end("intent")
+    
     # Web Search Capability (Fuzzy Trigger)
     search_keywords = ["search", "find", "who is", "what is", "about", "latest", "news", "price", "stock", "weather"]
     if any(kw in user_input.lower() for kw in search_keywords) and len(user_input.split()) < 20: 
@@ -1301,15 +1423,33 @@ def ask():
         # We can also explicitly check for "search" or "look up"
         if "search" in user_input.lower() or "look up" in user_input.lower() or "find information" in user_input.lower():
              logger.info(f"[Web] Triggering Web Search for: {user_input}")
-             search_results = search_client.search(user_input)
+             with tracing.span("web_search"):
+                 search_results = search_client.search(user_input)
+             user_input_query = user_input
              user_input = f"{user_input}\n\n[CONTEXT FROM WEB SEARCH]:\n{search_results}"
+             if WEB_RETRIEVAL_ENABLED:
+                 try:
+                     # search_results() is a cache hit here; it returns the links behind the snippets
+                     with tracing.span("web_retrieval"):
+                         _, results = search_client.search_results(user_input_query)
+                         passages = web_retriever.retrieve(user_input_query, results)
+                     if passages:
+                         user_input += f"\n\n[RELEVANT PASSAGES FROM RESULT PAGES]:\n{passages}"
+                 except Exception as e:
+                     logger.error(f"[Web] Retrieval error: {e}")
 
 
 
     # Get combined response and emotion with 7-tier fallback logic
     file_data = data.get('file')
+    if file_data and file_data.get('type', '').startswith('image/') and isinstance(file_data.get('data'), str) \
+            and file_data['data'].startswith('data:'):
+        # Decode inline images once into the blob store; every tier then reuses the same bytes
+        try:
+            file_data = dict(file_data, data=blob_store.put_data_url(file_data['data'], file_data.get('name')))
+        except Exception as e:
+            logger.error(f"Attachment decode error: {e}")
     
-    import time
     start_time = time.time()
     
     # Fast Project Mode Logic
@@ -1320,7 +1460,8 @@ def ask():
     if email != 'guest':
         try:
             # Re-fetch user to ensure we have the latest name
-            current_user_ctx = local_db.get_user_by_email(email)
+            with tracing.span("user_context"):
+                current_user_ctx = local_db.get_user_by_email(email)
             if current_user_ctx and current_user_ctx.get('full_name'):
                 # Prepend context in a way that models understand it's system info, not user speech
                 context_prefix = f"[System Context: The user's name is {current_user_ctx['full_name']}.]\n\n"
@@ -1329,23 +1470,33 @@ def ask():
             logger.error(f"Context injection error: {e}")
 
     result = None
-    error_keywords = ["API Error", "trouble connecting to my brain", "I'm sorry, I couldn't get a response", "I couldn't get a response", "Rate Limit", "429"]
+    error_keywords = ["API Error", "trouble connecting to my brain", "I'm sorry, I couldn't get a response", "I couldn't get a response"]
+    rate_limited = []
     
-    # Process tiers
-    active_tiers = ai_tiers
+    # Process tiers; tiers sharing a provider and model take turns (so the configured model priority
+    # holds), and throttled keys go to the back of their group
+    active_tiers = key_pools.order(ai_tiers, member=lambda t: t["client"], group=lambda t: t.get("model"))
     if is_fast_project:
         # Prioritize Groq (Tiers 8, 10, 12, 13) for lightning fast project answers
-        fast_tiers = [t for t in ai_tiers if "Groq" in t["name"]]
-        other_tiers = [t for t in ai_tiers if "Groq" not in t["name"]]
+        fast_tiers = [t for t in active_tiers if "Groq" in t["name"]]
+        other_tiers = [t for t in active_tiers if "Groq" not in t["name"]]
         active_tiers = fast_tiers + other_tiers
         logger.info("[OK] Fast Project Mode enabled - Prioritizing Groq Tiers")
 
+    # Skip tiers whose key is throttled or out of quota, unless that leaves nothing to try
+    ready_tiers = [t for t in active_tiers if not key_pools.is_cooling(t["client"])]
+    if len(ready_tiers) < len(active_tiers):
+        logger.info(f"[Skip] {len(active_tiers) - len(ready_tiers)} rate-limited tier(s) skipped")
+    active_tiers = ready_tiers or active_tiers
+
     # Try each AI tier in sequence
     for tier_info in active_tiers:
         tier_num = tier_info["tier"]
         tier_name = tier_info["name"]
         tier_client = tier_info["client"]
         
+        tier_start = time.perf_counter()
+        tracing.begin(tier_name)
         try:
             logger.info(f"[Processing] Attempting {tier_name}...")
             result = tier_client.get_full_response(user_input, file_data=file_data)
@@ -1353,118 +1504,64 @@ def ask():
             # Check if the response contains error indicators
             if result and not any(kw in result.get("response", "") for kw in error_keywords):
                 logger.info(f"[OK] {tier_name} succeeded!")
+                record_tier(tier_name, "success", time.perf_counter() - tier_start)
                 break  # Success! Exit the loop
             else:
                 logger.warning(f"[WARN] {tier_name} returned an error response. Trying next tier...")
+                record_tier(tier_name, "error_response", time.perf_counter() - tier_start)
                 result = None
                 
+        except RateLimited as e:
+            logger.warning(f"[WARN] {tier_name} rate limited: {e}. Trying next tier...")
+            record_tier(tier_name, "rate_limited", time.perf_counter() - tier_start)
+            rate_limited.append(e)
+            result = None
         except Exception as e:
             logger.error(f"[FAIL] {tier_name} critical failure: {e}")
+            record_tier(tier_name, "exception", time.perf_counter() - tier_start)
             result = None
+        finally:
+            tracing.end(tier_name)
     
     # If all tiers failed, return a helpful error message
     if not result:
         logger.error("[FAIL] All AI tiers failed!")
-        result = {
-            "response": "I couldn't get a response. Please try again. 😊✨ 🌟🚀",
-            "emotion": "Neutral"
-        }
+        if rate_limited and len(rate_limited) == len(active_tiers):
+            waits = [e.retry_after for e in rate_limited if e.retry_after]
+            wait = int(min(waits)) + 1 if waits else 30
+            result = {
+                "response": f"⚠️ **Rate Limit Reached**: All AI providers are busy right now. Please wait {wait} seconds and try again.",
+                "emotion": "Neutral"
+            }
+        else:
+            result = {
+                "response": "I couldn't get a response. Please try again. 😊✨ 🌟🚀",
+                "emotion": "Neutral"
+            }
     
     # Safety Check: If response is a raw JSON string (due to model behavior), clean it
+    tracing.begin("cleanup")
     raw_response = result.get("response", "")
     
-    # Aggressive cleaning for nested JSON or prefixed responses
+    # Strip nested JSON, prefixes and leaked fragments (see text_pipeline.clean_model_response)
     if isinstance(raw_response, str):
-        raw_response = raw_response.strip()
-        
-        # 1. Check for standard JSON structures first
-        if (raw_response.startswith("{") or raw_response.startswith('```json\n{')) and '"' in raw_response:
-            try:
-                import json
-                temp_resp = raw_response
-                if temp_resp.startswith('```json'):
-                    temp_resp = temp_resp.replace('```json', '').replace('```', '').strip()
-                
-                cleaned_data = json.loads(temp_resp)
-                if isinstance(cleaned_data, dict):
-                    if "final" in cleaned_data:
-                        inner = cleaned_data["final"]
-                        if isinstance(inner, dict):
-                            raw_response = inner.get("response", str(inner))
-                        else:
-                            raw_response = str(inner)
-                    elif "response" in cleaned_data:
-                        raw_response = cleaned_data.get("response", raw_response)
-            except:
-                pass
-        
-        # 2. Aggressive regex-based stripping of common failure patterns (leaked JSON fragments)
-        import re
-        
-        # Strip common AI-generated JSON prefixes
-        prefixes = [
-            r'^\{"final":\s*\{"response":\s*"',
-            r'^\{"response":\s*"',
-            r'^AI:\s*',
-            r'^Response:\s*'
-        ]
-        for pref in prefixes:
-            raw_response = re.sub(pref, '', raw_response, flags=re.IGNORECASE)
-        
-        # Strip trailing JSON garbage (handles cases like: " , "emotion": "Happy" }} )
-        # This catches any occurrence of "emotion": ... or "response": ... fragments at the end
-        # We look for a pattern that resembles a JSON key-value pair at the end of the string
-        json_garbage_patterns = [
-            # Catch trailing blocks like: )>```json { "response": "...", "emotion": "..." } ```
-            r'\s*\)?\s*>?\s*```json\s*\{.*\}\s*```\s*$',
-            # Catch trailing blocks without backticks: )> { "response": "...", ... }
-            r'\s*\)?\s*>?\s*\{\s*"response"\s*:\s*".*\}\s*$',
-            r'[,]?\s*"?\s*emotion\s*"?\s*:\s*"[^"]*"\s*\}*$',
-            r'[,]?\s*"?\s*response\s*"?\s*:\s*"[^"]*"\s*\}*$',
-            r'"\s*,\s*"[^"]*"\s*:\s*"[^"]*"\s*\}*$',
-            r'"\s*\}\s*$',
-            r'\}\s*$'
-        ]
-        
-        for p in json_garbage_patterns:
-            raw_response = re.sub(p, '', raw_response, flags=re.DOTALL).strip()
-        
-        # Final cleanup: if we're left with a leading or trailing quote that was part of the JSON, remove it
-        if raw_response.startswith('"') and raw_response.endswith('"') and len(raw_response) > 1:
-            raw_response = raw_response[1:-1]
-        elif raw_response.startswith('"'):
-             raw_response = raw_response[1:]
-        elif raw_response.endswith('"'):
-            raw_response = raw_response[:-1]
-        
-        # Nuclear option: remove any standing { or } at the very start or end
-        # (This handles the user's specific "{ remove" request)
-        raw_response = raw_response.strip()
-        while raw_response.startswith('{') or raw_response.endswith('}'):
-            if raw_response.startswith('{'): raw_response = raw_response[1:].strip()
-            if raw_response.endswith('}'): raw_response = raw_response[:-1].strip()
-            if not raw_response: break
-
-        # Additional cleanup for escaped characters if they were left raw
-        raw_response = raw_response.replace('\\n', '\n').replace('\\"', '"').replace('\\t', '\t')
-        
-        raw_response = raw_response.strip()
-        
-        # If after all cleaning we have nothing, provide a generic success message
-        if not raw_response:
-             raw_response = "I have processed your request successfully."
+        raw_response = clean_model_response(raw_response)
+    
+    tracing.end("cleanup")
     
     # Supplement response with emojis from emoji-api.com
-    final_response = emoji_service.augment_text_with_emojis(raw_response, result.get("emotion", "Neutral"))
+    with tracing.span("emoji"):
+        final_response = emoji_service.augment_text_with_emojis(raw_response, result.get("emotion", "Neutral"))
     
     # Send to Google Docs History Service
     try:
         # We use a non-blocking approach (or just a short timeout in the service)
-        docs_history_service.log_search(
-            email=email,
-            query=data.get('prompt', ''),
-            response=final_response
-        )
+        with tracing.span("history"):
+            docs_history_service.log_search(
+                email=email,
+                query=data.get('prompt', ''),
+                response=final_response
+            )
     except Exception as log_err:
         logger.error(f"Failed to log history to Google Docs: {log_err}")
     
@@ -1477,56 +1574,158 @@ def ask():
     })
 
 
+# Largest target_width/target_height /enhance_image asks for (ClipDrop's limit); bigger requests are clamped
+ENHANCE_MAX_TARGET = int(os.getenv("ENHANCE_MAX_TARGET", "4096"))
+
 @app.route('/enhance_image', methods=['POST'])
 def enhance_image():
     """
-    Enhance (upscale) an image using ClipDrop, DeepAI, Picsart, or PicWish fallback.
+    Enhance (upscale) an image using ClipDrop, DeepAI, Picsart, or PicWish fallback,
+    with the local Pillow upscaler as the final tier.
+    mode="fast" skips the network providers and upscales locally straight away.
     """
-    if not clipdrop_assistant and not deepai_assistant and not picsart_assistant and not picwish_assistant:
-        return jsonify({"error": "No image enhancement service configured"}), 500
-        
     try:
-        data = request.json
+        data = request.json or {}
         image_data = data.get('image')
-        target_width = data.get('target_width', 2048)
-        target_height = data.get('target_height', 2048)
+        try:
+            target_width = int(data.get('target_width', 2048))
+            target_height = int(data.get('target_height', 2048))
+        except (TypeError, ValueError):
+            return jsonify({"error": "target_width and target_height must be whole numbers"}), 400
+        if target_width < 1 or target_height < 1:
+            return jsonify({"error": "target_width and target_height must be positive"}), 400
+        target_width, target_height = min(target_width, ENHANCE_MAX_TARGET), min(target_height, ENHANCE_MAX_TARGET)
+        mode = "fast" if data.get('mode') == "fast" else "quality"
         
         if not image_data:
             return jsonify({"error": "No image data provided"}), 400
-            
-        enhanced_image = None
         
-        # Try ClipDrop first
-        if clipdrop_assistant:
-            logger.info("[Image] Enhancing image via ClipDrop...")
-            enhanced_image = clipdrop_assistant.upscale_image(image_data, target_width, target_height)
+        # Decode once (blob handle or data URL); the pipeline validates, normalizes and caches
+        try:
+            image_bytes = blob_store.load_bytes(image_data)
+        except FileNotFoundError:
+            # Blobs are pruned oldest first once the store is full
+            return jsonify({"error": "This image has expired from storage. Please upload it again."}), 404
+        except ValueError:
+            return jsonify({"error": "Invalid image handle or data"}), 400
+        
+        providers = []
+        if mode != "fast":
+            if clipdrop_assistant:
+                providers.append(("ClipDrop", lambda b: clipdrop_assistant.upscale_image(b, target_width, target_height)))
+            if deepai_assistant:
+                providers.append(("DeepAI", deepai_assistant.upscale_image))
+            if picsart_assistant:
+                providers.append(("Picsart", picsart_assistant.upscale_image))
+            if picwish_assistant:
+                providers.append(("PicWish", picwish_assistant.upscale_image))
+        # Zero-network final tier, always available
+        providers.append((LOCAL_PROVIDER, lambda b: local_upscaler.upscale_image(b, target_width, target_height)))
         
-        # If ClipDrop failed, try DeepAI
-        if not enhanced_image and deepai_assistant:
-            logger.info("[Image] ClipDrop failed or unavailable, trying DeepAI...")
-            enhanced_image = deepai_assistant.upscale_image(image_data)
-            
-        # If both failed, try Picsart
-        if not enhanced_image and picsart_assistant:
-            logger.info("[Image] Previous services failed, trying Picsart...")
-            enhanced_image = picsart_assistant.upscale_image(image_data)
-
-        # If all failed, try PicWish
-        if not enhanced_image and picwish_assistant:
-            logger.info("[Image] Previous services failed, trying PicWish...")
-            enhanced_image = picwish_assistant.upscale_image(image_data)
+        try:
+            handle, provider = enhance_pipeline.enhance(image_bytes, providers, target_width, target_height, mode)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        if enhanced_image:
+        if handle:
+            logger.info(f"[OK] Image enhanced via {provider}")
+            enhanced_image = blob_store.as_data_url(handle) if wants_inline_images(data) else blob_store.media_url(handle)
             return jsonify({
                 "success": True,
-                "enhanced_image": enhanced_image
+                "enhanced_image": enhanced_image,
+                "handle": handle,
+                "provider": provider
             }), 200
         else:
             return jsonify({"error": "Failed to enhance image with all available services"}), 500
             
     except Exception as e:
         logger.error(f"Enhance image error: {e}")
-        return jsonify({"error": str(e)}), 500
+        return jsonify({"error": "Image enhancement failed"}), 500
+
+@app.route('/qr/batch', methods=['POST'])
+def qr_batch():
+    """
+    Bulk QR generation. Body: {"items": ["text", {"data": "...", "size": 10, "error_level": "H"}, ...],
+    "format": "png" | "svg", "inline_images": false}. Returns one image per item, in order; PNGs are
+    /media URLs unless inline_images is set, SVGs are always data URLs since /media does not render SVG.
+    size is 1-QR_MAX_SIZE (40) pixels per module, error_level one of L/M/Q/H; anything else is a 400.
+    """
+    data = request.json or {}
+    items = data.get('items') or []
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list"}), 400
+    
+    max_items = int(os.getenv("QR_BATCH_MAX", "50"))
+    if len(items) > max_items:
+        return jsonify({"error": f"At most {max_items} items per batch"}), 400
+    
+    try:
+        images = qr_service.generate_batch(
+            items,
+            size=data.get('size', 10),
+            error_level=data.get('error_level', 'L'),
+            fmt=data.get('format', 'png')
+        )
+        if not wants_inline_images(data) and str(data.get('format', 'png')).lower() != 'svg':
+            images = [blob_store.publish(img) for img in images]
+        return jsonify({"success": True, "count": len(images), "images": images}), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"QR batch error: {e}")
+        return jsonify({"error": "QR generation failed"}), 500
+
+def upload_user():
+    """Email of the registered user making an upload, from a user API key or the form's 'email' field."""
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer globle-'):
+        key_hash = hashlib.sha256(auth[len('Bearer '):].encode()).hexdigest()
+        user = local_db.verify_user_api_key(key_hash)
+        return user["email"] if user else None
+    email = (request.form.get('email') or "").strip().lower()
+    if email and email != 'guest' and local_db.get_user_by_email(email):
+        return email
+    return None
+
+@app.route('/upload', methods=['POST'])
+def upload_attachment():
+    """
+    Multipart upload for chat attachments and payment screenshots.
+    The file is streamed into the content-addressed blob store and a handle is returned,
+    which /ask, /enhance_image and /submit_payment accept in place of a base64 data URL.
+    Only signed-up users (an 'email' form field or a user API key) may upload, and only images and
+    PDFs, whose type is read from the bytes rather than from the client's Content-Type.
+    """
+    if not upload_user():
+        return jsonify({"error": "Unauthorized"}), 401
+    uploaded = request.files.get('file')
+    if not uploaded:
+        return jsonify({"error": "No file provided"}), 400
+    
+    max_bytes = int(os.getenv("UPLOAD_MAX_MB", "20")) * 1024 * 1024
+    try:
+        handle = blob_store.put_stream(
+            uploaded.stream,
+            name=uploaded.filename,
+            max_bytes=max_bytes,
+            detect_type=sniff_upload_type
+        )
+    except UnsupportedType as e:
+        return jsonify({"error": str(e)}), 415
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 413
+    except Exception as e:
+        logger.error(f"Upload error: {e}")
+        return jsonify({"error": "Upload failed"}), 500
+    
+    meta = blob_store.get_meta(handle)
+    return jsonify({
+        "handle": handle,
+        "name": meta.get("name"),
+        "type": meta.get("type"),
+        "size": meta.get("size")
+    }), 200
 
 @app.route('/submit_payment', methods=['POST'])
 
@@ -1567,7 +1766,6 @@ def submit_payment():
             from email.mime.text import MIMEText
             from email.mime.base import MIMEBase
             from email import encoders
-            import base64
             from datetime import datetime
             
             # Email configuration
@@ -1634,14 +1832,8 @@ def submit_payment():
             
             # Attach screenshot
             try:
-                # Extract base64 data from data URL
-                if ',' in screenshot:
-                    screenshot_data = screenshot.split(',')[1]
-                else:
-                    screenshot_data = screenshot
-                
-                # Decode base64
-                image_data = base64.b64decode(screenshot_data)
+                # Blob handle from /upload, or a legacy base64 data URL
+                image_data = blob_store.load_bytes(screenshot)
                 
                 # Create attachment
                 attachment = MIMEBase('application', 'octet-stream')
@@ -1754,27 +1946,59 @@ def admin_upgrade_user():
 # app.register_blueprint(globle_api, url_prefix='/api')
 # logger.info("[OK] Globle-1 API registered at /api/v1/*")
 
+INLINE_MEDIA_TYPES = {"image/png", "image/jpeg", "image/gif", "image/webp"}
+
+@app.route('/media/<path:name>')
+def serve_media(name):
+    """Serves generated images and uploaded blobs by their content hash."""
+    try:
+        handle = f"/media/{name}"
+        # send_file resolves relative paths against the app root, not the working directory the store uses
+        path = os.path.abspath(blob_store.path_for(handle))
+        if not os.path.exists(path):
+            return jsonify({"error": "Not found"}), 404
+        mimetype = blob_store.get_meta(handle).get("type") or "application/octet-stream"
+        # Only raster images render inline; anything else (HTML, SVG, ...) would run on our origin
+        as_attachment = bool(request.args.get('download'))
+        if mimetype not in INLINE_MEDIA_TYPES:
+            mimetype, as_attachment = "application/octet-stream", True
+        # Content-addressed, so the bytes behind a URL never change
+        response = send_file(path, mimetype=mimetype, conditional=True, max_age=31536000,
+                             as_attachment=as_attachment, download_name=name)
+        response.headers['X-Content-Type-Options'] = 'nosniff'
+        return response
+    except ValueError:
+        return jsonify({"error": "Not found"}), 404
+
 @app.route('/download_media')
 def download_media():
     url = request.args.get('url')
     if not url:
         return "No URL provided", 400
     
+    # Our own /media files are served straight from disk instead of proxying back to ourselves
+    parsed = urlparse(url)
+    if parsed.path.startswith('/media/') and parsed.netloc in ('', request.host):
+        return redirect(f"{parsed.path}?download=1")
+    
     try:
-        response = requests.get(url, stream=True, timeout=15)
-        response.raise_for_status()
+        status, headers, body = media_proxy.stream(
+            url,
+            range_header=request.headers.get('Range'),
+            if_none_match=request.headers.get('If-None-Match'),
+            if_modified_since=request.headers.get('If-Modified-Since')
+        )
         
         # Get filename or default
-        filename = url.split('/')[-1].split('?')[0] or f"GlobleXGPT-Download-{int(datetime.now().timestamp())}"
+        filename = secure_filename(url.split('/')[-1].split('?')[0]) or f"GlobleXGPT-Download-{int(datetime.now().timestamp())}"
         if '.' not in filename:
             filename += ".png"
-            
-        return send_file(
-            io.BytesIO(response.content),
-            mimetype=response.headers.get('Content-Type', 'image/png'),
-            as_attachment=True,
-            download_name=filename
-        )
+        
+        headers.setdefault('Content-Type', 'image/png')
+        headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        
+        # Chunks are forwarded as they arrive, so memory stays bounded for large videos
+        return Response(stream_with_context(body), status=status, headers=headers, direct_passthrough=True)
     except Exception as e:
         logger.error(f"Download Error: {e}")
         return redirect(url)
@@ -0,0 +1,95 @@
+"""
+Cold-start benchmark for importing the Flask app (what api/main.py does on every Vercel cold start).
+
+Usage:
+    python benchmarks/bench_cold_start.py [--runs 5] [--top 15]
+
+Each run is a fresh interpreter started with `python -X importtime`. Reports the wall time of
+`import app` with lazily registered providers, the same import followed by importing every
+provider SDK module (what app.py used to do at load), and the slowest modules by cumulative
+import time from the last lazy run.
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROVIDER_MODULES = [
+    "gemini_client", "openrouter_client", "imagen_client", "stability_client", "runway_client",
+    "freepik_client", "huggingface_client", "veo_client", "kling_client", "replicate_client",
+    "github_client", "clipdrop_client", "deepai_client", "picsart_client", "picwish_client",
+    "groq_client", "comet_client", "a1_art_client", "pollinations_client", "logo_dev_client",
+    "chutes_client", "ollama_client", "bytez_client", "search_engine_client", "razorpay",
+    "google.oauth2.id_token",
+]
+
+LAZY = "import app"
+EAGER = "import app, importlib\nfor m in %r:\n    importlib.import_module(m)" % (PROVIDER_MODULES,)
+
+
+def run_once(code):
+    env = dict(os.environ, PREFETCH_ENABLED="false", PROVIDERS_PRELOAD="false")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    return elapsed, proc.stderr
+
+
+def parse_importtime(stderr):
+    """Returns [(cumulative_us, module)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:  self_us | cumulative_us | <indent>module"
+        parts = line.split(":", 1)[1].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            rows.append((int(parts[1]), parts[2].strip()))
+        except ValueError:
+            continue
+    return rows
+
+
+def run(runs, top):
+    results = {}
+    last_lazy = ""
+    for label, code in (("lazy providers", LAZY), ("eager imports", EAGER)):
+        times = []
+        for _ in range(runs):
+            elapsed, stderr = run_once(code)
+            times.append(elapsed)
+            if label == "lazy providers":
+                last_lazy = stderr
+        results[label] = times
+
+    print(f"{'mode':<16} {'median s':>9} {'min s':>7} {'max s':>7}")
+    for label, times in results.items():
+        print(f"{label:<16} {statistics.median(times):>9.3f} {min(times):>7.3f} {max(times):>7.3f}")
+    saved = statistics.median(results["eager imports"]) - statistics.median(results["lazy providers"])
+    print(f"\nCold start saved by lazy providers: {saved:.3f} s (interpreter start-up included in both)")
+
+    rows = parse_importtime(last_lazy)
+    app_row = next((r for r in rows if r[1] == "app"), None)
+    if app_row:
+        print(f"`import app` cumulative (lazy): {app_row[0] / 1000:.1f} ms")
+    print("\nSlowest imports (lazy, cumulative ms):")
+    for cumulative_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    run(args.runs, args.top)
@@ -0,0 +1,212 @@
+"""
+Micro-benchmarks for the pure-CPU steps of a request, with stored baselines.
+
+Usage:
+    python benchmarks/bench_cpu_paths.py                      # compare against the stored baseline
+    python benchmarks/bench_cpu_paths.py --save-baseline      # record a new baseline
+    python benchmarks/bench_cpu_paths.py --threshold 0.15 --filter cleanup
+
+Times response cleanup, intent detection, image/video prompt cleaning, emoji augmentation,
+QR rendering and the base64 round trip of image payloads on realistic fixtures: a short chat
+answer, a ~10KB code answer, adversarial JSON-ish model output and a ~1.5MB image.
+Each case reports the best time per call over several rounds, the figure least disturbed by
+other load on the machine. With a baseline (benchmarks/baselines/cpu_paths.json), cases slower than baseline * (1 + threshold) are
+reported as regressions and the script exits with status 1, so it can gate a deploy.
+Baselines are machine-specific: record them on the machine that runs the check.
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+import platform
+import tempfile
+import itertools
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from text_pipeline import (detect_command, image_request_kind, is_video_request, clean_image_prompt,
+                           clean_video_prompt, clean_model_response)
+from emoji_service import EmojiService
+from qr_service import QRService
+
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baselines", "cpu_paths.json")
+
+SHORT_CHAT = "Hello! 😊 Sure, I can help with that. The weather in Delhi is sunny today, a great time for a walk."
+
+CODE_FUNCTION = '''
+def merge_intervals(intervals):
+    """Merges overlapping [start, end] intervals."""
+    if not intervals:
+        return []
+    intervals.sort(key=lambda item: item[0])
+    merged = [list(intervals[0])]
+    for start, end in intervals[1:]:
+        if start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+'''
+
+# A markdown answer with explanation, numbered steps and code blocks, about 10KB
+CODE_ANSWER = ("Here is a complete solution. 1. Sort the intervals. 2. Walk them once. 3. Merge overlaps.\n\n"
+               + "\n".join(f"### Step {i}\nThis version is fast and easy to test; the idea is to keep the "
+                           f"result list sorted.\n```python{CODE_FUNCTION}```" for i in range(1, 19)))[:10240]
+
+# Model output that leaks JSON around and after the answer, the case the cleanup cascade exists for
+ADVERSARIAL_JSON = ('{"final": {"response": "Sure! Here is the summary:\\n1. The market is up.\\n2. Bitcoin '
+                    'is at a new high.\\n\\"Quoted\\" text with {braces} and a fake key \\"emotion\\": inside.'
+                    + ' Padding sentence about price and stock news.' * 40
+                    + '", "emotion": "Happy"}} ) > ```json {"response": "dup", "emotion": "Happy"} ```')
+BROKEN_JSON = ('{"response": "The answer is 42, but the model never closed this string'
+               + ' and keeps talking about {"nested": "objects"}' * 30
+               + ' ", "emotion": "Thinking" }}}')
+
+PROMPTS = [
+    "hi",
+    "What is the weather in Mumbai tomorrow?",
+    "Generate a cyberpunk image of a city at night with neon rain, highly detailed, 4k",
+    "Can you make me a short video clip of a cat playing piano in a jazz bar",
+    "Explain the difference between TCP and UDP with examples and when to use each one in a real system",
+]
+
+IMAGE_BYTES = random.Random(7).randbytes(1536 * 1024)
+
+
+def bench_cases():
+    emoji = EmojiService(None)
+    qr = QRService(output_dir=tempfile.mkdtemp(prefix="bench-qr-"), cache_size=64)
+    unique = itertools.count()
+    data_url = "data:image/png;base64," + base64.b64encode(IMAGE_BYTES).decode("utf-8")
+
+    return [
+        ("cleanup/short_chat", lambda: clean_model_response(SHORT_CHAT)),
+        ("cleanup/code_10kb", lambda: clean_model_response(CODE_ANSWER)),
+        ("cleanup/adversarial_json", lambda: clean_model_response(ADVERSARIAL_JSON)),
+        ("cleanup/broken_json", lambda: clean_model_response(BROKEN_JSON)),
+        ("intent/detect_prompts", lambda: [(detect_command(p), image_request_kind(p), is_video_request(p)) for p in PROMPTS]),
+        ("intent/detect_code_10kb", lambda: (detect_command(CODE_ANSWER), image_request_kind(CODE_ANSWER))),
+        ("prompt/clean_image", lambda: clean_image_prompt(PROMPTS[2])),
+        ("prompt/clean_video", lambda: clean_video_prompt(PROMPTS[3])),
+        ("emoji/short_chat", lambda: emoji.augment_text_with_emojis(SHORT_CHAT, "Happy")),
+        ("emoji/code_10kb", lambda: emoji.augment_text_with_emojis(CODE_ANSWER, "Neutral")),
+        ("emoji/adversarial_json", lambda: emoji.augment_text_with_emojis(ADVERSARIAL_JSON, "Neutral")),
+        ("qr/generate_uncached", lambda: qr.generate_qr(f"https://globlexgpt.example/p/{next(unique):08d}")),
+        ("qr/generate_cached", lambda: qr.generate_qr("https://globlexgpt.example/")),
+        ("base64/encode_1.5mb", lambda: "data:image/png;base64," + base64.b64encode(IMAGE_BYTES).decode("utf-8")),
+        ("base64/decode_1.5mb", lambda: base64.b64decode(data_url.split(",", 1)[1])),
+    ]
+
+
+def measure(fn, rounds, min_time):
+    """Best seconds per call over the rounds; each round loops long enough (min_time) to dwarf timer overhead."""
+    fn()
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    samples = [elapsed / loops]
+    for _ in range(rounds - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - start) / loops)
+    return min(samples)
+
+
+def commit_id():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def load_baseline(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(path, results):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    baseline = {
+        "commit": commit_id(),
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cases": {name: round(seconds * 1e6, 3) for name, seconds in results.items()},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU micro-benchmarks with baseline regression check")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.05, help="Seconds per round")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("BENCH_REGRESSION_THRESHOLD", "0.25")),
+                        help="Allowed slowdown over baseline (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this")
+    args = parser.parse_args()
+
+    random.seed(0)
+    baseline = None if args.save_baseline else load_baseline(args.baseline)
+    reference = (baseline or {}).get("cases", {})
+
+    results = {}
+    regressions = []
+    print(f"{'case':<28} {'us/call':>12} {'baseline':>12} {'change':>9}")
+    for name, fn in bench_cases():
+        if args.filter and args.filter not in name:
+            continue
+        seconds = measure(fn, args.rounds, args.min_time)
+        results[name] = seconds
+        micros = seconds * 1e6
+        line = f"{name:<28} {micros:>12.2f}"
+        if name in reference:
+            change = micros / reference[name] - 1
+            line += f" {reference[name]:>12.2f} {change:>+8.1%}"
+            if change > args.threshold:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+
+    if args.save_baseline:
+        if args.filter:
+            # Keep the cases that were not re-run
+            merged = {k: v / 1e6 for k, v in (load_baseline(args.baseline) or {}).get("cases", {}).items()}
+            merged.update(results)
+            results = merged
+        save_baseline(args.baseline, results)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+    if baseline is None:
+        print("\nNo baseline found; record one with --save-baseline")
+        return 0
+    if regressions:
+        print(f"\n{len(regressions)} case(s) more than {args.threshold:.0%} slower than baseline "
+              f"({baseline.get('commit', '?')}): {', '.join(regressions)}")
+        return 1
+    print(f"\nNo regressions beyond {args.threshold:.0%} (baseline {baseline.get('commit', '?')})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
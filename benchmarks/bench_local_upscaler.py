@@ -0,0 +1,93 @@
+"""
+Throughput benchmark for the local Pillow upscaler.
+
+Usage:
+    python benchmarks/bench_local_upscaler.py [--sizes 256,512,1024,2048] [--repeat 3] [--target 2048]
+
+Reports, per input size, the mean wall time of one upscale and the throughput in
+output megapixels per second, both in-process and through the LocalUpscaler pool.
+Before timing, checks that tiled output matches an untiled pass at non-integer scales
+(to within float rounding in the resampler) and exits with status 1 if it does not.
+"""
+
+import os
+import sys
+import time
+import argparse
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageChops, ImageStat
+from local_upscaler import upscale_bytes, LocalUpscaler
+
+
+def make_fixture(width, height=None):
+    """A noisy gradient so PNG encoding and sharpening do realistic amounts of work."""
+    size = (width, height or width)
+    img = Image.linear_gradient("L").resize(size).convert("RGB")
+    noise = Image.effect_noise(size, 40).convert("RGB")
+    img = Image.blend(img, noise, 0.3)
+    buffered = BytesIO()
+    img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+# Box resampling recomputes the filter centres per tile, so a coefficient can round differently by one step
+MAX_TILE_DIFF = 8
+MAX_TILE_MEAN_DIFF = 0.05
+
+
+def check_tiling():
+    """Compares tiled and untiled upscales at non-integer scales; returns False on a mismatch."""
+    ok = True
+    for width, height, target in ((900, 700, 2048), (600, 600, 2048), (1300, 517, 3000)):
+        fixture = make_fixture(width, height)
+        tiled = Image.open(BytesIO(upscale_bytes(fixture, target, target, tile_size=256)))
+        untiled = Image.open(BytesIO(upscale_bytes(fixture, target, target, tile_size=max(width, height))))
+        diff = ImageChops.difference(tiled, untiled)
+        max_diff = max(high for _, high in diff.getextrema())
+        mean_diff = max(ImageStat.Stat(diff).mean)
+        passed = tiled.size == untiled.size and max_diff <= MAX_TILE_DIFF and mean_diff <= MAX_TILE_MEAN_DIFF
+        ok = ok and passed
+        print(f"tiling {width}x{height} -> {tiled.size[0]}x{tiled.size[1]}: max diff {max_diff}, "
+              f"mean {mean_diff:.4f} {'ok' if passed else 'MISMATCH'}")
+    return ok
+
+
+def run(sizes, repeat, target, concurrency):
+    upscaler = LocalUpscaler()
+    print(f"{'input':>8} {'output':>11} {'in-proc s':>10} {'MP/s':>7} {'pool s/img':>11} {'pool MP/s':>10}")
+    for size in sizes:
+        fixture = make_fixture(size)
+        scale = max(min(target / size, 4.0), 1.0)
+        out_mp = (round(size * scale) ** 2) / 1e6
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            upscale_bytes(fixture, target, target)
+        in_proc = (time.perf_counter() - start) / repeat
+
+        # Warm the pool so worker start-up is not counted
+        upscaler.upscale_image(fixture, target, target)
+        jobs = repeat * concurrency
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(lambda _: upscaler.upscale_image(fixture, target, target), range(jobs)))
+        pooled = (time.perf_counter() - start) / jobs
+
+        print(f"{size:>8} {round(size * scale):>5}x{round(size * scale):<5} {in_proc:>10.3f} {out_mp / in_proc:>7.1f} "
+              f"{pooled:>11.3f} {out_mp / pooled:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local upscaler throughput by input size")
+    parser.add_argument("--sizes", default="256,512,1024,2048")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--target", type=int, default=2048)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    if not check_tiling():
+        sys.exit(1)
+    run([int(s) for s in args.sizes.split(",")], args.repeat, args.target, args.concurrency)
@@ -0,0 +1,52 @@
+"""
+PNG vs SVG throughput benchmark for QRService.
+
+Usage:
+    python benchmarks/bench_qr.py [--count 200] [--length 60]
+
+Measures uncached single renders for each format, the memoized hit path,
+and a process-pool batch of unique payloads.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qr_service import QRService, render_png, render_svg
+
+
+def payloads(count, length):
+    return [f"https://globlexgpt.example/p/{i:06d}/".ljust(length, "x") for i in range(count)]
+
+
+def timed(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {count / elapsed:>10.0f} codes/s   ({elapsed * 1000 / count:.3f} ms/code)")
+
+
+def run(count, length):
+    items = payloads(count, length)
+    timed("render_png (uncached)", count, lambda: [render_png(p) for p in items])
+    timed("render_svg (uncached)", count, lambda: [render_svg(p) for p in items])
+
+    service = QRService(cache_size=count * 2)
+    for p in items:
+        service.generate_qr(p)
+    timed("generate_qr png (cache hit)", count, lambda: [service.generate_qr(p) for p in items])
+
+    for fmt in ("png", "svg"):
+        batch_service = QRService(cache_size=count * 2)
+        timed(f"generate_batch {fmt} (pool)", count, lambda: batch_service.generate_batch(items, fmt=fmt))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="QR PNG vs SVG throughput")
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--length", type=int, default=60)
+    args = parser.parse_args()
+    run(args.count, args.length)
@@ -0,0 +1,436 @@
+"""
+Load test for the Flask app against local stand-in providers.
+
+Usage:
+    python benchmarks/load_test.py [--concurrency 16] [--duration 60] [--mix standard]
+    python benchmarks/load_test.py --mix chat=70,download=30 --app-workers 4
+    python benchmarks/load_test.py --compare benchmarks/results/<earlier run>.json
+    python benchmarks/load_test.py --target http://127.0.0.1:5000 --sim-url http://127.0.0.1:8099
+
+By default the provider simulator (provider_simulator.py) and the app are both started in this
+process: every provider key is replaced by a fake one pointing at the simulator, so no live API
+is called. The app is served by a threaded WSGI server behind a gate that admits at most
+--app-workers requests at a time, like a gunicorn worker pool, which is what the saturation
+numbers (utilization, queue wait) describe. With --target, an app that is already running is
+driven instead; it must be configured for the simulator itself (provider_simulator.py
+--print-env), and saturation is not measured.
+
+Each client thread sends one request at a time (closed loop), choosing a scenario by weight.
+Reports throughput, p50/p95/p99 latency and error rates per scenario, and writes everything to
+benchmarks/results/ as JSON for comparison between commits (--compare).
+"""
+
+import os
+import io
+import re
+import sys
+import json
+import math
+import time
+import base64
+import random
+import argparse
+import contextlib
+import platform
+import threading
+import subprocess
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# Share of production traffic per scenario (weights, not percentages)
+STANDARD_MIX = {
+    "chat": 62,
+    "search": 6,
+    "weather": 6,
+    "news": 4,
+    "image": 8,
+    "video": 2,
+    "enhance": 4,
+    "download": 8,
+}
+
+CHAT_PROMPTS = [
+    "Explain the difference between a process and a thread",
+    "Write a haiku about the monsoon",
+    "How do I reverse a linked list in Python?",
+    "Summarize the causes of the French Revolution",
+    "What are good names for a coffee shop?",
+    "Translate 'good morning' into Japanese",
+    "Give me a workout plan for beginners",
+    "What is the derivative of x^3 sin(x)?",
+]
+SEARCH_PROMPTS = ["search latest python release", "search best laptops 2025", "look up the tallest building"]
+WEATHER_PROMPTS = ["weather in London", "what's the weather in Mumbai", "weather in Tokyo today"]
+IMAGE_PROMPTS = ["generate an image of a red fox in snow", "create a picture of a neon city", "draw a painting of a lighthouse"]
+VIDEO_PROMPTS = ["generate a video of waves at sunset", "create a video of a rocket launch"]
+
+# /ask answers that mean every provider failed even though the status is 200
+DEGRADED_MARKERS = ("I couldn't get a response", "couldn't generate that", "Rate Limit Reached", "Daily limit reached")
+
+KEY_NAME_RE = re.compile(r"(API_KEY|ACCESS_KEY|SECRET_KEY|TOKEN|_KEY)(_?\d+)?$")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def parse_mix(value):
+    if value == "standard":
+        return dict(STANDARD_MIX)
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in STANDARD_MIX:
+            raise SystemExit(f"Unknown scenario '{name}'; choose from {', '.join(STANDARD_MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def make_images(count, size):
+    """Distinct PNG data URLs, so /enhance_image sees both cache hits and misses."""
+    from PIL import Image
+    images = []
+    rng = random.Random(7)
+    for i in range(count):
+        img = Image.new("RGB", (size, size), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        for _ in range(40):
+            x, y = rng.randrange(size - 16), rng.randrange(size - 16)
+            img.paste((rng.randrange(256), rng.randrange(256), rng.randrange(256)), (x, y, x + 16, y + 16))
+        buf = io.BytesIO()
+        img.save(buf, "PNG")
+        images.append("data:image/png;base64," + base64.b64encode(buf.getvalue()).decode())
+    return images
+
+
+class Scenarios:
+    def __init__(self, sim_url, images, download_files):
+        self.sim_url = sim_url.rstrip("/")
+        self.images = images
+        self.download_files = download_files
+
+    def build(self, name, rng):
+        """(method, path, request kwargs) for one request of scenario name."""
+        if name == "chat":
+            return "POST", "/ask", {"json": {"prompt": rng.choice(CHAT_PROMPTS), "email": "guest"}}
+        if name == "search":
+            return "POST", "/ask", {"json": {"prompt": rng.choice(SEARCH_PROMPTS), "email": "guest"}}
+        if name == "weather":
+            return "POST", "/ask", {"json": {"prompt": rng.choice(WEATHER_PROMPTS), "email": "guest"}}
+        if name == "news":
+            return "POST", "/ask", {"json": {"prompt": "latest news headlines", "email": "guest"}}
+        if name == "image":
+            return "POST", "/ask", {"json": {"prompt": rng.choice(IMAGE_PROMPTS), "email": "pro@example.com"}}
+        if name == "video":
+            return "POST", "/ask", {"json": {"prompt": rng.choice(VIDEO_PROMPTS), "email": "pro@example.com"}}
+        if name == "enhance":
+            return "POST", "/enhance_image", {"json": {"image": rng.choice(self.images), "target_width": 1024,
+                                                       "target_height": 1024, "mode": rng.choice(["fast", "quality"])}}
+        if name == "download":
+            url = f"{self.sim_url}/files/clip-{rng.randrange(self.download_files)}.mp4"
+            return "GET", "/download_media", {"params": {"url": url}, "stream": True}
+        raise ValueError(name)
+
+
+class WorkerGate:
+    """
+    WSGI middleware admitting at most `workers` requests at once. Records how long requests
+    queue for a worker and how busy the workers are.
+    """
+
+    def __init__(self, app, workers):
+        self.app = app
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.reset()
+
+    def reset(self):
+        """Starts the measured window; requests already in flight keep being counted."""
+        with self._lock:
+            self.busy_seconds = 0.0
+            self.max_in_flight = self.in_flight
+            self.waits = []
+            self.started = time.perf_counter()
+
+    def __call__(self, environ, start_response):
+        arrived = time.perf_counter()
+        self._slots.acquire()
+        admitted = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.waits.append(admitted - arrived)
+        try:
+            # Consume the body here so streamed downloads count as busy time
+            result = self.app(environ, start_response)
+            try:
+                body = b"".join(result)
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.busy_seconds += time.perf_counter() - admitted
+            self._slots.release()
+        return [body]
+
+    def summary(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            waits = sorted(self.waits)
+            return {
+                "workers": self.workers,
+                "utilization": round(self.busy_seconds / (self.workers * elapsed), 3) if elapsed else None,
+                "max_in_flight": self.max_in_flight,
+                "queued_share": round(sum(1 for w in waits if w > 0.001) / len(waits), 3) if waits else 0.0,
+                "queue_wait_p50_ms": round(percentile(waits, 50) * 1000, 1) if waits else None,
+                "queue_wait_p95_ms": round(percentile(waits, 95) * 1000, 1) if waits else None,
+            }
+
+
+def configure_env(sim_url):
+    """Points every client at the simulator and blanks real keys so nothing reaches a live API."""
+    from dotenv import dotenv_values
+    from provider_simulator import client_env
+    names = set(os.environ)
+    for path in (".env", ".env.example"):
+        full = os.path.join(ROOT, path)
+        if os.path.exists(full):
+            names.update(dotenv_values(full))
+    for name in names:
+        if KEY_NAME_RE.search(name) and not name.startswith("SIM_"):
+            os.environ[name] = ""
+    os.environ.update(client_env(sim_url))
+    os.environ.update({
+        "OPENROUTER_API_KEY": "sim-openrouter-1", "OPENROUTER_API_KEY_2": "sim-openrouter-2",
+        "GROQ_API_KEY": "sim-groq-1", "GEMINI_API_KEY": "sim-gemini-1",
+        "CHUTES_API_KEY": "sim-chutes-1", "COMET_API_KEY": "sim-comet-1",
+        "FREEPIK_API_KEY": "sim-freepik-1", "FREEPIK_API_KEY_2": "sim-freepik-2",
+        "KLING_ACCESS_KEY": "sim-kling-1", "KLING_SECRET_KEY": "sim-kling-secret-" + "x" * 16,
+        "REPLICATE_API_TOKEN": "sim-replicate-1", "VEO_API_KEY": "sim-veo-1",
+        "SERPER_API_KEY": "sim-serper-1", "TAVILY_API_KEY": "sim-tavily-1",
+        "OPENWEATHER_API_KEY": "sim-openweather", "NEWS_API_KEY": "sim-news",
+        "DUCKDUCKGO_SEARCH_ENABLED": "false", "PREFETCH_ENABLED": "false",
+        "TRACE_SLOW_REQUEST_MS": "0",
+    })
+
+
+def start_server(wsgi_app, port=0):
+    from werkzeug.serving import make_server
+    server = make_server("127.0.0.1", port, wsgi_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def drive(target, scenarios, mix, concurrency, duration, warmup, timeout, seed, gate=None):
+    """Runs the closed-loop clients; returns (samples, measured seconds)."""
+    import requests
+    names, weights = list(mix), list(mix.values())
+    samples = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+    reset_done = threading.Event()
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            if gate is not None and now >= measure_from and not reset_done.is_set():
+                with lock:
+                    if not reset_done.is_set():
+                        gate.reset()
+                        reset_done.set()
+            name = rng.choices(names, weights)[0]
+            method, path, kwargs = scenarios.build(name, rng)
+            sent = time.perf_counter()
+            status, error, degraded = None, None, False
+            try:
+                resp = session.request(method, target + path, timeout=timeout, **kwargs)
+                status = resp.status_code
+                body = resp.content
+                if path == "/ask" and status == 200:
+                    degraded = any(m.encode() in body for m in DEGRADED_MARKERS)
+            except Exception as e:
+                error = type(e).__name__
+            elapsed = time.perf_counter() - sent
+            if sent >= measure_from:
+                with lock:
+                    samples.append((name, elapsed, status, error, degraded))
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(duration + warmup + timeout + 5)
+    return samples, time.perf_counter() - measure_from
+
+
+def outcomes(rows):
+    """Response count per HTTP status, or per exception name for requests that got no response."""
+    counts = {}
+    for row in rows:
+        key = str(row[2]) if row[2] is not None else row[3]
+        counts[key] = counts.get(key, 0) + 1
+    return dict(sorted(counts.items()))
+
+
+def summarize(samples, seconds):
+    def stats(rows):
+        latencies = sorted(r[1] for r in rows)
+        errors = sum(1 for r in rows if r[3] is not None or (r[2] or 0) >= 400)
+        degraded = sum(1 for r in rows if r[4])
+        ms = lambda v: round(v * 1000, 1) if v is not None else None
+        return {
+            "requests": len(rows),
+            "throughput_rps": round(len(rows) / seconds, 2) if seconds else None,
+            "p50_ms": ms(percentile(latencies, 50)),
+            "p95_ms": ms(percentile(latencies, 95)),
+            "p99_ms": ms(percentile(latencies, 99)),
+            "max_ms": ms(latencies[-1] if latencies else None),
+            "error_rate": round(errors / len(rows), 4) if rows else 0.0,
+            "degraded_rate": round(degraded / len(rows), 4) if rows else 0.0,
+            "statuses": outcomes(rows),
+        }
+
+    by_scenario = {}
+    for name in sorted({s[0] for s in samples}):
+        by_scenario[name] = stats([s for s in samples if s[0] == name])
+    return {"overall": stats(samples), "scenarios": by_scenario}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def print_report(result):
+    print(f"\n{'scenario':<10} {'reqs':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'degraded':>9}")
+    rows = list(result["scenarios"].items()) + [("overall", result["overall"])]
+    for name, s in rows:
+        print(f"{name:<10} {s['requests']:>6} {s['throughput_rps']:>8} {s['p50_ms']!s:>9} {s['p95_ms']!s:>9} "
+              f"{s['p99_ms']!s:>9} {s['error_rate']:>7.1%} {s['degraded_rate']:>9.1%}")
+    sat = result.get("saturation")
+    if sat:
+        print(f"\nWorkers: {sat['workers']}  utilization {sat['utilization']:.0%}  max in flight {sat['max_in_flight']}  "
+              f"queued {sat['queued_share']:.0%}  queue wait p50 {sat['queue_wait_p50_ms']} ms / p95 {sat['queue_wait_p95_ms']} ms")
+
+
+def print_comparison(result, baseline):
+    print(f"\nCompared with {baseline.get('commit') or '?'} ({baseline.get('timestamp', '?')}):")
+    print(f"{'scenario':<10} {'rps':>16} {'p50 ms':>18} {'p95 ms':>18} {'errors':>16}")
+    names = list(result["scenarios"]) + ["overall"]
+    for name in names:
+        new = result["overall"] if name == "overall" else result["scenarios"].get(name)
+        old = baseline["overall"] if name == "overall" else baseline.get("scenarios", {}).get(name)
+        if not new or not old:
+            continue
+        cells = []
+        for key in ("throughput_rps", "p50_ms", "p95_ms"):
+            a, b = old.get(key), new.get(key)
+            change = f"{(b - a) / a:+.0%}" if a and b is not None else "n/a"
+            cells.append(f"{a!s:>7}->{b!s:<7}{change:>4}")
+        cells.append(f"{old['error_rate']:.1%}->{new['error_rate']:.1%}")
+        print(f"{name:<10} " + " ".join(f"{c:>17}" for c in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /ask, /enhance_image and /download_media")
+    parser.add_argument("--concurrency", type=int, default=16, help="client threads, each with one request in flight")
+    parser.add_argument("--duration", type=float, default=60, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of load before measuring")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--mix", default="standard", help="'standard' or e.g. chat=70,image=10,download=20")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--app-workers", type=int, default=8, help="concurrent requests the in-process app admits")
+    parser.add_argument("--target", help="URL of an app that is already running (skips the in-process app)")
+    parser.add_argument("--sim-url", help="URL of a simulator that is already running (skips the in-process one)")
+    parser.add_argument("--sim-latency-ms", type=float, default=300, help="provider latency for the in-process simulator")
+    parser.add_argument("--sim-error-rate", type=float, default=0.02)
+    parser.add_argument("--sim-rate-limit-rate", type=float, default=0.02)
+    parser.add_argument("--images", type=int, default=6, help="distinct images used by the enhance scenario")
+    parser.add_argument("--image-size", type=int, default=256)
+    parser.add_argument("--download-files", type=int, default=20, help="distinct files used by the download scenario")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/load-<commit>-<time>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's and clients' output during the run")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    sim_server = app_server = gate = None
+    sim_url = args.sim_url
+    if not sim_url:
+        from provider_simulator import ProviderSimulator, create_app
+        simulator = ProviderSimulator({"latency_ms": args.sim_latency_ms, "error_rate": args.sim_error_rate,
+                                       "rate_limit_rate": args.sim_rate_limit_rate, "retry_after": 2}, seed=args.seed)
+        sim_server, sim_url = start_server(create_app(simulator))
+    target = args.target
+    if not target:
+        configure_env(sim_url)
+        import logging
+        if not args.verbose:
+            # Failures are counted in the report; per-request tracebacks would drown it
+            logging.disable(logging.CRITICAL)
+        from app import app
+        gate = WorkerGate(app.wsgi_app, args.app_workers)
+        app.wsgi_app = gate
+        app_server, target = start_server(app)
+
+    print(f"Load test: {args.concurrency} clients x {args.duration:.0f}s against {target} (providers: {sim_url})")
+    print("Mix: " + ", ".join(f"{k}={v:g}" for k, v in mix.items()))
+    scenarios = Scenarios(sim_url, make_images(args.images, args.image_size) if "enhance" in mix else [], args.download_files)
+    # Several clients print every request; keep the report readable
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with quiet:
+        samples, seconds = drive(target, scenarios, mix, args.concurrency, args.duration, args.warmup, args.timeout, args.seed, gate)
+
+    result = dict(summarize(samples, seconds),
+                  saturation=gate.summary() if gate else None,
+                  commit=git_commit(),
+                  timestamp=datetime.now().isoformat(timespec="seconds"),
+                  python=platform.python_version(),
+                  config={"concurrency": args.concurrency, "duration": args.duration, "warmup": args.warmup,
+                          "mix": mix, "seed": args.seed, "app_workers": args.app_workers if gate else None,
+                          "sim_latency_ms": None if args.sim_url else args.sim_latency_ms,
+                          "sim_error_rate": None if args.sim_url else args.sim_error_rate,
+                          "sim_rate_limit_rate": None if args.sim_url else args.sim_rate_limit_rate,
+                          "target": args.target or "in-process"})
+    print_report(result)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"load-{result['commit'] or 'nogit'}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(result, json.load(f))
+
+    for server in (app_server, sim_server):
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+GlobleXGPT Blob Store
+Content-addressed local storage for uploaded attachments and generated media. Files are
+streamed to disk once, identified by a 'blob:<sha256>' handle, and decoded bytes are kept
+in a small in-memory LRU so every client that needs the same attachment reuses one copy.
+Stored blobs are served back by short '/media/<sha256>.<ext>' URLs.
+Both in-memory LRUs are bounded by bytes (BLOB_MEMORY_MAX_MB each), and the directory is pruned
+oldest first once it grows past BLOB_STORE_MAX_MB.
+"""
+
+import os
+import json
+import base64
+import hashlib
+import logging
+import tempfile
+import mimetypes
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Use /tmp on Vercel since the root is read-only
+if os.environ.get('VERCEL'):
+    DEFAULT_BLOB_DIR = "/tmp/blobs"
+else:
+    DEFAULT_BLOB_DIR = os.path.join("cache", "blobs")
+
+HANDLE_PREFIX = "blob:"
+# Types accepted from /upload, keyed by the format Pillow detects; PDFs are recognised by their magic bytes
+UPLOAD_IMAGE_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "GIF": "image/gif", "WEBP": "image/webp"}
+MEDIA_URL_PREFIX = "/media/"
+
+
+class UnsupportedType(Exception):
+    pass
+
+
+def sniff_upload_type(path):
+    """Content type of an uploaded file judged from its bytes, or None when it is not an allowed type."""
+    try:
+        with open(path, "rb") as f:
+            if f.read(5) == b"%PDF-":
+                return "application/pdf"
+        with Image.open(path) as img:
+            fmt = img.format
+            img.verify()
+        return UPLOAD_IMAGE_TYPES.get(fmt)
+    except Exception:
+        return None
+
+
+class BlobStore:
+    def __init__(self, root=None, max_memory_items=32, max_memory_mb=None, max_disk_mb=None, chunk_size=64 * 1024):
+        self.root = root or os.getenv("BLOB_STORE_DIR", DEFAULT_BLOB_DIR)
+        self.max_memory_items = max_memory_items
+        self.max_memory_bytes = int(max_memory_mb or os.getenv("BLOB_MEMORY_MAX_MB", "64")) * 1024 * 1024
+        self.max_disk_bytes = int(max_disk_mb or os.getenv("BLOB_STORE_MAX_MB", "1024")) * 1024 * 1024
+        self.chunk_size = chunk_size
+        self._memory = OrderedDict()
+        self._data_urls = OrderedDict()
+        # Bytes held by each LRU, keyed by id() of the OrderedDict
+        self._memory_used = {id(self._memory): 0, id(self._data_urls): 0}
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        try:
+            os.makedirs(self.root, exist_ok=True)
+        except Exception as e:
+            logger.error(f"Could not create blob store directory {self.root}: {e}")
+
+    @staticmethod
+    def is_handle(value):
+        """True for 'blob:<sha256>' handles and the '/media/...' URLs that point at them."""
+        return isinstance(value, str) and (value.startswith(HANDLE_PREFIX) or value.startswith(MEDIA_URL_PREFIX))
+
+    def _digest(self, handle):
+        if handle.startswith(HANDLE_PREFIX):
+            digest = handle[len(HANDLE_PREFIX):]
+        elif handle.startswith(MEDIA_URL_PREFIX):
+            digest = handle[len(MEDIA_URL_PREFIX):].split(".")[0]
+        else:
+            digest = handle
+        # Guard against path traversal through crafted handles
+        if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+            raise ValueError(f"Invalid blob handle: {handle[:80]}")
+        return digest
+
+    def path_for(self, handle):
+        return os.path.join(self.root, self._digest(handle))
+
+    def _remember(self, cache, key, value):
+        # Anything bigger than the whole budget is served from disk every time
+        if len(value) > self.max_memory_bytes:
+            return
+        with self._lock:
+            used = self._memory_used[id(cache)]
+            old = cache.pop(key, None)
+            if old is not None:
+                used -= len(old)
+            cache[key] = value
+            used += len(value)
+            while cache and (len(cache) > self.max_memory_items or used > self.max_memory_bytes):
+                _, evicted = cache.popitem(last=False)
+                used -= len(evicted)
+            self._memory_used[id(cache)] = used
+
+    def _prune_disk(self):
+        """Deletes the oldest blobs and their .json sidecars until the store fits max_disk_bytes."""
+        with self._prune_lock:
+            try:
+                entries = []
+                total = 0
+                for name in os.listdir(self.root):
+                    if len(name) != 64:
+                        continue
+                    path = os.path.join(self.root, name)
+                    st = os.stat(path)
+                    entries.append((st.st_mtime, st.st_size, name))
+                    total += st.st_size
+                if total <= self.max_disk_bytes:
+                    return
+                entries.sort()
+                while total > self.max_disk_bytes and entries:
+                    _, size, name = entries.pop(0)
+                    for p in (name, name + ".json"):
+                        try:
+                            os.remove(os.path.join(self.root, p))
+                        except OSError:
+                            pass
+                    total -= size
+                    with self._lock:
+                        for cache, key in ((self._memory, HANDLE_PREFIX + name), (self._data_urls, HANDLE_PREFIX + name)):
+                            value = cache.pop(key, None)
+                            if value is not None:
+                                self._memory_used[id(cache)] -= len(value)
+            except Exception as e:
+                logger.error(f"Blob store prune failed: {e}")
+
+    def _store_file(self, tmp_path, digest):
+        """Moves a finished temp file into place; an existing copy is only touched so pruning keeps it."""
+        final_path = os.path.join(self.root, digest)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+            os.utime(final_path, None)
+            return False
+        os.replace(tmp_path, final_path)
+        return True
+
+    def _write_meta(self, digest, content_type, name, size, overwrite=False):
+        meta_path = os.path.join(self.root, f"{digest}.json")
+        if overwrite or not os.path.exists(meta_path):
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"type": content_type, "name": name, "size": size}, f)
+
+    def put_stream(self, stream, content_type="application/octet-stream", name=None, max_bytes=None, detect_type=None):
+        """
+        Streams a file-like object to disk while hashing it, so large uploads are never held in memory.
+        With detect_type, the content type is taken from the written file instead of content_type
+        (None from detect_type rejects the file with UnsupportedType). Returns the blob handle.
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_bytes and size > max_bytes:
+                        raise ValueError(f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+                    hasher.update(chunk)
+                    out.write(chunk)
+            if detect_type:
+                content_type = detect_type(tmp_path)
+                if not content_type:
+                    raise UnsupportedType("Only JPEG, PNG, GIF, WebP and PDF files can be uploaded")
+            digest = hasher.hexdigest()
+            stored = self._store_file(tmp_path, digest)
+            # A sniffed type replaces whatever type was recorded for the same bytes before
+            self._write_meta(digest, content_type, name, size, overwrite=bool(detect_type))
+            if stored:
+                self._prune_disk()
+            return HANDLE_PREFIX + digest
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put_bytes(self, data, content_type="application/octet-stream", name=None):
+        """Stores raw bytes and returns the blob handle."""
+        digest = hashlib.sha256(data).hexdigest()
+        final_path = os.path.join(self.root, digest)
+        stored = not os.path.exists(final_path)
+        if stored:
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+            with os.fdopen(fd, "wb") as out:
+                out.write(data)
+            os.replace(tmp_path, final_path)
+        else:
+            os.utime(final_path, None)
+        self._write_meta(digest, content_type, name, len(data))
+        if stored:
+            self._prune_disk()
+        handle = HANDLE_PREFIX + digest
+        self._remember(self._memory, handle, data)
+        return handle
+
+    def put_data_url(self, data_url, name=None):
+        """Decodes a base64 data URL once and stores it. Returns the blob handle."""
+        content_type = "application/octet-stream"
+        payload = data_url
+        if data_url.startswith("data:") and "," in data_url:
+            header, payload = data_url.split(",", 1)
+            content_type = header[5:].split(";")[0] or content_type
+        return self.put_bytes(base64.b64decode(payload), content_type, name)
+
+    def get_meta(self, handle):
+        try:
+            with open(self.path_for(handle) + ".json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get_bytes(self, handle):
+        """Returns the bytes for a handle, reading from disk only on a memory miss."""
+        # /media URLs and blob: handles of the same blob share one entry
+        handle = HANDLE_PREFIX + self._digest(handle)
+        with self._lock:
+            data = self._memory.get(handle)
+            if data is not None:
+                self._memory.move_to_end(handle)
+                return data
+        path = self.path_for(handle)
+        with open(path, "rb") as f:
+            data = f.read()
+        # Touch for oldest-first pruning
+        os.utime(path, None)
+        self._remember(self._memory, handle, data)
+        return data
+
+    def load_bytes(self, value):
+        """
+        Accepts a blob handle, a base64 data URL, raw base64 text or bytes and returns the decoded bytes.
+        This is the single place attachments get decoded.
+        """
+        if isinstance(value, (bytes, bytearray)):
+            return bytes(value)
+        if self.is_handle(value):
+            return self.get_bytes(value)
+        if "," in value:
+            value = value.split(",", 1)[1]
+        return base64.b64decode(value)
+
+    def as_data_url(self, value, content_type=None):
+        """
+        Returns a data URL for providers that only accept inline images.
+        Handles are encoded once and memoized; data URLs pass through untouched.
+        """
+        if not self.is_handle(value):
+            return value
+        value = HANDLE_PREFIX + self._digest(value)
+        with self._lock:
+            cached = self._data_urls.get(value)
+            if cached is not None:
+                self._data_urls.move_to_end(value)
+                return cached
+        content_type = content_type or self.get_meta(value).get("type") or "application/octet-stream"
+        data_url = f"data:{content_type};base64,{base64.b64encode(self.get_bytes(value)).decode('utf-8')}"
+        self._remember(self._data_urls, value, data_url)
+        return data_url
+
+    def media_url(self, handle):
+        """Short public URL for a stored blob, with an extension matching its content type."""
+        content_type = self.get_meta(handle).get("type") or "application/octet-stream"
+        ext = mimetypes.guess_extension(content_type) or ".bin"
+        return f"{MEDIA_URL_PREFIX}{self._digest(handle)}{ext}"
+
+    def publish(self, value):
+        """
+        Persists a generated base64 data URL and returns its /media URL.
+        Remote URLs and anything that is not a data URL are returned unchanged.
+        """
+        if not isinstance(value, str) or not value.startswith("data:"):
+            return value
+        return self.media_url(self.put_data_url(value))
+
+
+blob_store = BlobStore()
@@ -1,13 +1,15 @@
 import requests
 import os
 import json
+from rate_limit import check_rate_limit, RateLimited
 
 class BytezClient:
-    def __init__(self, api_key, model=None):
+    def __init__(self, api_key, model=None, base_url=None, key_pool=None):
         self.api_key = api_key
+        self.key_pool = key_pool
         # Default to a powerful model available on Bytez
         self.model = model or "bytez/deepseek-v3"
-        self.base_url = "https://api.bytez.com/v1/chat/completions"
+        self.base_url = base_url or os.getenv("BYTEZ_BASE_URL", "https://api.bytez.com/v1/chat/completions")
 
     def get_full_response(self, prompt, file_data=None):
         headers = {
@@ -50,6 +52,7 @@ class BytezClient:
 
         try:
             response = requests.post(self.base_url, headers=headers, json=payload, timeout=30)
+            check_rate_limit(response, self.key_pool, self.api_key, "Bytez")
             response.raise_for_status()
             
             data = response.json()
@@ -64,6 +67,8 @@ class BytezClient:
             except:
                 return {"response": content, "emotion": "Neutral"}
 
+        except RateLimited:
+            raise
         except Exception as e:
             print(f"Bytez Error: {e}")
             if hasattr(e, 'response') and e.response:
@@ -1,10 +1,13 @@
 import requests
 import json
 import os
+from blob_store import blob_store
+from rate_limit import check_rate_limit, RateLimited
 
 class ChutesClient:
-    def __init__(self, api_key, model=None, base_url=None):
+    def __init__(self, api_key, model=None, base_url=None, key_pool=None):
         self.api_key = api_key
+        self.key_pool = key_pool
         self.model = model or os.getenv("CHUTES_MODEL", "deepseek-ai/DeepSeek-V3")
         self.base_url = base_url or os.getenv("CHUTES_BASE_URL", "https://api.chutes.ai/v1/chat/completions")
 
@@ -38,7 +41,7 @@ class ChutesClient:
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": file_data.get('data')
+                            "url": blob_store.as_data_url(file_data.get('data'), file_type)
                         }
                     }
                 ]
@@ -56,6 +59,7 @@ class ChutesClient:
 
         try:
             response = requests.post(self.base_url, headers=headers, data=json.dumps(payload), timeout=30)
+            check_rate_limit(response, self.key_pool, self.api_key, "Chutes")
             
             if response.status_code != 200:
                 print(f"Chutes Error {response.status_code}: {response.text}")
@@ -90,6 +94,8 @@ class ChutesClient:
                     "emotion": "Neutral"
                 }
                 
+        except RateLimited:
+            raise
         except Exception as e:
             print(f"Error in Chutes response: {e}")
             return {
@@ -0,0 +1,137 @@
+"""
+GlobleXGPT City Gazetteer
+Offline city lookup for the weather intent. Finds the city in a question in one pass over
+its words and maps it to an OpenWeather city id, so "delhi", "Delhi " and "dilli" share one
+cache entry and one upstream call. Names are kept in a sorted array searched with bisect.
+
+The bundled data/cities.tsv covers common cities; set CITY_LIST_PATH to OpenWeather's bulk
+city.list.json(.gz) for full coverage.
+"""
+
+import os
+import re
+import gzip
+import json
+import logging
+import threading
+import unicodedata
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CITY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cities.tsv")
+
+# Words around a city name in weather questions; stripped in one regex pass when no known city matches
+NOISE_RE = re.compile(
+    r"\b(weather|forecast|details|info|report|today|tomorrow|check|now|current|temperature|temp|"
+    r"tell|me|the|about|what|whats|s|is|like|how|in|at|for|of|please|show)\b"
+)
+
+# When several cities share a name, one in these countries beats a namesake elsewhere
+POPULOUS_COUNTRIES = ("IN", "US", "GB", "CN", "JP", "BR", "RU", "DE", "FR", "AU", "CA")
+
+
+def normalize(text):
+    """Lowercase, strips accents and punctuation: "São Paulo!" -> "sao paulo"."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+class City:
+    __slots__ = ("id", "name", "country")
+
+    def __init__(self, city_id, name, country):
+        self.id = city_id
+        self.name = name
+        self.country = country
+
+    def __repr__(self):
+        return f"City({self.id}, {self.name!r}, {self.country!r})"
+
+
+class CityGazetteer:
+    def __init__(self, path=None):
+        self.path = path or os.getenv("CITY_LIST_PATH", DEFAULT_CITY_PATH)
+        self._keys = []
+        self._cities = []
+        self._max_words = 1
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _read_entries(self):
+        """Yields (id, name, country, aliases) from either the bundled TSV or OpenWeather's JSON city list."""
+        if self.path.endswith((".json", ".json.gz")):
+            opener = gzip.open if self.path.endswith(".gz") else open
+            with opener(self.path, "rt", encoding="utf-8") as f:
+                for item in json.load(f):
+                    yield int(item["id"]), item["name"], item.get("country", ""), []
+            return
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                parts = line.rstrip("\n").split("\t")
+                aliases = [a for a in parts[3].split(",") if a.strip()] if len(parts) > 3 else []
+                yield int(parts[0]), parts[1], parts[2] if len(parts) > 2 else "", aliases
+
+    def _load(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            by_key = {}
+            try:
+                for city_id, name, country, aliases in self._read_entries():
+                    city = City(city_id, name, country)
+                    for key in [normalize(name)] + [normalize(a) for a in aliases]:
+                        current = by_key.get(key)
+                        # Earlier rows win, except that a bigger country beats an obscure namesake
+                        if key and (current is None or (country in POPULOUS_COUNTRIES and current.country not in POPULOUS_COUNTRIES)):
+                            by_key[key] = city
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Could not load city list from {self.path}: {e}")
+
+            pairs = sorted(by_key.items())
+            self._keys = [k for k, _ in pairs]
+            self._cities = [c for _, c in pairs]
+            self._max_words = min(max((len(k.split()) for k in self._keys), default=1), 4)
+            self._loaded = True
+            logger.info(f"[Weather] City gazetteer loaded: {len(self._keys)} names")
+
+    def lookup(self, name):
+        """Exact (normalized) city name or alias lookup. Returns a City or None."""
+        self._load()
+        key = normalize(name)
+        i = bisect_left(self._keys, key)
+        if key and i < len(self._keys) and self._keys[i] == key:
+            return self._cities[i]
+        return None
+
+    def find_city(self, text):
+        """The first known city mentioned in text, longest name first ("new delhi" before "delhi")."""
+        self._load()
+        words = normalize(text).split()
+        for i in range(len(words)):
+            for n in range(min(self._max_words, len(words) - i), 0, -1):
+                key = " ".join(words[i:i + n])
+                j = bisect_left(self._keys, key)
+                if j < len(self._keys) and self._keys[j] == key:
+                    return self._cities[j]
+        return None
+
+    def extract(self, text, default="London"):
+        """
+        Returns (City or None, name) for a weather question. Unknown cities fall back to the
+        question with weather wording removed, so OpenWeather can still try them by name.
+        """
+        city = self.find_city(text)
+        if city:
+            return city, city.name
+        leftover = " ".join(NOISE_RE.sub(" ", normalize(text)).split())
+        return None, leftover or default
+
+
+city_gazetteer = CityGazetteer()
@@ -1,7 +1,8 @@
 import requests
-import os
 import base64
-from io import BytesIO
+from blob_store import blob_store
+from key_pool import key_pools
+from rate_limit import observe_rate_limit
 
 class ClipDropClient:
     def __init__(self, api_keys):
@@ -9,12 +10,15 @@ class ClipDropClient:
         if isinstance(api_keys, str):
             self.api_keys = [api_keys]
         else:
-            self.api_keys = api_keys
+            self.api_keys = [k for k in api_keys if k]
+        # Requests rotate across the keys; a rate-limited key cools down for its Retry-After
+        self.key_pool = key_pools.pool("clipdrop", self.api_keys)
         self.base_url = "https://clipdrop-api.co"
 
     def upscale_image(self, image_data_base64, target_width=2048, target_height=2048):
         """
         Upscale an image using ClipDrop API with fallback across multiple keys.
+        image_data_base64: blob handle, base64 data URL or already-decoded bytes
         """
         if not self.api_keys:
             print("ClipDrop Error: No API keys provided")
@@ -22,15 +26,14 @@ class ClipDropClient:
 
         # Prepare image bytes once
         try:
-            if "," in image_data_base64:
-                image_data_base64 = image_data_base64.split(",")[1]
-            image_bytes = base64.b64decode(image_data_base64)
+            image_bytes = blob_store.load_bytes(image_data_base64)
         except Exception as e:
             print(f"ClipDrop Client Error decoding image: {e}")
             return None
 
-        # Try each API key until one succeeds
-        for i, api_key in enumerate(self.api_keys):
+        # Try each usable API key until one succeeds
+        keys = self.key_pool.available_keys()
+        for i, api_key in enumerate(keys):
             try:
                 endpoint = f"{self.base_url}/image-upscaling/v1/upscale"
                 
@@ -47,18 +50,21 @@ class ClipDropClient:
                     "target_height": target_height
                 }
                 
-                print(f"Trying ClipDrop API with key {i+1}/{len(self.api_keys)}...")
+                print(f"Trying ClipDrop API with key {i+1}/{len(keys)}...")
                 response = requests.post(endpoint, headers=headers, files=files, data=data)
+                throttled = observe_rate_limit(response, self.key_pool, api_key) is not None
                 
                 if response.status_code == 200:
                     # ClipDrop returns the binary image data
                     upscaled_base64 = base64.b64encode(response.content).decode("utf-8")
                     return f"data:image/png;base64,{upscaled_base64}"
-                elif response.status_code == 429:
+                elif throttled:
                     print(f"ClipDrop Rate Limit hit for key {i+1}. Trying next key...")
                     continue
                 else:
                     print(f"ClipDrop Error (Key {i+1}): {response.status_code} - {response.text}")
+                    if response.status_code in (401, 403):
+                        self.key_pool.disable(api_key)
                     # If it's a 4xx error (other than 429), it might be worth trying another key if it's an auth issue
                     continue
                     
@@ -66,7 +72,7 @@ class ClipDropClient:
                 print(f"ClipDrop Client Error with key {i+1}: {e}")
                 continue
         
-        print("ClipDrop Error: All API keys failed")
+        print("ClipDrop Error: All API keys failed" if keys else "ClipDrop Error: All API keys are rate limited")
         return None
 
     def cleanup_image(self, image_data_base64, mask_data_base64):
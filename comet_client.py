@@ -1,13 +1,16 @@
 import requests
 import json
+from rate_limit import check_rate_limit, RateLimited
 import os
+from blob_store import blob_store
 
 class CometClient:
-    def __init__(self, api_key, model=None):
+    def __init__(self, api_key, model=None, base_url=None, key_pool=None):
         self.api_key = api_key
+        self.key_pool = key_pool
         # CometAPI usually supports various models. Default to something stable.
         self.model = model or "gpt-4o" 
-        self.base_url = "https://api.cometapi.com/v1/chat/completions"
+        self.base_url = base_url or os.getenv("COMET_BASE_URL", "https://api.cometapi.com/v1/chat/completions")
 
     def get_full_response(self, prompt, file_data=None):
         """Generates response and emotion in a single call, supporting files."""
@@ -43,7 +46,7 @@ class CometClient:
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": file_data.get('data') # This is base64 data URL
+                            "url": blob_store.as_data_url(file_data.get('data'), file_type) # Upstream needs an inline data URL
                         }
                     }
                 ]
@@ -67,6 +70,7 @@ class CometClient:
                 if "json_object" in response.text:
                     del payload["response_format"]
                     response = requests.post(self.base_url, headers=headers, data=json.dumps(payload))
+                check_rate_limit(response, self.key_pool, self.api_key, "CometAPI")
                 
                 if response.status_code != 200:
                     print(f"CometAPI Error {response.status_code}: {response.text}")
@@ -101,6 +105,8 @@ class CometClient:
                     "emotion": "Neutral"
                 }
                 
+        except RateLimited:
+            raise
         except Exception as e:
             print(f"Error in CometAPI response: {e}")
             return {
@@ -1,68 +1,296 @@
 import requests
 import os
+import re
+import json
+import time
+import threading
+from ttl_cache import TTLCache, UpstreamError
+
+# Use /tmp on Vercel since the root is read-only
+if os.environ.get('VERCEL'):
+    DEFAULT_CRYPTO_MAP_PATH = "/tmp/crypto_map.json"
+else:
+    DEFAULT_CRYPTO_MAP_PATH = os.path.join("cache", "crypto_map.json")
+
+# Used until the CMC map has been downloaded (or when no API key is configured)
+FALLBACK_NAMES = {
+    "bitcoin": "BTC", "ethereum": "ETH", "solana": "SOL", "dogecoin": "DOGE", "cardano": "ADA",
+    "ripple": "XRP", "tether": "USDT", "binance coin": "BNB", "litecoin": "LTC", "polkadot": "DOT",
+    "shiba inu": "SHIB", "tron": "TRX", "avalanche": "AVAX", "chainlink": "LINK", "polygon": "MATIC",
+    "toncoin": "TON", "stellar": "XLM", "monero": "XMR", "usd coin": "USDC", "bitcoin cash": "BCH",
+}
+
+# Many coin tickers are ordinary words; lowercase mentions of these never count as a symbol
+SYMBOL_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "coin", "do", "for", "get", "give", "how",
+    "i", "in", "is", "it", "me", "much", "my", "now", "of", "on", "one", "or", "price", "prices",
+    "show", "so", "tell", "the", "to", "today", "up", "us", "usd", "vs", "what", "whats", "worth",
+}
+
 
 class CryptoService:
-    def __init__(self, api_key):
+    def __init__(self, api_key, timeout=10, map_path=None):
         self.api_key = api_key
         self.base_url = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/quotes/latest"
+        self.map_url = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/map"
+        self.timeout = timeout
+        # CMC's free tier refreshes quotes every 60 seconds, so fetching more often only burns credits.
+        # Unknown symbols and failures are remembered for CRYPTO_NEGATIVE_TTL so they are not re-queried each time.
+        self.quote_cache = TTLCache("crypto", ttl=60, negative_ttl=float(os.getenv("CRYPTO_NEGATIVE_TTL", "120")))
+        self.listing_cache = TTLCache("crypto-listings", ttl=120)
 
-    def get_price(self, symbol):
-        """Fetches the latest price for a given cryptocurrency symbol (e.g., BTC, ETH)."""
-        if not self.api_key:
-            return "CoinMarketCap API key not configured."
+        # Symbol/name/slug index built from CMC's map endpoint
+        self.map_path = map_path or os.getenv("CRYPTO_MAP_PATH", DEFAULT_CRYPTO_MAP_PATH)
+        self.map_ttl = int(os.getenv("CRYPTO_MAP_TTL", "86400"))
+        self._symbols = {symbol: None for symbol in FALLBACK_NAMES.values()}
+        self._names = dict(FALLBACK_NAMES)
+        self._max_name_words = 2
+        self._index_loaded_at = 0
+        self._index_attempted_at = 0
+        self._index_lock = threading.Lock()
 
-        headers = {
+    def _headers(self):
+        return {
             'Accepts': 'application/json',
             'X-CMC_PRO_API_KEY': self.api_key,
         }
-        
+
+    # --- Symbol index ---
+
+    def _build_index(self, coins):
+        """coins: list of [symbol, name, slug, rank]; lower rank wins when names or symbols collide."""
+        symbols = {symbol: None for symbol in FALLBACK_NAMES.values()}
+        names = dict(FALLBACK_NAMES)
+        max_words = 2
+        for symbol, name, slug, rank in sorted(coins, key=lambda c: c[3] or 10 ** 9, reverse=True):
+            symbols[symbol] = rank
+            for key in (name.lower(), slug.replace("-", " ")):
+                names[key] = symbol
+                max_words = max(max_words, len(key.split()))
+        self._symbols, self._names = symbols, names
+        self._max_name_words = min(max_words, 4)
+
+    def refresh_symbol_map(self):
+        """Downloads CMC's coin map, stores it on disk and rebuilds the index. Raises on failure."""
+        parameters = {'listing_status': 'active', 'sort': 'cmc_rank', 'limit': '5000'}
+        response = requests.get(self.map_url, headers=self._headers(), params=parameters, timeout=self.timeout)
+        response.raise_for_status()
+        coins = [[c['symbol'].upper(), c['name'], c['slug'], c.get('rank')] for c in response.json()['data']]
+
+        try:
+            os.makedirs(os.path.dirname(self.map_path) or ".", exist_ok=True)
+            tmp_path = f"{self.map_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"updated": time.time(), "coins": coins}, f)
+            os.replace(tmp_path, self.map_path)
+        except OSError as e:
+            print(f"Could not save crypto map: {e}")
+
+        with self._index_lock:
+            self._build_index(coins)
+            self._index_loaded_at = time.time()
+        return len(coins)
+
+    def _ensure_index(self):
+        """Loads the on-disk map once; downloads it when missing or older than a day (at most one attempt an hour)."""
+        if self._index_loaded_at and time.time() - self._index_loaded_at < self.map_ttl:
+            return
+        with self._index_lock:
+            if not self._index_loaded_at:
+                try:
+                    with open(self.map_path, "r", encoding="utf-8") as f:
+                        stored = json.load(f)
+                    self._build_index(stored["coins"])
+                    self._index_loaded_at = stored.get("updated", 0)
+                except (OSError, ValueError, KeyError):
+                    pass
+            needs_refresh = time.time() - self._index_loaded_at >= self.map_ttl
+            if not needs_refresh or not self.api_key or time.time() - self._index_attempted_at < 3600:
+                return
+            self._index_attempted_at = time.time()
+        try:
+            self.refresh_symbol_map()
+        except Exception as e:
+            print(f"Error refreshing crypto map: {e}")
+
+    def load_symbol_map(self):
+        """Scheduler entry point: uses the on-disk map and downloads a new one only once it is older than map_ttl."""
+        self._ensure_index()
+        return len(self._symbols)
+
+    def resolve_symbol(self, text):
+        """Maps a coin name, slug or ticker (any case) to its CMC symbol; unknown input is returned upper-cased."""
+        self._ensure_index()
+        key = " ".join(text.lower().replace("-", " ").split())
+        return self._names.get(key) or text.strip().upper()
+
+    def find_symbols(self, text):
+        """
+        Finds every coin mentioned in free text, in order, e.g. "price of bitcoin and eth" -> ["BTC", "ETH"].
+        Names match in any case; tickers match when written in capitals, or lowercase for top-500 coins that are not common words.
+        """
+        self._ensure_index()
+        tokens = re.findall(r"[A-Za-z0-9][A-Za-z0-9.\-]*", text)
+        found, i = [], 0
+        while i < len(tokens):
+            match = None
+            # Longest name first, so "bitcoin cash" wins over "bitcoin"
+            for n in range(min(self._max_name_words, len(tokens) - i), 0, -1):
+                words = " ".join(t.lower() for t in tokens[i:i + n])
+                symbol = self._names.get(words)
+                if symbol and (n > 1 or words not in SYMBOL_STOPWORDS):
+                    match = (symbol, n)
+                    break
+            if not match:
+                token = tokens[i]
+                rank = self._symbols.get(token.upper(), -1)
+                # Lowercase tickers only count for well-known coins, since thousands of tickers are also words
+                if rank != -1 and (token.isupper() or (token.lower() not in SYMBOL_STOPWORDS and (rank or 0) <= 500)):
+                    match = (token.upper(), 1)
+            if match:
+                if match[0] not in found:
+                    found.append(match[0])
+                i += match[1]
+            else:
+                i += 1
+        return found
+
+    # --- Quotes ---
+
+    def _fetch_quotes(self, symbols):
+        """One quotes/latest call for up to 100 symbols; unknown symbols are skipped instead of failing the batch."""
         parameters = {
-            'symbol': symbol.upper(),
-            'convert': 'USD'
+            'symbol': ",".join(symbols),
+            'convert': 'USD',
+            'skip_invalid': 'true'
         }
+        response = requests.get(self.base_url, headers=self._headers(), params=parameters, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+
+        quotes = {}
+        for symbol, crypto_data in (data.get('data') or {}).items():
+            usd = crypto_data['quote']['USD']
+            quotes[symbol.upper()] = {
+                "name": crypto_data['name'],
+                "price": usd['price'],
+                "percent_change_24h": usd.get('percent_change_24h') or 0.0,
+            }
+        return quotes
+
+    def get_quotes(self, symbols):
+        """
+        Returns {symbol: quote} for the requested symbols, each cached through quote_cache.
+        Every symbol that is not fresh is fetched in the same upstream call; symbols CMC does not
+        know are cached as misses and left out of the result.
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        pending = [s for s in symbols if self.quote_cache.get_fresh(s, record=False) is None]
+        batch = {}
+        failed = []
+        batch_lock = threading.Lock()
+
+        def load(symbol):
+            # The first loader fetches every pending symbol; the others are answered from its batch
+            with batch_lock:
+                if failed:
+                    raise failed[0]
+                if symbol not in batch:
+                    wanted = [symbol] + [s for s in pending if s != symbol and s not in batch]
+                    try:
+                        for start in range(0, len(wanted), 100):
+                            fetched = self._fetch_quotes(wanted[start:start + 100])
+                            for s in wanted[start:start + 100]:
+                                batch[s] = fetched.get(s)
+                    except Exception as e:
+                        failed.append(e)
+                        raise
+            if batch[symbol] is None:
+                raise UpstreamError(f"Unknown symbol {symbol}")
+            return batch[symbol]
+
+        quotes = {}
+        errors = []
+        for symbol in symbols:
+            try:
+                quotes[symbol] = self.quote_cache.get_or_load(symbol, lambda symbol=symbol: load(symbol))
+            except UpstreamError:
+                pass
+            except Exception as e:
+                errors.append(e)
+        # A failed upstream call fails the request, unlike an unknown symbol
+        if errors and not quotes:
+            raise errors[0]
+        return quotes
+
+    @staticmethod
+    def _format_quote(symbol, quote):
+        return f"The current price of {quote['name']} ({symbol}) is ${quote['price']:,.2f}. (24h change: {quote['percent_change_24h']:+.2f}%)"
+
+    def get_price(self, symbol):
+        """Fetches the latest price for a given cryptocurrency symbol (e.g., BTC, ETH)."""
+        if not self.api_key:
+            return "CoinMarketCap API key not configured."
 
         try:
-            response = requests.get(self.base_url, headers=headers, params=parameters)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Navigate the response structure
-            crypto_data = data['data'][symbol.upper()]
-            name = crypto_data['name']
-            price = crypto_data['quote']['USD']['price']
-            percent_change_24h = crypto_data['quote']['USD']['percent_change_24h']
-            
-            return f"The current price of {name} ({symbol.upper()}) is ${price:,.2f}. (24h change: {percent_change_24h:+.2f}%)"
+            quote = self.get_quotes([symbol.upper()]).get(symbol.upper())
+            if not quote:
+                raise KeyError(symbol.upper())
+            return self._format_quote(symbol.upper(), quote)
         except Exception as e:
             print(f"Error fetching crypto price: {e}")
             return f"Sorry, I couldn't fetch the price for {symbol}. Make sure the symbol is correct."
 
+    def get_prices(self, symbols):
+        """Fetches several coins with a single upstream request and returns one line per coin."""
+        if not self.api_key:
+            return "CoinMarketCap API key not configured."
+        if len(symbols) == 1:
+            return self.get_price(symbols[0])
+
+        try:
+            quotes = self.get_quotes(symbols)
+        except Exception as e:
+            print(f"Error fetching crypto prices: {e}")
+            return f"Sorry, I couldn't fetch prices for {', '.join(symbols)} right now."
+
+        lines = []
+        for symbol in symbols:
+            quote = quotes.get(symbol.upper())
+            if quote:
+                lines.append(f"- {self._format_quote(symbol.upper(), quote)}")
+            else:
+                lines.append(f"- Sorry, I couldn't find a price for {symbol}. Make sure the symbol is correct.")
+        return "\n".join(lines)
+
     def get_top_cryptos(self, limit=5):
         """Fetches top N cryptocurrencies by market cap."""
+        try:
+            return self.listing_cache.get_or_load(int(limit), lambda: self._fetch_top_cryptos(limit))
+        except Exception as e:
+            print(f"Error fetching top cryptos: {e}")
+            return "Sorry, I couldn't fetch the top cryptocurrencies right now."
+
+    def refresh_top_cryptos(self, limit=5):
+        """Fetches the top-N listing into the cache ahead of user requests. Raises on failure."""
+        return self.listing_cache.refresh(int(limit), lambda: self._fetch_top_cryptos(limit))
+
+    def _fetch_top_cryptos(self, limit):
         url = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/listings/latest"
-        headers = {
-            'Accepts': 'application/json',
-            'X-CMC_PRO_API_KEY': self.api_key,
-        }
         parameters = {
             'start': '1',
             'limit': str(limit),
             'convert': 'USD'
         }
+        response = requests.get(url, headers=self._headers(), params=parameters, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
 
-        try:
-            response = requests.get(url, headers=headers, params=parameters)
-            response.raise_for_status()
-            data = response.json()
-            
-            top_list = []
-            for item in data['data']:
-                name = item['name']
-                symbol = item['symbol']
-                price = item['quote']['USD']['price']
-                top_list.append(f"{name} ({symbol}): ${price:,.2f}")
-            
-            return "Top Cryptocurrencies:\n" + "\n".join(top_list)
-        except Exception as e:
-            print(f"Error fetching top cryptos: {e}")
-            return "Sorry, I couldn't fetch the top cryptocurrencies right now."
+        top_list = []
+        for item in data['data']:
+            name = item['name']
+            symbol = item['symbol']
+            price = item['quote']['USD']['price']
+            top_list.append(f"{name} ({symbol}): ${price:,.2f}")
+
+        return "Top Cryptocurrencies:\n" + "\n".join(top_list)
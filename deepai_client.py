@@ -1,6 +1,6 @@
 import requests
-import os
 import base64
+from blob_store import blob_store
 
 class DeepAIClient:
     def __init__(self, api_key):
@@ -10,14 +10,11 @@ class DeepAIClient:
     def upscale_image(self, image_data_base64):
         """
         Upscale an image using DeepAI Super Resolution API.
-        image_data_base64: base64 encoded image or data URL
+        image_data_base64: blob handle, base64 encoded image, data URL or bytes
         """
         try:
-            # Handle Data URL if present
-            if "," in image_data_base64:
-                image_data_base64 = image_data_base64.split(",")[1]
-            
-            image_bytes = base64.b64decode(image_data_base64)
+            # Handles blob handles, data URLs and raw bytes
+            image_bytes = blob_store.load_bytes(image_data_base64)
             
             response = requests.post(
                 self.endpoint,
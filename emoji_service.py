@@ -3,6 +3,7 @@ import os
 import random
 import logging
 import re
+from metrics import track_dependency
 
 logger = logging.getLogger(__name__)
 
@@ -69,7 +70,9 @@ class EmojiService:
             
         try:
             url = f"{self.base_url}/emojis?search={keyword}&access_key={self.api_key}"
-            response = requests.get(url, timeout=5)
+            with track_dependency("emoji_api") as call:
+                response = requests.get(url, timeout=5)
+                call["status"] = response.status_code
             if response.status_code == 200:
                 emojis = response.json()
                 if emojis and isinstance(emojis, list):
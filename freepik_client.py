@@ -1,13 +1,15 @@
 import requests
 import base64
 import os
+from rate_limit import check_rate_limit
 
 class FreepikClient:
-    def __init__(self, api_key, model=None):
+    def __init__(self, api_key, model=None, base_url=None, key_pool=None):
         self.api_key = api_key
+        self.key_pool = key_pool
         # Default to mystic, can be flux-dev-realism, flux-dev, etc.
         self.model = model or "mystic" 
-        self.base_url = "https://api.freepik.com/v1/ai/text-to-image"
+        self.base_url = base_url or os.getenv("FREEPIK_BASE_URL", "https://api.freepik.com/v1/ai/text-to-image")
 
     def generate_image(self, prompt):
         """Generates an image from a prompt and returns the base64 data."""
@@ -25,6 +27,7 @@ class FreepikClient:
 
         try:
             response = requests.post(self.base_url, headers=headers, json=payload)
+            check_rate_limit(response, self.key_pool, self.api_key, "Freepik")
             response.raise_for_status()
             data = response.json()
             
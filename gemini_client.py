@@ -1,73 +1,232 @@
-import google.generativeai as genai
+"""
+GlobleXGPT Gemini Client
+Calls the Gemini REST API directly, so every client carries its own API keys instead of the
+process-global genai.configure() that made two clients overwrite each other's key. Several keys
+can be pooled in one client; requests rotate across them and a key that hits its rate limit
+cools down while the others keep serving. The model picked for each key is cached on disk, so
+a cold start does not pay for a ListModels call before the first answer.
+"""
+
 import os
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+import requests
+from blob_store import blob_store
+from key_pool import key_pools
+from rate_limit import observe_rate_limit, RateLimited
+
+logger = logging.getLogger(__name__)
+
+# Use /tmp on Vercel since the root is read-only
+if os.environ.get('VERCEL'):
+    DEFAULT_MODEL_CACHE_PATH = "/tmp/gemini_models.json"
+else:
+    DEFAULT_MODEL_CACHE_PATH = os.path.join("cache", "gemini_models.json")
+
+# Preferred models, best first; anything else that supports generateContent is the last resort
+MODEL_PRIORITIES = [
+    'gemini-2.5-flash', 'gemini-2.5-pro',
+    'gemini-2.0-flash', 'gemini-flash-latest',
+    'gemini-flash-lite-latest', 'gemini-pro-latest',
+    'gemini-2.5-flash-lite', 'gemini-2.0-flash-lite'
+]
+
+_model_cache_lock = threading.Lock()
+
+
+class GeminiError(Exception):
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        # Seconds, as worked out by rate_limit.observe_rate_limit() for a 429
+        self.retry_after = retry_after
+
+
+def key_fingerprint(api_key):
+    """Short hash used to key on-disk state by API key without writing the key itself."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class GeminiKey:
+    """One API key with its selected model."""
 
-class GeminiClient:
     def __init__(self, api_key):
-        if api_key:
-            api_key = api_key.strip()
-        genai.configure(api_key=api_key)
-        
+        self.api_key = api_key
+        self.fingerprint = key_fingerprint(api_key)
         self.model = None
-        # Lazy initialization: _configure_model() will be called when needed in get_full_response
+        self.requests = 0
 
-    def _configure_model(self):
-        """Dynamically find a working model availability."""
+
+class GeminiClient:
+    def __init__(self, api_key, model=None, base_url=None):
+        keys = api_key if isinstance(api_key, (list, tuple)) else [api_key]
+        seen = []
+        for key in keys:
+            key = (key or "").strip()
+            if key and key not in seen:
+                seen.append(key)
+        self.keys = [GeminiKey(k) for k in seen]
+        self._by_key = {k.api_key: k for k in self.keys}
+        # Rotation and Retry-After cooldowns are shared by every client holding the same keys
+        self.key_pool = key_pools.pool("gemini", seen)
+        self.base_url = (base_url or os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")).rstrip("/")
+        # A pinned model skips discovery entirely
+        self.pinned_model = model or os.getenv("GEMINI_MODEL")
+        self.model_cache_path = os.getenv("GEMINI_MODEL_CACHE_PATH", DEFAULT_MODEL_CACHE_PATH)
+        self.model_cache_ttl = int(os.getenv("GEMINI_MODEL_CACHE_TTL", "86400"))
+        self.timeout = int(os.getenv("GEMINI_TIMEOUT", "60"))
+
+    @property
+    def model(self):
+        """Model of the first key that has one; kept for callers that only check it is set."""
+        return next((k.model for k in self.keys if k.model), None)
+
+    def _headers(self, key):
+        # Header auth keeps the key out of URLs, and so out of logs and error messages
+        return {"x-goog-api-key": key.api_key, "Content-Type": "application/json"}
+
+    def _read_model_cache(self):
         try:
-            print("Searching for available Gemini models...")
-            # List all models available to this API key
-            available_models = []
-            for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    available_models.append(m.name)
-            
-            print(f"Found models: {available_models}")
-
-            # clear model names (remove 'models/' prefix if present)
-            clean_models = [m.replace('models/', '') for m in available_models]
-
-            # Priority list - Updated to use current available models
-            priorities = [
-                'gemini-2.5-flash', 'gemini-2.5-pro',
-                'gemini-2.0-flash', 'gemini-flash-latest',
-                'gemini-flash-lite-latest', 'gemini-pro-latest',
-                'gemini-2.5-flash-lite', 'gemini-2.0-flash-lite'
-            ]
-            
-            selected_model_name = None
-            
-            # Check for priority match
-            for p in priorities:
-                # Check for exact match OR 'models/' prefix match
-                if p in clean_models:
-                    selected_model_name = p
-                    break
-                # Check if it exists with 'models/' in the original list
-                for full_m in available_models:
-                    if p in full_m:
-                        selected_model_name = full_m
-                        break
-                if selected_model_name:
-                    break
-            
-            # Fallback to first available if no priority match
-            if not selected_model_name and clean_models:
-                selected_model_name = available_models[0]
-
-            if selected_model_name:
-                print(f"Selected model: {selected_model_name}")
-                self.model = genai.GenerativeModel(selected_model_name)
+            with open(self.model_cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_model_cache(self, fingerprint, model_name):
+        with _model_cache_lock:
+            cache = self._read_model_cache()
+            if model_name:
+                cache[fingerprint] = {"model": model_name, "updated": time.time()}
             else:
-                print("CRITICAL: No text generation models found for this API Key.")
-                
-        except Exception as e:
-            print(f"Error configuring models: {e}")
+                cache.pop(fingerprint, None)
+            try:
+                os.makedirs(os.path.dirname(self.model_cache_path) or ".", exist_ok=True)
+                tmp_path = f"{self.model_cache_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(cache, f)
+                os.replace(tmp_path, self.model_cache_path)
+            except OSError as e:
+                print(f"Could not save Gemini model cache: {e}")
+
+    def _list_models(self, key):
+        models, page_token = [], None
+        while True:
+            params = {"pageSize": 1000}
+            if page_token:
+                params["pageToken"] = page_token
+            response = requests.get(f"{self.base_url}/models", headers=self._headers(key), params=params, timeout=15)
+            wait = observe_rate_limit(response, self.key_pool, key.api_key)
+            if response.status_code != 200:
+                raise GeminiError(f"{response.status_code} listing models: {response.text[:200]}", response.status_code, wait)
+            data = response.json()
+            for m in data.get("models", []):
+                if 'generateContent' in m.get("supportedGenerationMethods", []):
+                    models.append(m["name"].replace("models/", ""))
+            page_token = data.get("nextPageToken")
+            if not page_token:
+                return models
+
+    def _configure_model(self, key):
+        """Picks a model for this key: pinned, cached on disk, or discovered through ListModels."""
+        if self.pinned_model:
+            key.model = self.pinned_model.replace("models/", "")
+            return key.model
+
+        cached = self._read_model_cache().get(key.fingerprint)
+        if cached and time.time() - cached.get("updated", 0) < self.model_cache_ttl:
+            key.model = cached["model"]
+            return key.model
+
+        print("Searching for available Gemini models...")
+        available_models = self._list_models(key)
+        print(f"Found models: {available_models}")
+
+        selected_model_name = next((p for p in MODEL_PRIORITIES if p in available_models), None)
+        if not selected_model_name:
+            selected_model_name = next((m for m in available_models if any(p in m for p in MODEL_PRIORITIES)), None)
+        # Fallback to first available if no priority match
+        if not selected_model_name and available_models:
+            selected_model_name = available_models[0]
+
+        if not selected_model_name:
+            print("CRITICAL: No text generation models found for this API Key.")
+            return None
+
+        print(f"Selected model: {selected_model_name}")
+        key.model = selected_model_name
+        self._write_model_cache(key.fingerprint, selected_model_name)
+        return key.model
+
+    def _pick_keys(self):
+        """Keys to try for one request: the ones not cooling down, in the pool's order."""
+        return [self._by_key[k] for k in self.key_pool.available_keys() if k in self._by_key]
+
+    def _generate(self, key, contents):
+        url = f"{self.base_url}/models/{key.model}:generateContent"
+        response = requests.post(url, headers=self._headers(key), json={"contents": contents}, timeout=self.timeout)
+        key.requests += 1
+        wait = observe_rate_limit(response, self.key_pool, key.api_key)
+        if response.status_code != 200:
+            raise GeminiError(f"{response.status_code} {response.text[:300]}", response.status_code, wait)
+
+        data = response.json()
+        candidates = data.get("candidates") or []
+        if not candidates:
+            reason = (data.get("promptFeedback") or {}).get("blockReason", "no candidates returned")
+            raise GeminiError(f"Response blocked: {reason}")
+        parts = (candidates[0].get("content") or {}).get("parts") or []
+        text = "".join(p.get("text", "") for p in parts)
+        if not text:
+            raise GeminiError(f"Empty response (finish reason: {candidates[0].get('finishReason')})")
+        return text
+
+    def _generate_with_pool(self, contents):
+        """
+        Tries each available key once; a throttled or rejected key is benched and the next one is used.
+        Raises RateLimited when every key is throttled.
+        """
+        keys = self._pick_keys()
+        if not keys:
+            raise RateLimited("Gemini", self.key_pool.seconds_until_available() or None, "every key is cooling down")
+
+        last_error = None
+        for key in keys:
+            try:
+                if not key.model and not self._configure_model(key):
+                    last_error = GeminiError("No AI model available.")
+                    continue
+                try:
+                    return self._generate(key, contents)
+                except GeminiError as e:
+                    if e.status != 404 or self.pinned_model:
+                        raise
+                    # The cached model was retired; pick again once
+                    self._write_model_cache(key.fingerprint, None)
+                    key.model = None
+                    if not self._configure_model(key):
+                        raise
+                    return self._generate(key, contents)
+            except GeminiError as e:
+                # 429s were already recorded on the key pool by observe_rate_limit()
+                last_error = e
+                if e.status in (401, 403):
+                    self.key_pool.disable(key.api_key)
+                elif e.status != 429 and (e.status is None or e.status < 500):
+                    raise
+            except requests.RequestException as e:
+                last_error = e
+        if isinstance(last_error, GeminiError) and last_error.status == 429:
+            raise RateLimited("Gemini", last_error.retry_after or None)
+        raise last_error
 
     def get_full_response(self, prompt, file_data=None):
         """Generates response and emotion in a single call, supporting optional file attachments."""
-        if not self.model:
-            self._configure_model()
-            if not self.model:
-                return {"response": "Error: No AI model available.", "emotion": "Neutral"}
+        if not self.keys:
+            return {"response": "Error: No AI model available.", "emotion": "Neutral"}
 
         system_instruction = (
             "You are Globle-1, an advanced AI model developed by Himanshu. "
@@ -86,78 +245,78 @@ class GeminiClient:
             "9. MULTILINGUAL SUPPORT: You are fluent in all major world languages including Hindi, English, Japanese, French, Spanish, German, etc. Always respond in the SAME LANGUAGE that the user uses to ask the question.\n"
             "10. IMPORTANT: DO NOT attempt to generate images or videos yourslf using text. If a user asks for an image or video, your internal tools will handle it BEFORE it reaches you. If you are reading this, it means the tools were skipped; simply reply 'I am unable to generate that specific media right now.'"
         )
-        
+
         try:
-            content_parts = [f"{system_instruction}\n\nUser: {prompt}"]
-            
+            parts = [{"text": f"{system_instruction}\n\nUser: {prompt}"}]
+
             if file_data and file_data.get('data'):
                 file_type = file_data.get('type', '')
-                
+
                 if file_data.get('isText'):
                     # It's a text file, append content as context
-                    content_parts[0] += f"\n\n[Context from attached file '{file_data.get('name')}']:\n{file_data.get('data')}"
+                    parts[0]["text"] += f"\n\n[Context from attached file '{file_data.get('name')}']:\n{file_data.get('data')}"
                 elif file_type.startswith('image/'):
-                    # It's an image, decode base64
-                    base64_data = file_data.get('data').split(',')[-1]
-                    import base64
-                    image_bytes = base64.b64decode(base64_data)
-                    content_parts.append({
+                    # It's an image: blob handle or base64 data URL, decoded once by the blob store
+                    image_bytes = blob_store.load_bytes(file_data.get('data'))
+                    parts.append({"inline_data": {
                         "mime_type": file_type,
-                        "data": image_bytes
-                    })
+                        "data": base64.b64encode(image_bytes).decode("ascii")
+                    }})
                 else:
                     # Generic fallback
-                    content_parts[0] += f"\n[Attached File: {file_data.get('name')}]"
+                    parts[0]["text"] += f"\n[Attached File: {file_data.get('name')}]"
+
+            text = self._generate_with_pool([{"role": "user", "parts": parts}])
 
-            response = self.model.generate_content(content_parts)
-            
             # Simple parsing if AI follows instructions
-            text = response.text
-            import json
             try:
                 # Use regex or simple split to find JSON if AI adds extra text
                 if "{" in text and "}" in text:
                     start = text.find("{")
                     end = text.rfind("}") + 1
                     data = json.loads(text[start:end])
-                    
+
                     # Be robust: check for 'final' wrapper which some models use
                     if "final" in data and isinstance(data["final"], dict):
                         return {
                             "response": data["final"].get("response", "I'm here to help."),
                             "emotion": data["final"].get("emotion", data.get("emotion", "Neutral"))
                         }
-                    
+
                     return {
                         "response": data.get("response", "I'm here to help."),
                         "emotion": data.get("emotion", "Neutral")
                     }
             except:
                 pass
-            
+
             return {"response": text, "emotion": "Neutral"}
 
+        except RateLimited:
+            # The /ask tier loop moves on to the next tier and words the message if every tier is throttled
+            raise
         except Exception as e:
             error_str = str(e)
+            status = getattr(e, "status", None)
             print(f"Error in Gemini response: {error_str}")
-            
-            if "429" in error_str:
-                return {
-                    "response": "⚠️ **Rate Limit Reached**: The free version of Gemini allows only a few requests per minute. Please wait 30 seconds and try again.",
-                    "emotion": "Neutral"
-                }
-            
-            if "403" in error_str or "PermissionDenied" in error_str:
+
+            if str(e) == "No AI model available.":
+                return {"response": "Error: No AI model available.", "emotion": "Neutral"}
+
+            if status in (401, 403) or "PermissionDenied" in error_str:
                  return {
                     "response": "⚠️ **Access Denied (403)**: The configured Gemini API Key is invalid, expired, or does not have access to the selected model. please check your API key in the .env file.",
                     "emotion": "Sad"
                 }
-            
+
             return {
                 "response": f"I'm having trouble connecting to my brain. Error: {error_str}",
                 "emotion": "Neutral"
             }
 
+    def pool_status(self):
+        return [{"key": k.fingerprint[:6], "model": k.model, "requests": k.requests} for k in self.keys]
+
     def get_response(self, prompt):
         # Kept for compatibility but recommended to use get_full_response
         res = self.get_full_response(prompt)
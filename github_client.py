@@ -1,13 +1,15 @@
 import requests
 import logging
 import os
+from rate_limit import check_rate_limit, RateLimited
 
 logger = logging.getLogger(__name__)
 
 class GitHubClient:
-    def __init__(self, api_key):
+    def __init__(self, api_key, base_url=None, key_pool=None):
         self.api_key = api_key
-        self.base_url = "https://models.inference.ai.azure.com"
+        self.key_pool = key_pool
+        self.base_url = base_url or os.getenv("GITHUB_MODELS_BASE_URL", "https://models.inference.ai.azure.com")
         # Use GITHUB_MODEL from environment if available
         self.model = os.getenv("GITHUB_MODEL", "gpt-4o") 
 
@@ -58,6 +60,7 @@ class GitHubClient:
             # Use specific chat completion endpoint
             endpoint = f"{self.base_url}/chat/completions"
             response = requests.post(endpoint, headers=headers, json=payload, timeout=30)
+            check_rate_limit(response, self.key_pool, self.api_key, "GitHub Models")
             response.raise_for_status()
             
             data = response.json()
@@ -72,6 +75,8 @@ class GitHubClient:
             except:
                 return {"response": content, "emotion": "Neutral"}
 
+        except RateLimited:
+            raise
         except Exception as e:
             logger.error(f"GitHub Models Text Error: {e}")
             return None
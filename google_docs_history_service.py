@@ -9,6 +9,7 @@ import logging
 import sys
 import io
 from datetime import datetime
+from metrics import track_dependency
 
 # Handle Windows terminal encoding for emojis
 if sys.stdout.encoding != 'utf-8':
@@ -49,12 +50,14 @@ class GoogleDocsHistoryService:
             logger.info(f"📤 Sending history to Google Docs: {email}...")
             
             # Use json=data to ensure proper content-type and encoding
-            resp = requests.post(
-                url, 
-                json=data, 
-                timeout=12,
-                allow_redirects=True
-            )
+            with track_dependency("google_docs") as call:
+                resp = requests.post(
+                    url, 
+                    json=data, 
+                    timeout=12,
+                    allow_redirects=True
+                )
+                call["status"] = resp.status_code
             
             # Log the status for debugging
             logger.info(f"💾 Google Docs Response Status: {resp.status_code}")
@@ -13,6 +13,7 @@ import requests
 import logging
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
+from metrics import track_dependency
 
 logger = logging.getLogger(__name__)
 
@@ -31,19 +32,21 @@ class GoogleSheetsService:
             return None
         
         try:
-            if method == "POST":
-                response = requests.post(
-                    self.script_url,
-                    json=data,
-                    timeout=10,
-                    headers={'Content-Type': 'application/json'}
-                )
-            else:  # GET
-                response = requests.get(
-                    self.script_url,
-                    params=data,
-                    timeout=10
-                )
+            with track_dependency("google_sheets") as call:
+                if method == "POST":
+                    response = requests.post(
+                        self.script_url,
+                        json=data,
+                        timeout=10,
+                        headers={'Content-Type': 'application/json'}
+                    )
+                else:  # GET
+                    response = requests.get(
+                        self.script_url,
+                        params=data,
+                        timeout=10
+                    )
+                call["status"] = response.status_code
             
             if response.status_code == 200:
                 return response.json()
@@ -1,12 +1,14 @@
 import requests
 import os
 import json
+from rate_limit import check_rate_limit, RateLimited
 
 class GroqClient:
-    def __init__(self, api_key, model=None):
+    def __init__(self, api_key, model=None, base_url=None, key_pool=None):
         self.api_key = api_key
+        self.key_pool = key_pool
         self.model = model or "llama3-8b-8192"
-        self.base_url = "https://api.groq.com/openai/v1/chat/completions"
+        self.base_url = base_url or os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1/chat/completions")
 
     def get_full_response(self, prompt, file_data=None):
         headers = {
@@ -49,6 +51,7 @@ class GroqClient:
 
         try:
             response = requests.post(self.base_url, headers=headers, json=payload, timeout=30)
+            check_rate_limit(response, self.key_pool, self.api_key, "Groq")
             response.raise_for_status()
             
             data = response.json()
@@ -63,6 +66,8 @@ class GroqClient:
             except:
                 return {"response": content, "emotion": "Neutral"}
 
+        except RateLimited:
+            raise
         except Exception as e:
             print(f"Groq Error: {e}")
             if hasattr(e, 'response') and e.response:
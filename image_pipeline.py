@@ -0,0 +1,130 @@
+"""
+GlobleXGPT Image Enhancement Pipeline
+Decodes and validates an uploaded image once with Pillow, normalizes it before it is sent
+to the upscaling providers, and caches results by image content hash and target size so
+the same image is never paid for twice.
+"""
+
+import os
+import time
+import hashlib
+import logging
+from io import BytesIO
+from PIL import Image, ImageOps
+from blob_store import blob_store
+from metrics import record_provider
+
+logger = logging.getLogger(__name__)
+
+# Use /tmp on Vercel since the root is read-only
+if os.environ.get('VERCEL'):
+    DEFAULT_ENHANCE_CACHE_DIR = "/tmp/enhance_cache"
+else:
+    DEFAULT_ENHANCE_CACHE_DIR = os.path.join("cache", "enhance")
+
+# Results from the on-box upscaler are cached as "fast" so they never shadow a later provider result
+LOCAL_PROVIDER = "Local"
+
+
+class PreparedImage:
+    def __init__(self, data, digest, width, height):
+        self.data = data
+        self.digest = digest
+        self.width = width
+        self.height = height
+
+
+class EnhancePipeline:
+    def __init__(self, store=None, max_input_dim=None, cache_dir=None):
+        self.store = store or blob_store
+        # Upscalers produce the final resolution themselves, so larger inputs only cost upload time
+        self.max_input_dim = int(max_input_dim or os.getenv("ENHANCE_MAX_INPUT_DIM", "1536"))
+        self.cache_dir = cache_dir or os.getenv("ENHANCE_CACHE_DIR", DEFAULT_ENHANCE_CACHE_DIR)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except Exception as e:
+            logger.error(f"Could not create enhance cache directory {self.cache_dir}: {e}")
+
+    def prepare(self, image_bytes, target_width=2048, target_height=2048):
+        """
+        Validates and normalizes an image: EXIF orientation applied, converted to RGB/RGBA PNG,
+        and shrunk so neither side exceeds the input limit or the requested target.
+        Raises ValueError if the bytes are not a readable image.
+        """
+        try:
+            img = Image.open(BytesIO(image_bytes))
+            img.load()
+        except Exception as e:
+            raise ValueError(f"Invalid image: {e}")
+
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+
+        limit = min(self.max_input_dim, max(int(target_width), int(target_height)))
+        if max(img.size) > limit:
+            img.thumbnail((limit, limit), Image.LANCZOS)
+
+        buffered = BytesIO()
+        img.save(buffered, format="PNG")
+        data = buffered.getvalue()
+        return PreparedImage(data, hashlib.sha256(data).hexdigest(), img.width, img.height)
+
+    def _cache_key(self, digest, target_width, target_height, mode):
+        return hashlib.sha256(f"{digest}:{target_width}x{target_height}:{mode}".encode("utf-8")).hexdigest()
+
+    def get_cached(self, key):
+        """Returns the blob handle of a previous result, if its bytes are still in the store."""
+        try:
+            with open(os.path.join(self.cache_dir, key), "r", encoding="utf-8") as f:
+                handle = f.read().strip()
+            if os.path.exists(self.store.path_for(handle)):
+                return handle
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _set_cached(self, key, handle):
+        try:
+            with open(os.path.join(self.cache_dir, key), "w", encoding="utf-8") as f:
+                f.write(handle)
+        except OSError as e:
+            logger.error(f"Could not write enhance cache entry: {e}")
+
+    def enhance(self, image_bytes, providers, target_width=2048, target_height=2048, mode="quality"):
+        """
+        Runs providers in order on the prepared image until one succeeds.
+        providers: list of (name, callable) where callable(png_bytes) returns a data URL or None.
+        Returns (blob_handle, provider_name); provider_name is 'cache' on a hit, (None, None) if all fail.
+        """
+        prepared = self.prepare(image_bytes, target_width, target_height)
+        key = self._cache_key(prepared.digest, target_width, target_height, mode)
+
+        cached = self.get_cached(key)
+        if cached:
+            logger.info(f"[Image] Enhance cache hit for {prepared.digest[:12]}")
+            record_provider("enhance", "cache", "success")
+            return cached, "cache"
+
+        logger.info(f"[Image] Enhancing {prepared.width}x{prepared.height} image ({len(prepared.data) // 1024} KB)")
+        for name, upscale in providers:
+            start = time.perf_counter()
+            try:
+                logger.info(f"[Image] Enhancing image via {name}...")
+                result = upscale(prepared.data)
+                record_provider("enhance", name, "success" if result else "empty", time.perf_counter() - start)
+                if result:
+                    handle = self.store.put_data_url(result)
+                    if name == LOCAL_PROVIDER and mode != "fast":
+                        self._set_cached(self._cache_key(prepared.digest, target_width, target_height, "fast"), handle)
+                    else:
+                        self._set_cached(key, handle)
+                    return handle, name
+                logger.warning(f"[Image] {name} failed or unavailable, trying next service...")
+            except Exception as e:
+                logger.error(f"[FAIL] {name} enhance failure: {e}")
+                record_provider("enhance", name, "error", time.perf_counter() - start)
+        return None, None
+
+
+enhance_pipeline = EnhancePipeline()
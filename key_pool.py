@@ -0,0 +1,247 @@
+"""
+GlobleXGPT Key Pool
+Spreads traffic across several API keys for the same provider instead of always starting with
+key #1. Each key remembers when it was last rate limited and stays cooled down for the
+provider's Retry-After (or a default), while the remaining keys keep serving.
+
+Selection strategy (KEY_POOL_STRATEGY):
+- round_robin (default): available keys in rotating order
+- least_throttled: the key that was rate limited longest ago (or never) first
+Keys that are cooling down are always ordered last, soonest-to-recover first, so a request
+still has something to try when every key is throttled. Quota headers recorded by rate_limit.py
+cool a key down before it is exhausted.
+"""
+
+import os
+import time
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COOLDOWN = float(os.getenv("KEY_POOL_COOLDOWN", "30"))
+MAX_COOLDOWN = float(os.getenv("KEY_POOL_MAX_COOLDOWN", "3600"))
+
+
+def parse_retry_after(value, default=None):
+    """Seconds from a Retry-After header value (delta-seconds or HTTP date); default when missing or invalid."""
+    if value is None or value == "":
+        return default
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return default
+
+
+class KeyState:
+    __slots__ = ("key", "cooldown_until", "last_throttled", "uses", "throttles", "remaining", "limit", "reset_at")
+
+    def __init__(self, key):
+        self.key = key
+        self.cooldown_until = 0.0
+        self.last_throttled = 0.0
+        self.uses = 0
+        self.throttles = 0
+        # Last quota reported by the provider's rate-limit headers
+        self.remaining = None
+        self.limit = None
+        self.reset_at = None
+
+
+class KeyPool:
+    def __init__(self, name, keys=(), strategy=None, cooldown=None):
+        self.name = name
+        self.strategy = (strategy or os.getenv("KEY_POOL_STRATEGY", "round_robin")).lower()
+        self.cooldown = float(cooldown if cooldown is not None else DEFAULT_COOLDOWN)
+        self._states = OrderedDict()
+        self._members = {}
+        self._cursor = 0
+        self._lock = threading.Lock()
+        for key in keys:
+            self.add(key)
+
+    def __len__(self):
+        return len(self._states)
+
+    def add(self, key, member=None):
+        """Adds a key; member is the client object that uses it, for ordering lists of clients."""
+        key = (key or "").strip()
+        if not key:
+            return member
+        with self._lock:
+            if key not in self._states:
+                self._states[key] = KeyState(key)
+            if member is not None:
+                self._members[id(member)] = key
+        return member
+
+    def key_for(self, member):
+        return self._members.get(id(member))
+
+    def _rank(self, keys, now):
+        """Orders keys by the pool strategy: available ones first, cooling ones after."""
+        available = [k for k in keys if self._states[k].cooldown_until <= now]
+        cooling = sorted((k for k in keys if self._states[k].cooldown_until > now),
+                         key=lambda k: self._states[k].cooldown_until)
+        if available:
+            if self.strategy == "least_throttled":
+                available.sort(key=lambda k: (self._states[k].last_throttled, self._states[k].uses))
+            else:
+                start = self._cursor % len(available)
+                available = available[start:] + available[:start]
+                self._cursor += 1
+            self._states[available[0]].uses += 1
+        return available + cooling
+
+    def keys(self):
+        """Every key in the order it should be tried for the next request."""
+        with self._lock:
+            return self._rank(list(self._states), time.time())
+
+    def available_keys(self):
+        """Only the keys that are not cooling down, in the order they should be tried."""
+        with self._lock:
+            now = time.time()
+            return [k for k in self._rank(list(self._states), now) if self._states[k].cooldown_until <= now]
+
+    def order(self, members):
+        """Reorders clients that belong to this pool by their keys; unknown members keep their place at the end."""
+        with self._lock:
+            keyed = [m for m in members if id(m) in self._members]
+            ranked = self._rank(list(dict.fromkeys(self._members[id(m)] for m in keyed)), time.time())
+            position = {key: i for i, key in enumerate(ranked)}
+        return sorted(keyed, key=lambda m: position[self._members[id(m)]]) + [m for m in members if id(m) not in self._members]
+
+    def throttled(self, key, retry_after=None):
+        """Cools a key down after a 429. retry_after is the raw Retry-After header or seconds."""
+        state = self._states.get((key or "").strip())
+        if state is None:
+            return
+        seconds = min(parse_retry_after(retry_after, self.cooldown), MAX_COOLDOWN)
+        now = time.time()
+        with self._lock:
+            # A client that already reported a precise Retry-After wins over the generic report that follows it
+            if retry_after is None and now - state.last_throttled < 2:
+                return
+            state.throttles += 1
+            state.last_throttled = now
+            state.cooldown_until = max(state.cooldown_until, now + seconds) if retry_after is None else now + seconds
+        logger.warning(f"[KeyPool] {self.name} key ...{state.key[-4:]} cooling down for {seconds:.0f}s")
+
+    def record_quota(self, key, remaining=None, limit=None, reset_in=None, reserve=1):
+        """
+        Stores the quota a provider reported for key. A key down to its last `reserve` requests
+        is benched until the window resets, instead of being spent on a guaranteed 429.
+        """
+        state = self._states.get((key or "").strip())
+        if state is None or (remaining is None and limit is None):
+            return
+        now = time.time()
+        with self._lock:
+            state.remaining = remaining
+            state.limit = limit if limit is not None else state.limit
+            state.reset_at = now + reset_in if reset_in is not None else None
+            if remaining is not None and remaining <= reserve:
+                state.cooldown_until = max(state.cooldown_until, now + min(reset_in if reset_in is not None else self.cooldown, MAX_COOLDOWN))
+        if remaining is not None and remaining <= reserve:
+            logger.info(f"[KeyPool] {self.name} key ...{state.key[-4:]} has {remaining} requests left, resting it until its window resets")
+
+    def seconds_until_available(self):
+        """0 when a key is usable now, else how long until the first cooling key recovers."""
+        now = time.time()
+        with self._lock:
+            return max(0.0, min((s.cooldown_until - now for s in self._states.values()), default=0.0))
+
+    def cooling(self, key):
+        state = self._states.get((key or "").strip())
+        return state is not None and state.cooldown_until > time.time()
+
+    def disable(self, key, seconds=600):
+        """Benches a key that was rejected (401/403) so other keys are tried first for a while."""
+        state = self._states.get((key or "").strip())
+        if state is not None:
+            with self._lock:
+                state.cooldown_until = max(state.cooldown_until, time.time() + seconds)
+
+    def throttled_member(self, member, retry_after=None):
+        key = self.key_for(member)
+        if key:
+            self.throttled(key, retry_after)
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "keys": [{
+                    "key": f"...{s.key[-4:]}",
+                    "uses": s.uses,
+                    "throttles": s.throttles,
+                    "cooldown_s": max(0, round(s.cooldown_until - now, 1)),
+                    "remaining": s.remaining,
+                    "limit": s.limit,
+                    "reset_s": max(0, round(s.reset_at - now, 1)) if s.reset_at else None,
+                } for s in self._states.values()],
+            }
+
+
+class KeyPoolRegistry:
+    def __init__(self):
+        self._pools = OrderedDict()
+        self._lock = threading.Lock()
+
+    def pool(self, name, keys=()):
+        """The pool called name, created on first use; keys are added to it."""
+        with self._lock:
+            pool = self._pools.get(name)
+            if pool is None:
+                pool = self._pools[name] = KeyPool(name)
+        for key in keys:
+            pool.add(key)
+        return pool
+
+    def pool_for(self, member):
+        return next((p for p in self._pools.values() if p.key_for(member)), None)
+
+    def order(self, items, member=lambda item: item, group=lambda item: None):
+        """
+        Keeps items in their configured order, except that items whose clients share a pool are
+        rotated among the positions that pool occupies. With group (e.g. the model a tier runs),
+        only items of the same pool and group swap places, so the configured model order holds.
+        """
+        items = list(items)
+        groups = OrderedDict()
+        for i, item in enumerate(items):
+            pool = self.pool_for(member(item))
+            if pool is not None:
+                groups.setdefault((pool.name, group(item)), (pool, []))[1].append(i)
+        for pool, positions in groups.values():
+            if len(positions) < 2:
+                continue
+            by_member = {id(member(items[i])): items[i] for i in positions}
+            ordered = pool.order([member(items[i]) for i in positions])
+            for i, m in zip(positions, ordered):
+                items[i] = by_member[id(m)]
+        return items
+
+    def throttled(self, member, retry_after=None):
+        pool = self.pool_for(member)
+        if pool is not None:
+            pool.throttled_member(member, retry_after)
+
+    def is_cooling(self, member):
+        """True when member's key is rate limited or known to be out of quota right now."""
+        pool = self.pool_for(member)
+        return pool is not None and pool.cooling(pool.key_for(member))
+
+    def status(self):
+        return {name: pool.snapshot() for name, pool in self._pools.items()}
+
+
+key_pools = KeyPoolRegistry()
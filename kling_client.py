@@ -3,14 +3,17 @@ import time
 import os
 import jwt
 import logging
+from rate_limit import check_rate_limit
 
 logger = logging.getLogger(__name__)
 
 class KlingClient:
-    def __init__(self, access_key, secret_key):
+    def __init__(self, access_key, secret_key, base_url=None, key_pool=None):
         self.access_key = access_key
+        self.key_pool = key_pool
         self.secret_key = secret_key
-        self.base_url = "https://api-singapore.klingai.com"
+        self.base_url = base_url or os.getenv("KLING_BASE_URL", "https://api-singapore.klingai.com")
+        self.poll_interval = float(os.getenv("KLING_POLL_INTERVAL", "10"))
 
     def _generate_token(self):
         """Generates a JWT token for Kling AI API authentication."""
@@ -62,6 +65,7 @@ class KlingClient:
             logger.info(f"Starting Kling AI video generation for: {prompt}")
             
             response = requests.post(endpoint, headers=headers, json=payload, timeout=30)
+            check_rate_limit(response, self.key_pool, self.access_key, "Kling AI")
             
             if response.status_code >= 400:
                 err_msg = f"Kling API Error {response.status_code}: {response.text[:200]}"
@@ -88,12 +92,12 @@ class KlingClient:
                     if status_response.status_code >= 400:
                         logger.warning(f"Kling Poll Error: {status_response.status_code}")
                         retries += 1
-                        time.sleep(10)
+                        time.sleep(self.poll_interval)
                         continue
                 except Exception as e:
                     logger.warning(f"Kling Poll Exception: {e}")
                     retries += 1
-                    time.sleep(10)
+                    time.sleep(self.poll_interval)
                     continue
 
                 status_data = status_response.json()
@@ -102,7 +106,7 @@ class KlingClient:
                 
                 logger.info(f"Kling Task {task_id} status: {task_status}")
 
-                if task_status in ["COMPLETED", "SUCCESS", "SUCCEEDED"]:
+                if task_status in ["COMPLETED", "SUCCESS", "SUCCEEDED", "SUCCEED"]:
                     video_info = task_info.get("video_result", {})
                     # For v1.6, result might be in a different field or list
                     video_url = video_info.get("url")
@@ -123,7 +127,7 @@ class KlingClient:
                     raise Exception(f"Kling Task {task_id} failed: {err_detail}")
                 
                 retries += 1
-                time.sleep(10)
+                time.sleep(self.poll_interval)
             
             raise Exception(f"Kling generation timed out for task {task_id}")
 
@@ -0,0 +1,111 @@
+"""
+GlobleXGPT Local Upscaler
+Pillow-based image upscaling (Lanczos resampling + unsharp mask) that runs without any
+network dependency. Large images are processed in overlapping tiles to bound peak memory,
+and work is dispatched to a process pool so it never holds the request thread's GIL.
+"""
+
+import os
+import base64
+import logging
+import threading
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageFilter
+from blob_store import blob_store
+
+logger = logging.getLogger(__name__)
+
+MAX_SCALE = 4.0
+# Output pixels resampled around each tile so the unsharp mask sees the same neighbourhood as an untiled pass
+TILE_PADDING = 16
+
+
+def _sharpen(img):
+    return img.filter(ImageFilter.UnsharpMask(radius=2, percent=80, threshold=2))
+
+
+def upscale_bytes(image_bytes, target_width=2048, target_height=2048, tile_size=512):
+    """
+    Upscales image bytes so the result fits within the target box (at most 4x) and returns PNG bytes.
+    Module-level so it can be pickled into a worker process.
+    """
+    img = Image.open(BytesIO(image_bytes))
+    img.load()
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+
+    width, height = img.size
+    scale = min(target_width / width, target_height / height, MAX_SCALE)
+    scale = max(scale, 1.0)
+    out_width, out_height = round(width * scale), round(height * scale)
+
+    if width * height <= tile_size * tile_size:
+        result = _sharpen(img.resize((out_width, out_height), Image.LANCZOS))
+    else:
+        # Same source-per-output ratios an untiled resize uses, so every tile samples the same grid
+        fx, fy = width / out_width, height / out_height
+        result = Image.new(img.mode, (out_width, out_height))
+        for top in range(0, height, tile_size):
+            for left in range(0, width, tile_size):
+                right, bottom = min(left + tile_size, width), min(top + tile_size, height)
+                # Output tile, plus padding clamped to the image edges
+                ox0, oy0 = round(left * scale), round(top * scale)
+                ox1 = out_width if right == width else round(right * scale)
+                oy1 = out_height if bottom == height else round(bottom * scale)
+                px0, py0 = max(ox0 - TILE_PADDING, 0), max(oy0 - TILE_PADDING, 0)
+                px1, py1 = min(ox1 + TILE_PADDING, out_width), min(oy1 + TILE_PADDING, out_height)
+
+                # Resampling a box of the full source reads the same input pixels as an untiled pass
+                tile = img.resize((px1 - px0, py1 - py0), Image.LANCZOS, box=(px0 * fx, py0 * fy, px1 * fx, py1 * fy))
+                tile = _sharpen(tile)
+                result.paste(tile.crop((ox0 - px0, oy0 - py0, ox1 - px0, oy1 - py0)), (ox0, oy0))
+
+    buffered = BytesIO()
+    result.save(buffered, format="PNG", compress_level=3)
+    return buffered.getvalue()
+
+
+class LocalUpscaler:
+    def __init__(self, max_workers=None, timeout=60, tile_size=512):
+        self.max_workers = int(max_workers or os.getenv("LOCAL_UPSCALE_WORKERS", str(min(2, os.cpu_count() or 1))))
+        self.timeout = timeout
+        self.tile_size = tile_size
+        self._pool = None
+        self._pool_failed = False
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        """Creates the worker pool on first use; falls back to in-process work where pools are unavailable."""
+        if self._pool or self._pool_failed:
+            return self._pool
+        with self._lock:
+            if not self._pool and not self._pool_failed:
+                try:
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                except Exception as e:
+                    logger.warning(f"Local upscaler running in-process, process pool unavailable: {e}")
+                    self._pool_failed = True
+        return self._pool
+
+    def upscale_image(self, image_data_base64, target_width=2048, target_height=2048):
+        """
+        Upscale an image locally.
+        image_data_base64: blob handle, base64 encoded image, data URL or bytes
+        Returns a PNG data URL, or None on failure.
+        """
+        try:
+            image_bytes = blob_store.load_bytes(image_data_base64)
+            pool = self._get_pool()
+            if pool:
+                future = pool.submit(upscale_bytes, image_bytes, target_width, target_height, self.tile_size)
+                output = future.result(timeout=self.timeout)
+            else:
+                output = upscale_bytes(image_bytes, target_width, target_height, self.tile_size)
+            return f"data:image/png;base64,{base64.b64encode(output).decode('utf-8')}"
+        except Exception as e:
+            logger.error(f"Local upscaler error: {e}")
+            return None
+
+
+local_upscaler = LocalUpscaler()
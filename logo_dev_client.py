@@ -1,5 +1,7 @@
 import requests
 import logging
+from key_pool import key_pools
+from rate_limit import observe_rate_limit
 
 logger = logging.getLogger(__name__)
 
@@ -15,13 +17,16 @@ class LogoDevClient:
             self.key_pairs = [key_pairs]
         else:
             self.key_pairs = [kp for kp in key_pairs if kp.get("pk")]
+        # Pairs rotate by publishable key; a rate-limited pair cools down for its Retry-After
+        self._pairs_by_pk = {kp["pk"].strip(): kp for kp in self.key_pairs}
+        self.key_pool = key_pools.pool("logo_dev", list(self._pairs_by_pk))
             
         self.base_url = "https://img.logo.dev/"
 
     def generate_image(self, prompt):
         """
         Attempts to fetch a professional logo from Logo.dev library.
-        Tries all available API key pairs.
+        Tries each API key pair that is not cooling down.
         """
         if not self.key_pairs:
             logger.error("Logo.dev API keys are missing.")
@@ -44,8 +49,8 @@ class LogoDevClient:
             variations.append(f"{identifier}.org")
             variations.append(f"{identifier}.net")
 
-        for key_pair in self.key_pairs:
-            pk = key_pair.get("pk")
+        pks = self.key_pool.available_keys()
+        for pk in pks:
             try:
                 for brand_id in variations:
                     # Use GET for better compatibility with CDNs
@@ -55,6 +60,13 @@ class LogoDevClient:
                     
                     # We use GET with a stream=True to avoid downloading the whole image just to check existence
                     response = requests.get(url, timeout=5, stream=True)
+                    if observe_rate_limit(response, self.key_pool, pk) is not None:
+                        logger.warning(f"✗ Logo.dev rate limit hit for key {pk[:10]}. Trying next key...")
+                        break
+                    if response.status_code in (401, 403):
+                        self.key_pool.disable(pk)
+                        logger.error(f"✗ Logo.dev rejected key {pk[:10]} ({response.status_code})")
+                        break
                     if response.status_code == 200:
                         logger.info(f"✓ Logo.dev found logo for: {brand_id}")
                         return url
@@ -66,4 +78,6 @@ class LogoDevClient:
                 logger.error(f"✗ Logo.dev key pair {pk[:10]} error: {e}")
                 continue 
 
+        if not pks:
+            logger.error("Logo.dev API keys are all rate limited.")
         return None
@@ -0,0 +1,268 @@
+"""
+GlobleXGPT Media Proxy
+Streams remote media (generated videos/images) through the server in fixed-size chunks,
+with HTTP Range support for video seeking and an optional on-disk cache of recently
+proxied files.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import requests
+from email.utils import formatdate, parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+# Use /tmp on Vercel since the root is read-only
+if os.environ.get('VERCEL'):
+    DEFAULT_CACHE_DIR = "/tmp/media_cache"
+else:
+    DEFAULT_CACHE_DIR = os.path.join("cache", "media")
+
+# Upstream response headers that are safe to pass straight through to the browser
+PASSTHROUGH_HEADERS = ["Content-Type", "Content-Length", "Content-Range", "Accept-Ranges", "ETag", "Last-Modified"]
+
+
+def parse_range(range_header, size):
+    """
+    Parses a single-range 'bytes=' header against a known size.
+    Returns (start, end) inclusive, None if the header should be ignored,
+    or False if the range is unsatisfiable.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    # Multiple ranges are rarely used by players; serving the full body is allowed by RFC 7233
+    if "," in spec or "-" not in spec:
+        return None
+
+    start_str, end_str = spec.split("-", 1)
+    try:
+        if not start_str:
+            # Suffix range: last N bytes
+            length = int(end_str)
+            if length <= 0:
+                return False
+            start = max(size - length, 0)
+            end = size - 1
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        return False
+    return start, min(end, size - 1)
+
+
+class MediaProxy:
+    def __init__(self, cache_dir=None, cache_enabled=None, max_cache_mb=None, chunk_size=64 * 1024, timeout=15):
+        self.cache_dir = cache_dir or os.getenv("MEDIA_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if cache_enabled is None:
+            cache_enabled = os.getenv("MEDIA_CACHE_ENABLED", "false").lower() == "true"
+        self.cache_enabled = cache_enabled
+        self.max_cache_bytes = int(max_cache_mb or os.getenv("MEDIA_CACHE_MAX_MB", "512")) * 1024 * 1024
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+        if self.cache_enabled:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+            except Exception as e:
+                logger.error(f"Media cache disabled, could not create {self.cache_dir}: {e}")
+                self.cache_enabled = False
+
+    def _cache_paths(self, url):
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, digest)
+        return digest, base + ".bin", base + ".json"
+
+    def _load_cached(self, url):
+        """Returns the cache metadata for a URL if a complete copy is on disk."""
+        if not self.cache_enabled:
+            return None
+        digest, data_path, meta_path = self._cache_paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if os.path.getsize(data_path) != meta.get("size"):
+                return None
+            # Touch for LRU eviction
+            os.utime(data_path, None)
+            meta["path"] = data_path
+            return meta
+        except (OSError, ValueError):
+            return None
+
+    def _prune_cache(self):
+        """Evicts least recently used entries until the cache fits its size budget."""
+        with self._lock:
+            try:
+                entries = []
+                total = 0
+                for name in os.listdir(self.cache_dir):
+                    if not name.endswith(".bin"):
+                        continue
+                    path = os.path.join(self.cache_dir, name)
+                    st = os.stat(path)
+                    entries.append((st.st_mtime, st.st_size, path))
+                    total += st.st_size
+                entries.sort()
+                while total > self.max_cache_bytes and entries:
+                    _, size, path = entries.pop(0)
+                    for p in (path, path[:-4] + ".json"):
+                        try:
+                            os.remove(p)
+                        except OSError:
+                            pass
+                    total -= size
+            except Exception as e:
+                logger.error(f"Media cache prune failed: {e}")
+
+    @staticmethod
+    def _not_modified(meta, if_none_match, if_modified_since):
+        if if_none_match:
+            tags = [t.strip() for t in if_none_match.split(",")]
+            return "*" in tags or meta.get("etag") in tags
+        if if_modified_since and meta.get("last_modified"):
+            try:
+                return parsedate_to_datetime(meta["last_modified"]) <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _iter_file(self, path, start, length):
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def _serve_cached(self, meta, range_header, if_none_match, if_modified_since):
+        size = meta["size"]
+        headers = {
+            "Content-Type": meta.get("content_type", "application/octet-stream"),
+            "Accept-Ranges": "bytes",
+            "ETag": meta["etag"],
+            "Last-Modified": meta["last_modified"],
+            "X-Media-Cache": "HIT",
+        }
+        if self._not_modified(meta, if_none_match, if_modified_since):
+            return 304, headers, iter(())
+
+        byte_range = parse_range(range_header, size)
+        if byte_range is False:
+            headers["Content-Range"] = f"bytes */{size}"
+            return 416, headers, iter(())
+        if byte_range:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return 206, headers, self._iter_file(meta["path"], start, end - start + 1)
+
+        headers["Content-Length"] = str(size)
+        return 200, headers, self._iter_file(meta["path"], 0, size)
+
+    def _iter_upstream(self, url, response, tee):
+        """Yields upstream chunks; when tee is set, also writes a complete copy into the cache."""
+        digest, data_path, meta_path = self._cache_paths(url)
+        tmp_path = f"{data_path}.{threading.get_ident()}.part"
+        written = 0
+        out = None
+        try:
+            if tee:
+                try:
+                    out = open(tmp_path, "wb")
+                except OSError as e:
+                    logger.error(f"Media cache write failed: {e}")
+
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if not chunk:
+                    continue
+                if out:
+                    out.write(chunk)
+                    written += len(chunk)
+                yield chunk
+
+            if out:
+                out.close()
+                out = None
+                expected = response.headers.get("Content-Length")
+                if expected is None or int(expected) == written:
+                    meta = {
+                        "url": url,
+                        "size": written,
+                        "content_type": response.headers.get("Content-Type", "application/octet-stream"),
+                        "etag": response.headers.get("ETag") or f'"{digest[:32]}-{written}"',
+                        "last_modified": response.headers.get("Last-Modified") or formatdate(time.time(), usegmt=True),
+                    }
+                    os.replace(tmp_path, data_path)
+                    with open(meta_path, "w", encoding="utf-8") as f:
+                        json.dump(meta, f)
+                    self._prune_cache()
+        finally:
+            if out:
+                out.close()
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            response.close()
+
+    def stream(self, url, range_header=None, if_none_match=None, if_modified_since=None):
+        """
+        Proxies a remote media URL without buffering the body.
+        Returns (status_code, headers, body_iterator). Raises on connection errors or upstream 4xx/5xx.
+        """
+        meta = self._load_cached(url)
+        if meta:
+            return self._serve_cached(meta, range_header, if_none_match, if_modified_since)
+
+        # Ask for the raw bytes so Content-Length and Content-Range stay valid when passed through
+        upstream_headers = {"Accept-Encoding": "identity"}
+        if range_header:
+            upstream_headers["Range"] = range_header
+        if if_none_match:
+            upstream_headers["If-None-Match"] = if_none_match
+        if if_modified_since:
+            upstream_headers["If-Modified-Since"] = if_modified_since
+
+        response = requests.get(url, headers=upstream_headers, stream=True, timeout=self.timeout)
+        if response.status_code == 416:
+            # Let the player know the range was bad instead of falling back to a redirect
+            headers = {k: response.headers[k] for k in PASSTHROUGH_HEADERS if k in response.headers}
+            response.close()
+            return 416, headers, iter(())
+        try:
+            response.raise_for_status()
+        except Exception:
+            response.close()
+            raise
+
+        headers = {k: response.headers[k] for k in PASSTHROUGH_HEADERS if k in response.headers}
+        if response.status_code == 304:
+            response.close()
+            return 304, headers, iter(())
+
+        # Only complete bodies are cached; ranged fetches are passed through untouched
+        tee = self.cache_enabled and response.status_code == 200 and not range_header
+        length = response.headers.get("Content-Length")
+        if tee and length and int(length) > self.max_cache_bytes:
+            tee = False
+        if self.cache_enabled:
+            headers["X-Media-Cache"] = "MISS"
+
+        return response.status_code, headers, self._iter_upstream(url, response, tee)
+
+
+media_proxy = MediaProxy()
@@ -0,0 +1,206 @@
+"""
+GlobleXGPT Metrics
+In-process counters and latency histograms, rendered in the Prometheus text format at /metrics.
+- Per-route request counts and latency
+- Per-tier attempts, outcomes and latency for the /ask AI tiers
+- Per-provider outcomes and latency for the image, video, enhance and search cascades
+- Hit rates of every TTLCache and the state of every key pool, read at scrape time
+- Latency of external dependencies (Google Sheets, Google Docs, emoji-api)
+
+Recording is a dict update under a per-metric lock, so it is cheap enough for the hot path.
+"""
+
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Seconds; AI tiers and video providers regularly take tens of seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *values, amount=1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labels, k)} {_number(v)}" for k, v in sorted(values.items())]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *values):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *values)
+
+    def render(self):
+        with self._lock:
+            series = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, [le])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        """Registers func() -> list of exposition lines, called on every scrape (for state owned elsewhere)."""
+        with self._lock:
+            self._collectors.append(func)
+        return func
+
+    def render(self):
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        for collect in collectors:
+            try:
+                lines += collect()
+            except Exception as e:
+                logger.error(f"[Metrics] Collector {getattr(collect, '__name__', collect)} failed: {e}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+http_requests = metrics.counter("globlex_http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status"))
+http_latency = metrics.histogram("globlex_http_request_duration_seconds", "HTTP request latency by route.", ("route", "method"))
+tier_attempts = metrics.counter("globlex_tier_attempts_total", "AI tier attempts by outcome (success, error_response, rate_limited, exception).", ("tier", "outcome"))
+tier_latency = metrics.histogram("globlex_tier_duration_seconds", "AI tier response latency.", ("tier",))
+provider_results = metrics.counter("globlex_provider_results_total", "Media and search provider results by cascade and outcome.", ("cascade", "provider", "outcome"))
+provider_latency = metrics.histogram("globlex_provider_duration_seconds", "Media and search provider latency by cascade.", ("cascade", "provider"))
+dependency_latency = metrics.histogram("globlex_dependency_duration_seconds", "External dependency call latency by outcome.", ("dependency", "outcome"))
+
+
+def record_tier(tier, outcome, seconds):
+    tier_attempts.inc(tier, outcome)
+    tier_latency.observe(seconds, tier)
+
+
+def record_provider(cascade, provider, outcome, seconds=None):
+    """outcome: success, empty, error or skipped; seconds is omitted for providers that were not called."""
+    provider_results.inc(cascade, provider, outcome)
+    if seconds is not None:
+        provider_latency.observe(seconds, cascade, provider)
+
+
+@contextmanager
+def track_dependency(name):
+    """
+    Times a call to an external dependency. An exception escaping the block, or a status of
+    400 or more stored in call["status"], counts as an error.
+    """
+    start = time.perf_counter()
+    call = {"status": None}
+    outcome = "error"
+    try:
+        yield call
+        outcome = "error" if (call["status"] or 0) >= 400 else "ok"
+    finally:
+        dependency_latency.observe(time.perf_counter() - start, name, outcome)
+
+
+@metrics.collector
+def _cache_metrics():
+    from ttl_cache import all_caches
+    caches = sorted((name, cache.snapshot()) for name, cache in all_caches().items())
+    lines = ["# HELP globlex_cache_lookups_total TTLCache lookups by result.", "# TYPE globlex_cache_lookups_total counter"]
+    for name, snap in caches:
+        for result in ("hits", "stale_hits", "negative_hits", "misses"):
+            lines.append(f"globlex_cache_lookups_total{_labels(('cache', 'result'), (name, result))} {snap[result]}")
+    lines += ["# HELP globlex_cache_hit_ratio Share of TTLCache lookups served from the cache.", "# TYPE globlex_cache_hit_ratio gauge"]
+    lines += [f"globlex_cache_hit_ratio{_labels(('cache',), (name,))} {snap['hit_rate']}" for name, snap in caches]
+    lines += ["# HELP globlex_cache_entries Entries held by each TTLCache.", "# TYPE globlex_cache_entries gauge"]
+    lines += [f"globlex_cache_entries{_labels(('cache',), (name,))} {snap['size']}" for name, snap in caches]
+    return lines
+
+
+@metrics.collector
+def _key_pool_metrics():
+    from key_pool import key_pools
+    pools = sorted(key_pools.status().items())
+    lines = ["# HELP globlex_key_pool_keys API keys per pool by state.", "# TYPE globlex_key_pool_keys gauge"]
+    for name, snap in pools:
+        cooling = sum(1 for k in snap["keys"] if k["cooldown_s"] > 0)
+        lines.append(f"globlex_key_pool_keys{_labels(('pool', 'state'), (name, 'available'))} {len(snap['keys']) - cooling}")
+        lines.append(f"globlex_key_pool_keys{_labels(('pool', 'state'), (name, 'cooling'))} {cooling}")
+    lines += ["# HELP globlex_key_pool_throttles_total Rate-limit responses received per pool.", "# TYPE globlex_key_pool_throttles_total counter"]
+    lines += [f"globlex_key_pool_throttles_total{_labels(('pool',), (name,))} {sum(k['throttles'] for k in snap['keys'])}" for name, snap in pools]
+    return lines
@@ -1,5 +1,6 @@
 import requests
 import logging
+from ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
@@ -7,34 +8,41 @@ class NASAClient:
     def __init__(self, api_key, base_url="https://api.nasa.gov/"):
         self.api_key = api_key
         self.base_url = base_url
+        # APOD changes once a day; the scheduler re-checks well inside this window
+        self.apod_cache = TTLCache("apod", ttl=21600)
 
     def get_apod(self):
         """
         Fetches the Astronomy Picture of the Day (APOD).
         Returns a dictionary with title, explanation, and image URL.
         """
-        endpoint = f"{self.base_url}planetary/apod"
-        params = {
-            "api_key": self.api_key
-        }
         try:
-            response = requests.get(endpoint, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "title": data.get("title"),
-                    "explanation": data.get("explanation"),
-                    "url": data.get("url"),
-                    "hdurl": data.get("hdurl", data.get("url")),
-                    "media_type": data.get("media_type")
-                }
-            else:
-                logger.error(f"NASA API Error: {response.status_code} - {response.text}")
-                return None
+            return self.apod_cache.get_or_load("apod", self._fetch_apod)
         except Exception as e:
             logger.error(f"NASA Client error: {e}")
             return None
 
+    def refresh_apod(self):
+        """Fetches today's APOD into the cache ahead of user requests. Raises on failure."""
+        return self.apod_cache.refresh("apod", self._fetch_apod)
+
+    def _fetch_apod(self):
+        endpoint = f"{self.base_url}planetary/apod"
+        params = {
+            "api_key": self.api_key
+        }
+        response = requests.get(endpoint, params=params, timeout=10)
+        if response.status_code == 200:
+            data = response.json()
+            return {
+                "title": data.get("title"),
+                "explanation": data.get("explanation"),
+                "url": data.get("url"),
+                "hdurl": data.get("hdurl", data.get("url")),
+                "media_type": data.get("media_type")
+            }
+        raise RuntimeError(f"NASA API Error: {response.status_code} - {response.text}")
+
     def search_images(self, query):
         """
         Searches the NASA Image and Video Library.
@@ -1,10 +1,12 @@
 import requests
 import json
 import os
+from rate_limit import check_rate_limit, RateLimited
 
 class OllamaClient:
-    def __init__(self, api_key, model=None, base_url=None):
+    def __init__(self, api_key, model=None, base_url=None, key_pool=None):
         self.api_key = api_key
+        self.key_pool = key_pool
         self.model = model or os.getenv("OLLAMA_MODEL", "deepseek-v3")
         self.base_url = base_url or os.getenv("OLLAMA_BASE_URL", "https://ollama.com/api/chat")
 
@@ -40,6 +42,7 @@ class OllamaClient:
 
         try:
             response = requests.post(self.base_url, headers=headers, json=payload, timeout=30)
+            check_rate_limit(response, self.key_pool, self.api_key, "Ollama")
             
             if response.status_code != 200:
                 print(f"Ollama Error {response.status_code}: {response.text}")
@@ -70,6 +73,8 @@ class OllamaClient:
                     "emotion": "Neutral"
                 }
                 
+        except RateLimited:
+            raise
         except Exception as e:
             print(f"Error in Ollama response: {e}")
             return {
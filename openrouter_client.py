@@ -1,12 +1,16 @@
 import requests
 import json
 import os
+from blob_store import blob_store
+from rate_limit import check_rate_limit, RateLimited
 
 class OpenRouterClient:
-    def __init__(self, api_key, model=None):
+    def __init__(self, api_key, model=None, base_url=None, key_pool=None):
         self.api_key = api_key
+        # Shared with the other OpenRouter tiers so a 429 here moves traffic to their keys
+        self.key_pool = key_pool
         self.model = model or "deepseek/deepseek-chat"
-        self.base_url = "https://openrouter.ai/api/v1/chat/completions"
+        self.base_url = base_url or os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1/chat/completions")
 
     def get_full_response(self, prompt, file_data=None):
         """Generates response and emotion in a single call, supporting files."""
@@ -44,7 +48,7 @@ class OpenRouterClient:
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": file_data.get('data') # This is base64 data URL
+                            "url": blob_store.as_data_url(file_data.get('data'), file_type) # Upstream needs an inline data URL
                         }
                     }
                 ]
@@ -66,6 +70,7 @@ class OpenRouterClient:
 
         try:
             response = requests.post(self.base_url, headers=headers, data=json.dumps(payload))
+            check_rate_limit(response, self.key_pool, self.api_key, "OpenRouter")
             
             # log raw response if status not 200
             if response.status_code != 200:
@@ -118,6 +123,8 @@ class OpenRouterClient:
                     "emotion": "Neutral"
                 }
                 
+        except RateLimited:
+            raise
         except Exception as e:
             print(f"Error in OpenRouter response: {e}")
             return {
@@ -1,6 +1,8 @@
 import requests
-import os
 import base64
+from blob_store import blob_store
+from key_pool import key_pools
+from rate_limit import observe_rate_limit
 
 class PicsartClient:
     def __init__(self, api_keys):
@@ -8,13 +10,15 @@ class PicsartClient:
         if isinstance(api_keys, str):
             self.api_keys = [api_keys]
         else:
-            self.api_keys = api_keys
+            self.api_keys = [k for k in api_keys if k]
+        # Requests rotate across the keys; throttled or spent keys are skipped until they recover
+        self.key_pool = key_pools.pool("picsart", self.api_keys)
         self.endpoint = "https://api.picsart.io/tools/1.0/upscale"
 
     def upscale_image(self, image_data_base64, upscale_factor=2):
         """
         Upscale an image using Picsart Upscale API with fallback across multiple keys.
-        image_data_base64: base64 encoded image or data URL
+        image_data_base64: blob handle, base64 encoded image, data URL or bytes
         upscale_factor: factor byte to upscale (2, 4, 6, 8)
         """
         if not self.api_keys:
@@ -23,15 +27,14 @@ class PicsartClient:
 
         # Prepare image bytes once
         try:
-            if "," in image_data_base64:
-                image_data_base64 = image_data_base64.split(",")[1]
-            image_bytes = base64.b64decode(image_data_base64)
+            image_bytes = blob_store.load_bytes(image_data_base64)
         except Exception as e:
             print(f"Picsart Client Error decoding image: {e}")
             return None
 
-        # Try each API key until one succeeds
-        for i, api_key in enumerate(self.api_keys):
+        # Try each usable API key until one succeeds
+        keys = self.key_pool.available_keys()
+        for i, api_key in enumerate(keys):
             try:
                 headers = {
                     "X-Picsart-API-Key": api_key,
@@ -46,8 +49,9 @@ class PicsartClient:
                     "upscale_factor": upscale_factor
                 }
                 
-                print(f"Trying Picsart API with key {i+1}/{len(self.api_keys)}...")
+                print(f"Trying Picsart API with key {i+1}/{len(keys)}...")
                 response = requests.post(self.endpoint, headers=headers, files=files, data=data)
+                throttled = observe_rate_limit(response, self.key_pool, api_key) is not None
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -60,7 +64,7 @@ class PicsartClient:
                                 return f"data:image/png;base64,{upscaled_base64}"
                     else:
                         print(f"Picsart API Error (Key {i+1}): {result}")
-                elif response.status_code == 429:
+                elif throttled:
                     print(f"Picsart Rate Limit hit for key {i+1}. Trying next key...")
                     continue
                 else:
@@ -71,5 +75,5 @@ class PicsartClient:
                 print(f"Picsart Client Error with key {i+1}: {e}")
                 continue
         
-        print("Picsart Error: All API keys failed")
+        print("Picsart Error: All API keys failed" if keys else "Picsart Error: All API keys are rate limited")
         return None
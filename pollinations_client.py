@@ -1,6 +1,8 @@
 import requests
 import logging
 import urllib.parse
+from key_pool import key_pools
+from rate_limit import observe_rate_limit
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +12,8 @@ class PollinationsClient:
             self.api_keys = [api_keys]
         else:
             self.api_keys = [k for k in api_keys if k]
+        # Requests rotate across the keys; a rate-limited key cools down for its Retry-After
+        self.key_pool = key_pools.pool("pollinations", self.api_keys)
         self.base_url = "https://pollinations.ai/p/"
 
     def generate_image(self, prompt_text):
@@ -28,7 +32,7 @@ class PollinationsClient:
 
         encoded_prompt = urllib.parse.quote(enhanced_prompt)
         
-        for api_key in self.api_keys:
+        for api_key in self.key_pool.available_keys():
             # Pollinations CDN URL format
             # We add parameters for better quality and no logo overlap
             url = f"https://pollinations.ai/p/{encoded_prompt}?nologo=true&enhance=false&width=1024&height=1024"
@@ -45,8 +49,11 @@ class PollinationsClient:
                 response = requests.get(url, headers=headers, timeout=10, stream=True)
                 
                 if response.status_code == 200:
+                    observe_rate_limit(response, self.key_pool, api_key)
                     logger.info("✓ Pollinations logo generation link verified.")
                     return url
+                elif observe_rate_limit(response, self.key_pool, api_key) is not None:
+                    logger.warning(f"✗ Pollinations rate limited key {api_key[:10]}, trying next key")
                 else:
                     logger.warning(f"✗ Pollinations returned {response.status_code} with key {api_key[:10]}")
                     
@@ -0,0 +1,137 @@
+"""
+GlobleXGPT Prefetch Scheduler
+Refreshes global (not per-user) answers such as headlines, top cryptos, YouTube trending
+and NASA APOD on a fixed cadence in one background thread, so the matching /ask intents
+are served from the services' caches without waiting on an upstream call.
+"""
+
+import os
+import re
+import time
+import heapq
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchJob:
+    def __init__(self, name, interval, func):
+        self.name = name
+        self.interval = float(interval)
+        self.func = func
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_run = None
+        self.last_success = None
+        self.last_duration_ms = None
+        self.last_error = None
+        self.next_run = None
+
+    def status(self):
+        def iso(ts):
+            return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+        return {
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_run": iso(self.last_run),
+            "last_success": iso(self.last_success),
+            "last_duration_ms": self.last_duration_ms,
+            "last_error": self.last_error,
+            "next_run": iso(self.next_run),
+        }
+
+
+class PrefetchScheduler:
+    def __init__(self, max_backoff=None):
+        # Failed jobs retry sooner than their interval, doubling from 15s up to this cap
+        self.max_backoff = float(max_backoff or os.getenv("PREFETCH_MAX_BACKOFF", "300"))
+        self.jobs = {}
+        self._queue = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopped = False
+
+    def add_job(self, name, interval, func):
+        """Registers func to run every interval seconds; the first run happens as soon as the scheduler starts."""
+        job = PrefetchJob(name, interval, func)
+        with self._lock:
+            self.jobs[name] = job
+            job.next_run = time.time()
+            heapq.heappush(self._queue, (job.next_run, name))
+        self._wakeup.set()
+        return job
+
+    def _run_job(self, job):
+        start = time.perf_counter()
+        job.last_run = time.time()
+        job.runs += 1
+        try:
+            job.func()
+            job.last_success = time.time()
+            job.last_error = None
+            job.consecutive_failures = 0
+            delay = job.interval
+        except Exception as e:
+            job.failures += 1
+            job.consecutive_failures += 1
+            # Query strings are dropped since upstream URLs carry API keys and this is exposed over HTTP
+            job.last_error = f"{type(e).__name__}: {re.sub(r'[?][^ )]*', '?...', str(e))}"[:300]
+            delay = min(job.interval, self.max_backoff, 15 * 2 ** (job.consecutive_failures - 1))
+            logger.warning(f"[Prefetch] {job.name} failed ({job.consecutive_failures} in a row): {e}")
+        job.last_duration_ms = round((time.perf_counter() - start) * 1000, 1)
+        return delay
+
+    def _loop(self):
+        while not self._stopped:
+            with self._lock:
+                due_at, name = self._queue[0] if self._queue else (None, None)
+            if due_at is None:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            wait = due_at - time.time()
+            if wait > 0:
+                # Woken early when a job is added so it can jump the queue
+                self._wakeup.wait(wait)
+                self._wakeup.clear()
+                continue
+
+            with self._lock:
+                heapq.heappop(self._queue)
+                job = self.jobs.get(name)
+            if job is None:
+                continue
+
+            delay = self._run_job(job)
+            with self._lock:
+                job.next_run = time.time() + delay
+                heapq.heappush(self._queue, (job.next_run, name))
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="prefetch-scheduler")
+        self._thread.start()
+        logger.info(f"[Prefetch] Scheduler started with jobs: {', '.join(self.jobs) or 'none'}")
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+    def status(self):
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "jobs": {name: job.status() for name, job in self.jobs.items()},
+        }
+
+
+prefetch_scheduler = PrefetchScheduler()
@@ -0,0 +1,236 @@
+"""
+GlobleXGPT Profiling
+Opt-in inspection of a running worker, restricted to admins (X-Admin-Secret must match ADMIN_SECRET;
+with ADMIN_SECRET unset everything here is disabled).
+
+- Sending "X-Profile: 1" with a request runs it under a sampling profiler. The response body is
+  replaced by the sampled stacks in collapsed format ("frame;frame;frame count" per line), which
+  flamegraph.pl, speedscope and inferno read directly. X-Profile-Wall-Ms and X-Profile-Cpu-Ms
+  tell CPU-bound requests apart from ones waiting on I/O or the GIL; the stacks show which.
+- thread_dump() and the tracemalloc helpers back the /admin/debug endpoints.
+
+The sampler is a daemon thread reading sys._current_frames() every PROFILE_INTERVAL_MS, so
+nothing is instrumented and requests without the header pay only a header lookup.
+"""
+
+import os
+import sys
+import hmac
+import time
+import logging
+import threading
+import traceback
+import tracemalloc
+from collections import Counter
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# A profile still running after this long is stopped, so a hung request cannot sample forever
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "120"))
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "10"))
+
+
+def is_admin():
+    secret = os.getenv("ADMIN_SECRET")
+    if not secret:
+        return False
+    return hmac.compare_digest(request.headers.get("X-Admin-Secret", ""), secret)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of one thread (thread_id) or of every other thread (thread_id=None)
+    until stop(). Samples of all threads are rooted at the thread name.
+    """
+
+    def __init__(self, thread_id=None, interval_ms=None, max_seconds=None):
+        self.thread_id = thread_id
+        self.interval = (interval_ms or PROFILE_INTERVAL_MS) / 1000
+        self.max_seconds = max_seconds or PROFILE_MAX_SECONDS
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            if time.monotonic() > deadline:
+                logger.warning(f"[Profile] Stopped after {self.max_seconds:.0f}s")
+                break
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frame = frames.get(self.thread_id)
+                if frame is not None:
+                    self.stacks[_collapse(frame)] += 1
+            else:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in frames.items():
+                    if ident != own_id:
+                        self.stacks[f"{names.get(ident, ident)};{_collapse(frame)}"] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# One request profile at a time keeps the overhead bounded when the header is left on
+_profile_lock = threading.Lock()
+
+
+def start_request_profile():
+    """Starts profiling the current request when an admin asks for it with X-Profile."""
+    if request.headers.get("X-Profile", "").lower() not in ("1", "true", "yes") or not is_admin():
+        return
+    if not _profile_lock.acquire(blocking=False):
+        g.profile_busy = True
+        return
+    g.profile = SamplingProfiler(threading.get_ident()).start()
+    g.profile_started = (time.perf_counter(), time.thread_time())
+
+
+def finish_request_profile(response):
+    """Replaces the response with the collapsed stacks of a profiled request."""
+    if g.get("profile_busy"):
+        response.headers["X-Profile"] = "busy"
+        return response
+    profiler = g.get("profile")
+    if profiler is None:
+        return response
+    g.profile = None
+    try:
+        profiler.stop()
+    finally:
+        _profile_lock.release()
+    wall_start, cpu_start = g.profile_started
+    wall_ms = (time.perf_counter() - wall_start) * 1000
+    cpu_ms = (time.thread_time() - cpu_start) * 1000
+    route = request.url_rule.rule if request.url_rule else request.path
+    logger.info(f"[Profile] {request.method} {route}: {profiler.samples} samples, wall {wall_ms:.0f}ms, cpu {cpu_ms:.0f}ms")
+
+    # Streamed bodies are produced after this point, so only their setup is profiled
+    response.direct_passthrough = False
+    response.set_data(profiler.collapsed())
+    response.mimetype = "text/plain"
+    response.headers["Content-Disposition"] = f"attachment; filename=profile-{int(time.time())}.folded"
+    response.headers["X-Profile-Status"] = str(response.status_code)
+    response.headers["X-Profile-Samples"] = str(profiler.samples)
+    response.headers["X-Profile-Wall-Ms"] = f"{wall_ms:.1f}"
+    response.headers["X-Profile-Cpu-Ms"] = f"{cpu_ms:.1f}"
+    response.status_code = 200
+    return response
+
+
+def discard_request_profile(exc=None):
+    """Teardown safety net: stops a profile whose request never reached finish_request_profile."""
+    profiler = g.pop("profile", None)
+    if profiler is not None:
+        profiler.stop()
+        _profile_lock.release()
+
+
+def profile_all_threads(seconds, interval_ms=None):
+    """Samples every thread of the worker for a few seconds; returns collapsed stacks."""
+    profiler = SamplingProfiler(None, interval_ms).start()
+    time.sleep(seconds)
+    return profiler.stop()
+
+
+def thread_dump():
+    """Current stack of every thread, like a JVM thread dump."""
+    frames = sys._current_frames()
+    lines = []
+    for thread in threading.enumerate():
+        frame = frames.get(thread.ident)
+        lines.append(f'Thread "{thread.name}" id={thread.ident} daemon={thread.daemon}')
+        if frame is not None:
+            lines.extend(line.rstrip("\n") for line in traceback.format_stack(frame))
+        lines.append("")
+    return "\n".join(lines)
+
+
+class MemoryTracker:
+    """tracemalloc snapshots; each snapshot can be diffed against the previous one to find growth."""
+
+    def __init__(self):
+        self._last = None
+        self._lock = threading.Lock()
+
+    def start(self, frames=None):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames or TRACEMALLOC_FRAMES)
+        return self.status()
+
+    def stop(self):
+        with self._lock:
+            self._last = None
+        tracemalloc.stop()
+        return self.status()
+
+    def status(self):
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "frames": tracemalloc.get_traceback_limit(),
+            "current_mb": round(current / 1048576, 2),
+            "peak_mb": round(peak / 1048576, 2),
+        }
+
+    def snapshot(self, group_by="lineno", limit=25, compare=False):
+        """Top allocation sites; with compare=True, the change since the previous snapshot."""
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        with self._lock:
+            previous, self._last = self._last, snapshot
+        if compare and previous is not None:
+            stats = snapshot.compare_to(previous, group_by)
+            top = [{
+                "location": str(s.traceback),
+                "size_kb": round(s.size / 1024, 1),
+                "size_diff_kb": round(s.size_diff / 1024, 1),
+                "count": s.count,
+                "count_diff": s.count_diff,
+            } for s in stats[:limit]]
+        else:
+            stats = snapshot.statistics(group_by)
+            top = [{
+                "location": str(s.traceback) if group_by != "traceback" else s.traceback.format(),
+                "size_kb": round(s.size / 1024, 1),
+                "count": s.count,
+            } for s in stats[:limit]]
+        return dict(self.status(), group_by=group_by, compared=bool(compare and previous is not None), top=top)
+
+
+memory_tracker = MemoryTracker()
@@ -0,0 +1,115 @@
+"""
+GlobleXGPT Provider Registry
+Records how to build each AI/media provider client from env config, but defers the import
+of its module and the construction of the client until it is first used. SDKs such as
+runwayml and google-api-python-client take hundreds of milliseconds to import, which used to be
+paid on every cold start whether or not the request needed them.
+"""
+
+import time
+import logging
+import importlib
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderUnavailable(Exception):
+    """Raised when a provider's client could not be imported or constructed."""
+
+
+class LazyProvider:
+    """
+    Stand-in for a provider client. Attribute access imports the module and constructs the
+    client once; after that it behaves like the client itself. Evaluates falsy once
+    construction has failed, so existing `if assistant:` checks skip it.
+    """
+
+    def __init__(self, name, module, attr, args=(), kwargs=None, construct=True):
+        self._name = name
+        self._module = module
+        self._attr = attr
+        self._args = args
+        self._kwargs = kwargs or {}
+        self._construct = construct
+        self._instance = None
+        self._error = None
+        self._load_ms = None
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        if self._instance is not None:
+            return self._instance
+        if self._error is not None:
+            raise ProviderUnavailable(f"{self._name} unavailable: {self._error}")
+        with self._lock:
+            if self._instance is None and self._error is None:
+                start = time.perf_counter()
+                try:
+                    target = getattr(importlib.import_module(self._module), self._attr)
+                    self._instance = target(*self._args, **self._kwargs) if self._construct else target
+                    self._load_ms = round((time.perf_counter() - start) * 1000, 1)
+                    logger.info(f"[Providers] {self._name} loaded in {self._load_ms} ms")
+                except Exception as e:
+                    self._error = e
+                    logger.error(f"[FAIL] {self._name} initialization failed: {e}")
+                    print(f"ERROR: {self._name} init fail: {e}")
+        if self._error is not None:
+            raise ProviderUnavailable(f"{self._name} unavailable: {self._error}")
+        return self._instance
+
+    def __getattr__(self, item):
+        # Only reached for attributes not set in __init__, i.e. the client's own API
+        if item.startswith("__"):
+            raise AttributeError(item)
+        return getattr(self._resolve(), item)
+
+    def __bool__(self):
+        return self._error is None
+
+    def __repr__(self):
+        state = "loaded" if self._instance is not None else "failed" if self._error is not None else "pending"
+        return f"<LazyProvider {self._name} ({state})>"
+
+    def status(self):
+        if self._instance is not None:
+            return {"state": "loaded", "load_ms": self._load_ms}
+        if self._error is not None:
+            return {"state": "failed", "error": str(self._error)[:200]}
+        return {"state": "pending"}
+
+
+class ProviderRegistry:
+    def __init__(self):
+        self._providers = OrderedDict()
+
+    def register(self, name, module, attr, *args, **kwargs):
+        """Records module.attr(*args, **kwargs) as provider `name` and returns its lazy stand-in."""
+        provider = LazyProvider(name, module, attr, args, kwargs)
+        self._providers[name] = provider
+        return provider
+
+    def register_instance(self, name, module, attr):
+        """Records a module-level singleton (module.attr) that should only be imported when used."""
+        provider = LazyProvider(name, module, attr, construct=False)
+        self._providers[name] = provider
+        return provider
+
+    def get(self, name):
+        return self._providers.get(name)
+
+    def warm(self, *names):
+        """Builds the named providers (all when none are given) ahead of traffic, e.g. on a long-lived server."""
+        for name, provider in self._providers.items():
+            if not names or name in names:
+                try:
+                    provider._resolve()
+                except ProviderUnavailable:
+                    pass
+
+    def status(self):
+        return {name: provider.status() for name, provider in self._providers.items()}
+
+
+providers = ProviderRegistry()
@@ -0,0 +1,358 @@
+"""
+GlobleXGPT Provider Simulator
+A local stand-in for the upstream APIs the app calls, so /ask and the media cascades can be
+exercised (and load tested) without live keys:
+- OpenAI-compatible chat completions (OpenRouter, Groq, Comet, Chutes, Bytez, GitHub Models)
+- Ollama chat and Gemini generateContent / ListModels
+- Kling and Veo task + poll, Replicate predictions, Freepik text-to-image
+- Serper and Tavily search, and the Google Apps Script (Sheets / Docs history) actions
+- OpenWeather and NewsAPI, and /files/<name> for media downloads (generated videos point there)
+
+Usage:
+    python provider_simulator.py [--port 8099] [--latency-ms 300] [--error-rate 0.05] ...
+    python provider_simulator.py --print-env    # base-URL overrides that point the app here
+
+Behavior is configured per run from SIM_* env vars or the flags below, and can be changed while
+running with POST /_sim/config ({"provider": "groq", "rate_limit_rate": 0.5} or global settings
+without "provider"). GET /_sim/stats returns per-provider request and outcome counts.
+SIM_SEED makes the injected latency and failures reproducible across runs.
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import defaultdict
+from flask import Flask, Response, request, jsonify
+
+# A 1x1 transparent PNG, returned wherever a provider sends image bytes
+PIXEL_PNG = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+# Body of /files/<name>; 256 KB is about what a short clip streams through /download_media per request
+SAMPLE_FILE_SIZE = int(os.getenv("SIM_FILE_SIZE", str(256 * 1024)))
+
+SETTINGS = ("latency_ms", "jitter_ms", "error_rate", "rate_limit_rate", "retry_after",
+            "poll_steps", "poll_latency_ms", "quota", "quota_window")
+
+CHAT_PROVIDERS = ("openrouter", "groq", "comet", "chutes", "bytez", "github")
+
+
+def _env_settings():
+    return {
+        "latency_ms": float(os.getenv("SIM_LATENCY_MS", "200")),
+        "jitter_ms": float(os.getenv("SIM_JITTER_MS", "50")),
+        "error_rate": float(os.getenv("SIM_ERROR_RATE", "0")),
+        "rate_limit_rate": float(os.getenv("SIM_RATE_LIMIT_RATE", "0")),
+        "retry_after": float(os.getenv("SIM_RETRY_AFTER", "5")),
+        # Polls a Kling/Veo/Replicate task needs before it completes, and the latency of each poll
+        "poll_steps": int(os.getenv("SIM_POLL_STEPS", "2")),
+        "poll_latency_ms": float(os.getenv("SIM_POLL_LATENCY_MS", "50")),
+        # Requests each key may make per quota_window seconds; 0 disables the x-ratelimit headers
+        "quota": int(os.getenv("SIM_QUOTA", "0")),
+        "quota_window": float(os.getenv("SIM_QUOTA_WINDOW", "60")),
+    }
+
+
+class ProviderSimulator:
+    def __init__(self, settings=None, seed=None):
+        self.settings = dict(_env_settings(), **(settings or {}))
+        self.overrides = defaultdict(dict)
+        seed = seed if seed is not None else os.getenv("SIM_SEED")
+        self.random = random.Random(int(seed)) if seed not in (None, "") else random.Random()
+        self.stats = defaultdict(lambda: defaultdict(int))
+        self.tasks = {}
+        self.quotas = {}
+        self._lock = threading.Lock()
+
+    def setting(self, provider, name):
+        return self.overrides[provider].get(name, self.settings[name])
+
+    def configure(self, values, provider=None):
+        values = {k: type(self.settings[k])(v) for k, v in values.items() if k in SETTINGS}
+        with self._lock:
+            if provider:
+                self.overrides[provider].update(values)
+            else:
+                self.settings.update(values)
+        return values
+
+    def _count(self, provider, outcome):
+        with self._lock:
+            self.stats[provider]["requests"] += 1
+            self.stats[provider][outcome] += 1
+
+    def _quota_headers(self, provider, key):
+        """OpenAI-style x-ratelimit headers for key; (headers, exhausted)."""
+        quota = self.setting(provider, "quota")
+        if not quota:
+            return {}, False
+        window = self.setting(provider, "quota_window")
+        now = time.time()
+        with self._lock:
+            used, reset_at = self.quotas.get((provider, key), (0, now + window))
+            if now >= reset_at:
+                used, reset_at = 0, now + window
+            exhausted = used >= quota
+            if not exhausted:
+                used += 1
+            self.quotas[(provider, key)] = (used, reset_at)
+        headers = {
+            "x-ratelimit-limit-requests": str(quota),
+            "x-ratelimit-remaining-requests": str(max(0, quota - used)),
+            "x-ratelimit-reset-requests": f"{max(0.0, reset_at - now):.1f}s",
+        }
+        return headers, exhausted
+
+    def respond(self, provider, body, poll=False):
+        """Applies the configured latency and failures to a provider response body."""
+        latency = self.setting(provider, "poll_latency_ms" if poll else "latency_ms")
+        jitter = 0 if poll else self.setting(provider, "jitter_ms")
+        time.sleep(max(0.0, latency + self.random.uniform(-jitter, jitter)) / 1000)
+
+        key = (request.headers.get("Authorization") or request.headers.get("x-goog-api-key")
+               or request.headers.get("x-freepik-api-key") or request.headers.get("X-API-KEY") or "anonymous")
+        headers, exhausted = self._quota_headers(provider, key)
+        roll = self.random.random()
+        if exhausted or (not poll and roll < self.setting(provider, "rate_limit_rate")):
+            self._count(provider, "rate_limited")
+            retry_after = self.setting(provider, "retry_after")
+            headers["Retry-After"] = str(int(retry_after))
+            return jsonify({"error": {"message": "Rate limit exceeded (simulated)", "code": 429}}), 429, headers
+        if roll < self.setting(provider, "rate_limit_rate") + self.setting(provider, "error_rate"):
+            self._count(provider, "error")
+            return jsonify({"error": {"message": "Internal error (simulated)", "code": 500}}), 500, headers
+        self._count(provider, "ok")
+        return jsonify(body), 200, headers
+
+    def create_task(self, provider):
+        task_id = uuid.uuid4().hex[:16]
+        with self._lock:
+            self.tasks[task_id] = [provider, 0]
+        return task_id
+
+    def poll_task(self, task_id):
+        """True once the task has been polled poll_steps times; None for an unknown task."""
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return None
+            task[1] += 1
+            return task[1] >= self.setting(task[0], "poll_steps")
+
+
+def _sample_video():
+    return f"{request.host_url}files/video-{uuid.uuid4().hex[:8]}.mp4"
+
+
+def _chat_text():
+    messages = (request.get_json(silent=True) or {}).get("messages") or [{}]
+    prompt = messages[-1].get("content", "")
+    if isinstance(prompt, list):
+        prompt = " ".join(p.get("text", "") for p in prompt if isinstance(p, dict))
+    return json.dumps({"response": f"Simulated answer to: {str(prompt)[:200]}", "emotion": "Happy"})
+
+
+def create_app(simulator=None):
+    sim = simulator or ProviderSimulator()
+    app = Flask(__name__)
+    app.config["SIMULATOR"] = sim
+
+    @app.route("/<provider>/chat/completions", methods=["POST"])
+    def chat_completions(provider):
+        if provider not in CHAT_PROVIDERS:
+            return jsonify({"error": f"unknown provider {provider}"}), 404
+        return sim.respond(provider, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": _chat_text()}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 50, "completion_tokens": 20, "total_tokens": 70},
+        })
+
+    @app.route("/ollama/api/chat", methods=["POST"])
+    def ollama_chat():
+        return sim.respond("ollama", {"message": {"role": "assistant", "content": _chat_text()}, "done": True})
+
+    @app.route("/gemini/models", methods=["GET"])
+    def gemini_models():
+        return sim.respond("gemini", {"models": [
+            {"name": "models/gemini-2.5-flash", "supportedGenerationMethods": ["generateContent"]},
+        ]})
+
+    @app.route("/gemini/models/<model>:generateContent", methods=["POST"])
+    def gemini_generate(model):
+        contents = (request.get_json(silent=True) or {}).get("contents") or [{}]
+        parts = contents[-1].get("parts") or [{}]
+        # The prompt follows the system instructions in the same part, so echo its end
+        prompt = " ".join(str(p.get("text", "")) for p in parts if isinstance(p, dict))
+        text = json.dumps({"response": f"Simulated answer to: {prompt[-200:]}", "emotion": "Happy"})
+        return sim.respond("gemini", {"candidates": [{"content": {"parts": [{"text": text}]}, "finishReason": "STOP"}]})
+
+    @app.route("/kling/v1/videos/omni-video", methods=["POST"])
+    def kling_create():
+        return sim.respond("kling", {"code": 0, "data": {"task_id": sim.create_task("kling"), "task_status": "submitted"}})
+
+    @app.route("/kling/v1/videos/omni-video/<task_id>", methods=["GET"])
+    def kling_poll(task_id):
+        done = sim.poll_task(task_id)
+        if done is None:
+            return jsonify({"code": 404, "message": "task not found"}), 404
+        data = {"task_id": task_id, "task_status": "succeed" if done else "processing"}
+        if done:
+            data["task_result"] = {"videos": [{"url": _sample_video()}]}
+        return sim.respond("kling", {"code": 0, "data": data}, poll=True)
+
+    @app.route("/veo/generate", methods=["POST"])
+    def veo_create():
+        return sim.respond("veo", {"code": 200, "data": {"task_id": sim.create_task("veo")}})
+
+    @app.route("/veo/feed", methods=["GET"])
+    def veo_poll():
+        task_id = request.args.get("task_id", "")
+        done = sim.poll_task(task_id)
+        if done is None:
+            return jsonify({"error": "task not found"}), 404
+        data = {"task_id": task_id, "status": "COMPLETED" if done else "PROCESSING"}
+        if done:
+            data["response"] = [_sample_video()]
+        return sim.respond("veo", {"code": 200, "data": data}, poll=True)
+
+    @app.route("/replicate/predictions", methods=["POST"])
+    @app.route("/replicate/models/<path:model>/predictions", methods=["POST"])
+    def replicate_create(model=None):
+        return sim.respond("replicate", {"id": sim.create_task("replicate"), "status": "starting", "output": None})
+
+    @app.route("/replicate/predictions/<prediction_id>", methods=["GET"])
+    def replicate_poll(prediction_id):
+        done = sim.poll_task(prediction_id)
+        if done is None:
+            return jsonify({"detail": "Not found."}), 404
+        body = {"id": prediction_id, "status": "succeeded" if done else "processing", "output": _sample_video() if done else None}
+        return sim.respond("replicate", body, poll=True)
+
+    @app.route("/freepik/v1/ai/text-to-image", methods=["POST"])
+    def freepik_generate():
+        return sim.respond("freepik", {"data": [{"base64": PIXEL_PNG, "has_nsfw": False}]})
+
+    @app.route("/serper/search", methods=["POST"])
+    def serper_search():
+        query = (request.get_json(silent=True) or {}).get("q", "")
+        return sim.respond("serper", {"organic": [
+            {"title": f"{query} result {i}", "link": f"https://example.com/{i}", "snippet": f"Simulated snippet {i} about {query}."}
+            for i in range(1, 6)
+        ]})
+
+    @app.route("/tavily/search", methods=["POST"])
+    def tavily_search():
+        query = (request.get_json(silent=True) or {}).get("query", "")
+        return sim.respond("tavily", {"results": [
+            {"title": f"{query} result {i}", "url": f"https://example.org/{i}", "content": f"Simulated content {i} about {query}."}
+            for i in range(1, 6)
+        ]})
+
+    @app.route("/apps-script", methods=["GET", "POST"])
+    def apps_script():
+        # Sheets reads are GET ?action=active|revenue; Sheets writes and Docs history are POSTs
+        action = request.args.get("action") or (request.get_json(silent=True) or {}).get("action")
+        if request.method == "GET" and action == "active":
+            return sim.respond("apps-script", [{"email": "pro@example.com", "status": "ACTIVE"}])
+        if request.method == "GET" and action == "revenue":
+            return sim.respond("apps-script", {"total_revenue": 0, "total_payments": 0})
+        return sim.respond("apps-script", {"result": "success", "message": f"{action or 'history'} recorded (simulated)"})
+
+    @app.route("/openweather/data/2.5/weather", methods=["GET"])
+    def openweather():
+        name = request.args.get("q") or f"City {request.args.get('id', '')}".strip()
+        return sim.respond("openweather", {
+            "name": name,
+            "main": {"temp": 21.5, "feels_like": 21.0, "temp_min": 18.0, "temp_max": 24.0, "humidity": 60},
+            "weather": [{"description": "scattered clouds"}],
+            "wind": {"speed": 3.2},
+        })
+
+    @app.route("/newsapi/v2/top-headlines", methods=["GET"])
+    def newsapi():
+        return sim.respond("newsapi", {"status": "ok", "articles": [
+            {"title": f"Simulated headline {i}", "source": {"name": "Simulator"}, "description": f"Story {i}."}
+            for i in range(1, 6)
+        ]})
+
+    @app.route("/files/<name>", methods=["GET"])
+    def files(name):
+        body, status, headers = sim.respond("files", {})
+        if status != 200:
+            return body, status, headers
+        content_type = "video/mp4" if name.endswith(".mp4") else "image/png"
+        return Response(bytes(SAMPLE_FILE_SIZE), mimetype=content_type, headers=headers)
+
+    @app.route("/_sim/config", methods=["GET", "POST"])
+    def sim_config():
+        if request.method == "POST":
+            body = request.get_json(silent=True) or {}
+            sim.configure(body, body.get("provider"))
+        return jsonify({"settings": sim.settings, "overrides": sim.overrides})
+
+    @app.route("/_sim/stats", methods=["GET"])
+    def sim_stats():
+        return jsonify({name: dict(counts) for name, counts in sim.stats.items()})
+
+    return app
+
+
+def client_env(base):
+    """Env vars that point every simulated client at a simulator listening on base."""
+    env = {f"{name.upper()}_BASE_URL": f"{base}/{name}/chat/completions" for name in CHAT_PROVIDERS}
+    env["GITHUB_MODELS_BASE_URL"] = env.pop("GITHUB_BASE_URL").rsplit("/chat/completions", 1)[0]
+    env.update({
+        "OLLAMA_BASE_URL": f"{base}/ollama/api/chat",
+        "GEMINI_BASE_URL": f"{base}/gemini",
+        "KLING_BASE_URL": f"{base}/kling",
+        "VEO_BASE_URL": f"{base}/veo",
+        "REPLICATE_BASE_URL": f"{base}/replicate",
+        "FREEPIK_BASE_URL": f"{base}/freepik/v1/ai/text-to-image",
+        "SERPER_BASE_URL": f"{base}/serper",
+        "TAVILY_BASE_URL": f"{base}/tavily",
+        "GOOGLE_SHEETS_SCRIPT_URL": f"{base}/apps-script",
+        "GOOGLE_DOCS_HISTORY_URL": f"{base}/apps-script",
+        "OPENWEATHER_BASE_URL": f"{base}/openweather/data/2.5/weather",
+        "NEWS_BASE_URL": f"{base}/newsapi/v2/top-headlines",
+        # Poll fast; the simulator decides how many polls a task takes
+        "KLING_POLL_INTERVAL": "0.1",
+        "VEO_POLL_INTERVAL": "0.1",
+        "REPLICATE_POLL_INTERVAL": "0.1",
+    })
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local simulator for the upstream AI/media provider APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("SIM_PORT", "8099")))
+    parser.add_argument("--latency-ms", type=float)
+    parser.add_argument("--jitter-ms", type=float)
+    parser.add_argument("--error-rate", type=float, help="fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, help="fraction of requests answered with a 429")
+    parser.add_argument("--retry-after", type=float, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--poll-steps", type=int, help="polls before a video task completes")
+    parser.add_argument("--poll-latency-ms", type=float)
+    parser.add_argument("--quota", type=int, help="requests per key per window (0 = unlimited)")
+    parser.add_argument("--quota-window", type=float)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--print-env", action="store_true", help="print the client base-URL overrides and exit")
+    args = parser.parse_args()
+
+    base = f"http://{args.host}:{args.port}"
+    if args.print_env:
+        for name, value in client_env(base).items():
+            print(f"{name}={value}")
+        return
+
+    settings = {name: getattr(args, name) for name in SETTINGS if getattr(args, name) is not None}
+    app = create_app(ProviderSimulator(settings, seed=args.seed))
+    print(f"Provider simulator listening on {base} (run with --print-env for the client overrides)")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
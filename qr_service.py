@@ -1,35 +1,203 @@
 import qrcode
 import os
 import base64
+import threading
 from io import BytesIO
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from qrcode.exceptions import DataOverflowError
+
+ERROR_LEVELS = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+
+# Pixels per module; 40 already gives a ~7000px image for the largest QR version
+MAX_SIZE = int(os.getenv("QR_MAX_SIZE", "40"))
+# Byte capacity of a version 40 code at each error level
+MAX_DATA_BYTES = {"L": 2953, "M": 2331, "Q": 1663, "H": 1273}
+
+
+def _build_matrix(data, error_level="L", border=4):
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=ERROR_LEVELS.get(error_level, qrcode.constants.ERROR_CORRECT_L),
+        box_size=1,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def render_png(data, size=10, error_level="L", border=4):
+    """Renders a QR code through Pillow and returns a PNG data URL."""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=ERROR_LEVELS.get(error_level, qrcode.constants.ERROR_CORRECT_L),
+        box_size=size,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    # Save to BytesIO for base64 or conversion
+    buffered = BytesIO()
+    img.save(buffered, format="PNG")
+    img_str = base64.b64encode(buffered.getvalue()).decode()
+
+    # Return as data URL
+    return f"data:image/png;base64,{img_str}"
+
+
+def render_svg(data, size=10, error_level="L", border=4):
+    """
+    Renders a QR code as SVG straight from the module matrix, without touching Pillow.
+    Each dark module becomes a 1x1 square in a single path; 'size' scales the viewBox.
+    """
+    matrix = _build_matrix(data, error_level, border)
+    count = len(matrix)
+    parts = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < count:
+            if row[x]:
+                # Merge horizontal runs of dark modules into one rectangle
+                run = x
+                while run < count and row[run]:
+                    run += 1
+                parts.append(f"M{x},{y}h{run - x}v1h-{run - x}z")
+                x = run
+            else:
+                x += 1
+    pixels = count * size
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+        f'viewBox="0 0 {count} {count}" shape-rendering="crispEdges">'
+        f'<rect width="{count}" height="{count}" fill="#fff"/>'
+        f'<path d="{"".join(parts)}" fill="#000"/></svg>'
+    )
+    return f"data:image/svg+xml;base64,{base64.b64encode(svg.encode('utf-8')).decode()}"
+
+
+def _render(key):
+    data, size, error_level, fmt = key
+    if fmt == "svg":
+        return render_svg(data, size, error_level)
+    return render_png(data, size, error_level)
+
 
 class QRService:
-    def __init__(self, output_dir="static/generated/qr"):
+    def __init__(self, output_dir="static/generated/qr", cache_size=None, batch_workers=None):
         self.output_dir = output_dir
         if not os.path.exists(self.output_dir):
-            os.makedirs(self.output_dir)
+            try:
+                os.makedirs(self.output_dir)
+            except OSError:
+                pass
+        self.cache_size = int(cache_size or os.getenv("QR_CACHE_SIZE", "512"))
+        self.batch_workers = int(batch_workers or os.getenv("QR_BATCH_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _cache_get(self, key):
+        with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self._cache.move_to_end(key)
+            return value
+
+    def _cache_put(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _get_pool(self):
+        """Creates the batch process pool once, even when several batches arrive together."""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.batch_workers)
+            return self._pool
+
+    @staticmethod
+    def _key(data, size=10, error_level="L", fmt="png"):
+        """Normalized cache key; raises ValueError for a size, error level or payload out of range."""
+        data = str(data)
+        try:
+            if isinstance(size, bool) or float(size) != int(float(size)):
+                raise ValueError
+            size = int(float(size))
+        except (TypeError, ValueError):
+            raise ValueError(f"size must be a whole number between 1 and {MAX_SIZE}")
+        if not 1 <= size <= MAX_SIZE:
+            raise ValueError(f"size must be a whole number between 1 and {MAX_SIZE}")
+        error_level = str(error_level or "L").upper()
+        if error_level not in ERROR_LEVELS:
+            raise ValueError("error_level must be one of L, M, Q, H")
+        if len(data.encode("utf-8")) > MAX_DATA_BYTES[error_level]:
+            raise ValueError(f"QR content is limited to {MAX_DATA_BYTES[error_level]} bytes at error level {error_level}")
+        fmt = "svg" if str(fmt).lower() == "svg" else "png"
+        return (data, size, error_level, fmt)
 
-    def generate_qr(self, data, filename=None):
+    def generate_qr(self, data, filename=None, size=10, error_level="L", fmt="png"):
         """
-        Generates a QR code and returns the base64 encoded image or saves to file.
+        Generates a QR code and returns it as a data URL (PNG by default, or SVG with fmt="svg").
+        Results are memoized by (content, size, error level, format).
         """
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(data)
-        qr.make(fit=True)
-
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Save to BytesIO for base64 or conversion
-        buffered = BytesIO()
-        img.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        
-        # Return as data URL
-        return f"data:image/png;base64,{img_str}"
+        key = self._key(data, size, error_level, fmt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        try:
+            result = _render(key)
+        except DataOverflowError:
+            raise ValueError("QR content is too long for a QR code")
+        self._cache_put(key, result)
+        return result
+
+    def generate_batch(self, items, size=10, error_level="L", fmt="png"):
+        """
+        Generates many QR codes in one call. items may be strings or dicts with
+        'data' and optional 'size' / 'error_level'. Cache misses are rendered in a process pool.
+        Returns data URLs in the same order as items.
+        """
+        keys = []
+        for i, item in enumerate(items):
+            try:
+                if isinstance(item, dict):
+                    keys.append(self._key(item.get("data", ""), item.get("size", size), item.get("error_level", error_level), fmt))
+                elif isinstance(item, str):
+                    keys.append(self._key(item, size, error_level, fmt))
+                else:
+                    raise ValueError("items must be strings or objects with 'data'")
+            except ValueError as e:
+                raise ValueError(f"Item {i}: {e}")
+
+        results = [self._cache_get(k) for k in keys]
+        missing = list(OrderedDict.fromkeys(k for k, r in zip(keys, results) if r is None))
+
+        if missing:
+            # Pool start-up only pays off for real batches
+            try:
+                if len(missing) >= 16 and self.batch_workers > 1:
+                    rendered = list(self._get_pool().map(_render, missing, chunksize=max(1, len(missing) // (self.batch_workers * 4))))
+                else:
+                    rendered = [_render(k) for k in missing]
+            except DataOverflowError:
+                raise ValueError("QR content is too long for a QR code")
+            by_key = dict(zip(missing, rendered))
+            for k, value in by_key.items():
+                self._cache_put(k, value)
+            results = [r if r is not None else by_key[k] for k, r in zip(keys, results)]
+
+        return results
 
 qr_service = QRService()
@@ -0,0 +1,125 @@
+"""
+GlobleXGPT Rate Limits
+One place that understands provider rate-limit signals: 429 responses, Retry-After, and the
+remaining/reset quota headers that OpenAI-style APIs (Groq, GitHub Models, Chutes), OpenRouter
+and IETF RateLimit-* servers send on every response. What it learns is recorded on the key's
+KeyPool entry, so a key that is about to run out is skipped before it costs a round trip.
+
+Clients call check_rate_limit() right after each provider request. A 429 raises RateLimited,
+which the /ask tier loop catches to move on to the next tier.
+"""
+
+import os
+import re
+import time
+import logging
+
+from key_pool import parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+# Keys with this many requests (or fewer) left in the current window are skipped until it resets
+RESERVE = int(os.getenv("RATE_LIMIT_RESERVE", "1"))
+
+DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+RETRY_DELAY_RE = re.compile(r'"retryDelay"\s*:\s*"(\d+(?:\.\d+)?)s"')
+
+
+class RateLimited(Exception):
+    """A provider answered 429; retry_after is in seconds when the provider said."""
+
+    def __init__(self, provider, retry_after=None, detail=""):
+        self.provider = provider
+        self.retry_after = retry_after
+        wait = f", retry in {retry_after:.0f}s" if retry_after is not None else ""
+        super().__init__(f"{provider} rate limited{wait}{': ' + detail if detail else ''}")
+
+
+def parse_reset(value):
+    """
+    Seconds until a quota window resets. Accepts durations ("1m30s", "6.5s", "120ms"),
+    epoch timestamps in seconds or milliseconds, and plain delta seconds.
+    """
+    if value is None or value == "":
+        return None
+    value = str(value).strip()
+    parts = DURATION_RE.findall(value)
+    if parts and DURATION_RE.sub("", value) == "":
+        scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        return sum(float(n) * scale[unit] for n, unit in parts)
+    try:
+        number = float(value)
+    except ValueError:
+        return parse_retry_after(value)
+    if number > 1e12:
+        return max(0.0, number / 1000 - time.time())
+    if number > 1e9:
+        return max(0.0, number - time.time())
+    return max(0.0, number)
+
+
+def _header(headers, *names):
+    for name in names:
+        value = headers.get(name)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_headers(headers):
+    """{"remaining", "limit", "reset_in", "retry_after"} from a response's rate-limit headers (None when absent)."""
+    remaining = _int(_header(headers, "x-ratelimit-remaining-requests", "x-ratelimit-remaining", "ratelimit-remaining"))
+    limit = _int(_header(headers, "x-ratelimit-limit-requests", "x-ratelimit-limit", "ratelimit-limit"))
+    reset_in = parse_reset(_header(headers, "x-ratelimit-reset-requests", "x-ratelimit-reset", "ratelimit-reset"))
+
+    # A spent token budget blocks the key just like a spent request budget
+    remaining_tokens = _int(headers.get("x-ratelimit-remaining-tokens"))
+    if remaining_tokens == 0:
+        token_reset = parse_reset(headers.get("x-ratelimit-reset-tokens"))
+        if remaining is None or remaining > RESERVE:
+            reset_in = token_reset
+        elif token_reset is not None:
+            reset_in = max(reset_in or 0, token_reset)
+        remaining = 0
+
+    return {
+        "remaining": remaining,
+        "limit": limit,
+        "reset_in": reset_in,
+        "retry_after": parse_retry_after(headers.get("Retry-After")),
+    }
+
+
+def observe_rate_limit(response, pool=None, key=None):
+    """
+    Records the quota headers of any provider response against key in pool.
+    Returns the seconds to wait (0 when unknown) for a 429, else None.
+    """
+    info = parse_headers(response.headers)
+    if pool is not None and key:
+        pool.record_quota(key, info["remaining"], info["limit"], info["reset_in"], RESERVE)
+
+    if response.status_code != 429:
+        return None
+    wait = info["retry_after"]
+    if wait is None:
+        # Google APIs put the delay in the error body rather than a header
+        match = RETRY_DELAY_RE.search(getattr(response, "text", "") or "")
+        wait = float(match.group(1)) if match else info["reset_in"]
+    if pool is not None and key:
+        pool.throttled(key, wait)
+    return wait if wait is not None else 0.0
+
+
+def check_rate_limit(response, pool=None, key=None, provider="Provider"):
+    """observe_rate_limit(), raising RateLimited on a 429."""
+    wait = observe_rate_limit(response, pool, key)
+    if wait is not None:
+        raise RateLimited(provider, wait or None, (getattr(response, "text", "") or "")[:200])
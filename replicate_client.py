@@ -1,11 +1,13 @@
 import requests
+import os
 import time
 import logging
+from rate_limit import check_rate_limit
 
 logger = logging.getLogger(__name__)
 
 class ReplicateClient:
-    def __init__(self, api_token, model="minimax/video-01"):
+    def __init__(self, api_token, model="minimax/video-01", base_url=None, key_pool=None):
         """
         Initialize the Replicate Client.
         :param api_token: The Replicate API Token
@@ -13,10 +15,14 @@ class ReplicateClient:
                       If a version hash is provided in the model string (after colon), predictions endpoint is used differently or via version.
                       Here we assume the user provides owner/name and we rely on the latest version unless specified.
                       For 'minimax/video-01', we can use the models endpoint.
+        :param base_url: API root, e.g. a local provider simulator (default REPLICATE_BASE_URL or api.replicate.com)
+        :param key_pool: Optional KeyPool shared with the other Replicate tokens; 429s cool this token down there
         """
         self.api_token = api_token
+        self.key_pool = key_pool
         self.model = model
-        self.base_url = "https://api.replicate.com/v1"
+        self.base_url = base_url or os.getenv("REPLICATE_BASE_URL", "https://api.replicate.com/v1")
+        self.poll_interval = float(os.getenv("REPLICATE_POLL_INTERVAL", "5"))
 
     def generate_video(self, prompt, image_url=None):
         """
@@ -71,6 +77,7 @@ class ReplicateClient:
         try:
             logger.info(f"Replicate: Starting generation with model {self.model}")
             response = requests.post(url, headers=headers, json=payload)
+            check_rate_limit(response, self.key_pool, self.api_token, "Replicate")
             
             if response.status_code >= 400:
                 logger.error(f"Replicate API Error: {response.text}")
@@ -90,7 +97,7 @@ class ReplicateClient:
             retries = 0
             
             while status not in ["succeeded", "failed", "canceled"] and retries < max_retries:
-                time.sleep(5)
+                time.sleep(self.poll_interval)
                 resp = requests.get(f"{self.base_url}/predictions/{prediction_id}", headers=headers)
                 
                 if resp.status_code >= 400:
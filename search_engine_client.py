@@ -1,6 +1,42 @@
+"""
+GlobleXGPT Search Engine Client
+Web search across Serper, Google CSE, Tavily and DuckDuckGo. Backends are hedged rather than
+tried strictly in turn: the preferred one starts first, the next one starts if it has not
+answered after SEARCH_HEDGE_DELAY seconds (or as soon as it fails), and the first non-empty
+answer wins. Each provider is one backend however many keys it has: its key is picked from the
+key pool when it runs, and another key of the same provider is only tried after an error response.
+Results are cached per normalized query and de-duplicated by URL.
+"""
+
 import os
+import re
+import time
+import logging
 import requests
-from duckduckgo_search import DDGS
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from ttl_cache import TTLCache, UpstreamError
+from key_pool import key_pools
+from rate_limit import observe_rate_limit
+from metrics import record_provider
+
+logger = logging.getLogger(__name__)
+
+NO_RESULTS = "I couldn't find any search results for that query."
+
+
+def normalize_query(query):
+    return " ".join(re.findall(r"\w+", query.lower()))
+
+
+def url_key(link):
+    """Scheme, "www." and trailing slash ignored, so the same page from two backends dedupes."""
+    parts = urlsplit(link or "")
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return f"{host}{parts.path.rstrip('/')}{'?' + parts.query if parts.query else ''}"
+
 
 class SearchEngineClient:
     def __init__(self):
@@ -13,84 +49,176 @@ class SearchEngineClient:
         self.serper_key = os.getenv("SERPER_API_KEY")
         self.serper_key_2 = os.getenv("SERPER_API_KEY_2")
         self.ddg_enabled = os.getenv("DUCKDUCKGO_SEARCH_ENABLED", "true").lower() == "true"
+        self.serper_url = os.getenv("SERPER_BASE_URL", "https://google.serper.dev") + "/search"
+        self.tavily_url = os.getenv("TAVILY_BASE_URL", "https://api.tavily.com") + "/search"
+        # Searches rotate across the keys of each provider instead of always starting with the first
+        self.serper_pool = key_pools.pool("serper", [self.serper_key, self.serper_key_2])
+        self.tavily_pool = key_pools.pool("tavily", [self.tavily_key, self.tavily_key_2, self.tavily_key_3, self.tavily_key_4])
 
-    def search(self, query):
-        """Unified search with 4-tier fallback."""
-        
-        # Tier 1: Serper.dev (Google Search API - Fastest & Most Accurate)
-        # Supports multiple keys for higher limits
-        for s_key in [self.serper_key, self.serper_key_2]:
-            if s_key:
-                try:
-                    headers = {'X-API-KEY': s_key, 'Content-Type': 'application/json'}
-                    resp = requests.post(
-                        "https://google.serper.dev/search",
-                        headers=headers,
-                        json={"q": query},
-                        timeout=10
-                    )
-                    if resp.status_code == 200:
-                        results = resp.json().get('organic', [])
-                        if results:
-                            return self._format_results("Serper", results)
-                    else:
-                        print(f"Serper Search API Warning (Key ending {s_key[-4:]}): Received status {resp.status_code}")
-                except Exception as e:
-                    print(f"Serper Search Error: {e}")
+        self.hedge_delay = float(os.getenv("SEARCH_HEDGE_DELAY", "0.8"))
+        self.deadline = float(os.getenv("SEARCH_DEADLINE", "12"))
+        self.max_results = 5
+        self.cache = TTLCache("search", ttl=900, negative_ttl=60)
+        # A search can have every backend in flight at once, so leave room for SEARCH_CONCURRENCY of them;
+        # a saturated executor would queue the hedges behind other searches
+        concurrency = int(os.getenv("SEARCH_CONCURRENCY", "16"))
+        self._executor = ThreadPoolExecutor(max_workers=int(os.getenv("SEARCH_MAX_WORKERS", str(concurrency * 4))),
+                                            thread_name_prefix="search")
 
+    def _backends(self):
+        """(name, callable) pairs in order of preference; each callable returns a list of results."""
+        backends = []
+        # Tier 1: Serper.dev (Google Search API - Fastest & Most Accurate)
+        if len(self.serper_pool):
+            backends.append(("Serper", lambda q: self._search_pooled(self.serper_pool, self._search_serper, q)))
         # Tier 2: Google Search (Custom Search JSON API)
         if self.google_key and self.google_cx:
-            try:
-                url = f"https://www.googleapis.com/customsearch/v1?key={self.google_key}&cx={self.google_cx}&q={query}"
-                resp = requests.get(url, timeout=10)
-                if resp.status_code == 200:
-                    results = resp.json().get('items', [])
-                    if results:
-                        return self._format_results("Google", results)
-                else:
-                    print(f"Google Search API Warning: Received status {resp.status_code}")
-                    # Optional: Print detailed error for debugging
-                    # print(resp.text)
-            except Exception as e:
-                print(f"Google Search Error: {e}")
-
+            backends.append(("Google", self._search_google))
         # Tier 3: Tavily (Highly optimized for LLMs)
-        for t_key in [self.tavily_key, self.tavily_key_2, self.tavily_key_3, self.tavily_key_4]:
-            if t_key:
-                try:
-                    resp = requests.post(
-                        "https://api.tavily.com/search",
-                        json={"api_key": t_key, "query": query, "search_depth": "basic"},
-                        timeout=10
-                    )
-                    if resp.status_code == 200:
-                        results = resp.json().get('results', [])
-                        if results:
-                            return self._format_results("Tavily", results)
-                except Exception as e:
-                    print(f"Tavily Search Error: {e}")
-
+        if len(self.tavily_pool):
+            backends.append(("Tavily", lambda q: self._search_pooled(self.tavily_pool, self._search_tavily, q)))
         # Tier 4: DuckDuckGo (Free & Unlimited)
         if self.ddg_enabled:
-            try:
-                results = []
-                with DDGS() as ddgs:
-                    for r in ddgs.text(query, max_results=5):
-                        results.append(r)
+            backends.append(("DuckDuckGo", self._search_ddg))
+        return backends
+
+    @staticmethod
+    def _search_pooled(pool, search, query):
+        """
+        Runs search(query, key) with the pool's keys in order, moving to the next key only when one
+        answered with an error status (None); an empty answer is final, another key would not change it.
+        """
+        for key in pool.available_keys():
+            results = search(query, key)
+            if results is not None:
+                return results
+        return []
+
+    def _search_serper(self, query, s_key):
+        headers = {'X-API-KEY': s_key, 'Content-Type': 'application/json'}
+        resp = requests.post(self.serper_url, headers=headers, json={"q": query}, timeout=10)
+        observe_rate_limit(resp, self.serper_pool, s_key)
+        if resp.status_code != 200:
+            print(f"Serper Search API Warning (Key ending {s_key[-4:]}): Received status {resp.status_code}")
+            return None
+        return resp.json().get('organic', [])
+
+    def _search_google(self, query):
+        resp = requests.get("https://www.googleapis.com/customsearch/v1",
+                            params={"key": self.google_key, "cx": self.google_cx, "q": query}, timeout=10)
+        if resp.status_code != 200:
+            print(f"Google Search API Warning: Received status {resp.status_code}")
+            return []
+        return resp.json().get('items', [])
+
+    def _search_tavily(self, query, t_key):
+        resp = requests.post(self.tavily_url,
+                             json={"api_key": t_key, "query": query, "search_depth": "basic"}, timeout=10)
+        observe_rate_limit(resp, self.tavily_pool, t_key)
+        if resp.status_code != 200:
+            print(f"Tavily Search API Warning (Key ending {t_key[-4:]}): Received status {resp.status_code}")
+            return None
+        return resp.json().get('results', [])
+
+    def _search_ddg(self, query):
+        from duckduckgo_search import DDGS
+        with DDGS() as ddgs:
+            return list(ddgs.text(query, max_results=self.max_results))
+
+    def _run_backend(self, name, func, query):
+        start = time.perf_counter()
+        try:
+            results = func(query) or []
+            outcome = "success" if results else "empty"
+        except Exception as e:
+            print(f"{name} Search Error: {e}")
+            results = []
+            outcome = "error"
+        record_provider("search", name, outcome, time.perf_counter() - start)
+        logger.debug(f"[Search] {name} answered in {(time.perf_counter() - start) * 1000:.0f} ms with {len(results)} results")
+        return name, results
+
+    def _hedged_search(self, query):
+        """
+        Starts backends one after another, each hedge_delay after the previous one or as soon as
+        it comes back empty. Returns (providers, results) from the first non-empty answer, merged
+        with any other answers that had already arrived.
+        """
+        backends = self._backends()
+        pending, answers = {}, []
+        started = 0
+        give_up_at = time.monotonic() + self.deadline
+
+        while started < len(backends) or pending:
+            if started < len(backends) and (not pending or not answers):
+                name, func = backends[started]
+                pending[self._executor.submit(self._run_backend, name, func, query)] = started
+                started += 1
+
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                break
+            timeout = min(self.hedge_delay, remaining) if started < len(backends) else remaining
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                order = pending.pop(future)
+                name, results = future.result()
                 if results:
-                    return self._format_results("DuckDuckGo", results)
-            except Exception as e:
-                print(f"DuckDuckGo Search Error: {e}")
+                    answers.append((order, name, results))
+            if answers:
+                break
+
+        if not answers:
+            return [], []
+        answers.sort()
+        return [name for _, name, _ in answers], [r for _, _, results in answers for r in results]
+
+    def _dedupe(self, results):
+        seen, unique = set(), []
+        for res in results:
+            key = url_key(res.get('link') or res.get('url') or res.get('href'))
+            if key and key in seen:
+                continue
+            seen.add(key)
+            unique.append(res)
+        return unique
 
-        return "I couldn't find any search results for that query."
+    def _load(self, query):
+        names, results = self._hedged_search(query)
+        if not results:
+            raise UpstreamError(NO_RESULTS)
+        provider = " + ".join(dict.fromkeys(names))
+        unique = []
+        for res in self._dedupe(results)[:self.max_results]:
+            unique.append({
+                "title": res.get('title') or res.get('snippet', 'No Title'),
+                "link": res.get('link') or res.get('url') or res.get('href', '#'),
+                "snippet": res.get('snippet') or res.get('content') or res.get('body', ''),
+            })
+        return provider, unique
+
+    def search_results(self, query):
+        """(provider, [{"title", "link", "snippet"}]) for a query; raises UpstreamError when nothing is found."""
+        key = normalize_query(query)
+        if not key:
+            raise UpstreamError(NO_RESULTS)
+        return self.cache.get_or_load(key, lambda: self._load(query))
+
+    def search(self, query):
+        """Unified hedged search across every configured backend, cached per normalized query."""
+        try:
+            provider, results = self.search_results(query)
+            return self._format_results(provider, results)
+        except UpstreamError as e:
+            return str(e)
+        except Exception as e:
+            print(f"Search Error: {e}")
+            return NO_RESULTS
 
     def _format_results(self, provider, results):
         formatted = f"### Search Results ({provider})\n\n"
-        for i, res in enumerate(results[:5], 1):
-            title = res.get('title') or res.get('snippet', 'No Title')
-            link = res.get('link') or res.get('url', '#')
-            snippet = res.get('snippet') or res.get('content', '')
-            formatted += f"{i}. **[{title}]({link})**\n   {snippet}\n\n"
+        for i, res in enumerate(results[:self.max_results], 1):
+            formatted += f"{i}. **[{res['title']}]({res['link']})**\n   {res['snippet']}\n\n"
         return formatted
 
 search_client = SearchEngineClient()
@@ -14,6 +14,26 @@ document.addEventListener('DOMContentLoaded', () => {
     const filePreviewContainer = document.getElementById('file-preview-container');
     let attachedFile = null;
 
+    // Uploads a file to the server-side blob store and resolves to its handle.
+    // Falls back to null so callers can still send the inline data URL.
+    async function uploadAttachment(file) {
+        try {
+            // Uploads are limited to signed-in users; guests fall through to the inline data URL
+            const user = JSON.parse(localStorage.getItem('user') || 'null');
+            if (!user || !user.email) return null;
+            const formData = new FormData();
+            formData.append('file', file);
+            formData.append('email', user.email);
+            const response = await fetch('/upload', { method: 'POST', body: formData });
+            if (!response.ok) return null;
+            const data = await response.json();
+            return data.handle || null;
+        } catch (err) {
+            console.warn('Attachment upload failed, sending inline instead', err);
+            return null;
+        }
+    }
+
     // Track system state
     let lastInputWasVoice = false;
     let isGenerating = false;
@@ -799,13 +819,14 @@ document.addEventListener('DOMContentLoaded', () => {
 
         try {
             const user = JSON.parse(localStorage.getItem('user'));
+            const handle = attachedFile && attachedFile.upload ? await attachedFile.upload : null;
             const payload = {
                 prompt: prompt,
                 email: user ? user.email : 'guest',
                 file: attachedFile ? {
                     name: attachedFile.name,
                     type: attachedFile.type,
-                    data: attachedFile.data
+                    data: handle || attachedFile.data
                 } : null
             };
 
@@ -961,7 +982,9 @@ document.addEventListener('DOMContentLoaded', () => {
                     name: file.name,
                     type: file.type,
                     data: event.target.result,
-                    isText: !isImage
+                    isText: !isImage,
+                    // Images go to the blob store in the background; the handle replaces the base64 body
+                    upload: isImage ? uploadAttachment(file) : null
                 };
 
                 // Show compact icon-only preview
@@ -1079,11 +1102,12 @@ document.addEventListener('DOMContentLoaded', () => {
         enhanceBtn.disabled = true;
 
         try {
+            const handle = attachedFile.upload ? await attachedFile.upload : null;
             const response = await fetch('/enhance_image', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
-                    image: attachedFile.data,
+                    image: handle || attachedFile.data,
                     target_width: 2048,
                     target_height: 2048
                 })
@@ -1094,6 +1118,7 @@ document.addEventListener('DOMContentLoaded', () => {
             if (data.success && data.enhanced_image) {
                 // Update attached file and preview
                 attachedFile.data = data.enhanced_image;
+                attachedFile.upload = data.handle ? Promise.resolve(data.handle) : null;
                 const img = filePreviewContainer.querySelector('img');
                 if (img) img.src = data.enhanced_image;
 
@@ -2114,11 +2139,13 @@ document.addEventListener('DOMContentLoaded', () => {
     const paymentScreenshotInput = document.getElementById('payment-screenshot');
     const screenshotPreview = document.getElementById('screenshot-preview');
     let paymentScreenshotData = null;
+    let paymentScreenshotUpload = null;
 
     if (paymentScreenshotInput) {
         paymentScreenshotInput.addEventListener('change', (e) => {
             const file = e.target.files[0];
             if (file && file.type.startsWith('image/')) {
+                paymentScreenshotUpload = uploadAttachment(file);
                 const reader = new FileReader();
                 reader.onload = (event) => {
                     paymentScreenshotData = event.target.result;
@@ -2174,6 +2201,7 @@ document.addEventListener('DOMContentLoaded', () => {
             proMessage.className = 'auth-message';
 
             try {
+                const screenshotHandle = paymentScreenshotUpload ? await paymentScreenshotUpload : null;
                 const response = await fetch('/submit_payment', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
@@ -2181,7 +2209,7 @@ document.addEventListener('DOMContentLoaded', () => {
                         name: name,
                         phone: phone,
                         email: email,
-                        screenshot: paymentScreenshotData,
+                        screenshot: screenshotHandle || paymentScreenshotData,
                         amount: '₹90',
                         timestamp: new Date().toISOString()
                     })
@@ -2200,6 +2228,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     paymentScreenshotInput.value = '';
                     screenshotPreview.style.display = 'none';
                     paymentScreenshotData = null;
+                    paymentScreenshotUpload = null;
 
                     // Close modal after 3 seconds
                     setTimeout(() => {
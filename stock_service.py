@@ -1,60 +1,191 @@
 import requests
 import os
+import time
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from ttl_cache import TTLCache, UpstreamError
+
+
+class TokenBucket:
+    """
+    Token bucket with a FIFO wait queue and an optional daily cap.
+    Callers block in arrival order until a token is free, or give up after max_wait seconds.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, daily_limit=0):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity or rate_per_minute)
+        self.daily_limit = daily_limit
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.used_today = 0
+        self.day = datetime.now(timezone.utc).date()
+        # Set when the upstream reports the daily quota spent before our own count does; cleared at the daily reset
+        self.day_blocked_until = None
+        self._waiters = deque()
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        today = datetime.now(timezone.utc).date()
+        if today != self.day:
+            self.day, self.used_today = today, 0
+        if self.day_blocked_until is not None and datetime.now(timezone.utc) >= self.day_blocked_until:
+            self.day_blocked_until = None
+
+    def daily_exhausted(self):
+        if self.day_blocked_until is not None:
+            return True
+        return bool(self.daily_limit) and self.used_today >= self.daily_limit
+
+    def acquire(self, max_wait=20.0):
+        """Takes one token, waiting in line for up to max_wait seconds. Returns False if none could be had in time."""
+        me = object()
+        deadline = time.monotonic() + max_wait
+        with self._cond:
+            self._waiters.append(me)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self.daily_exhausted():
+                        return False
+                    if self._waiters[0] is me:
+                        if now >= self.blocked_until and self.tokens >= 1:
+                            self.tokens -= 1
+                            self.used_today += 1
+                            return True
+                        wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate, 0.01)
+                        # No point queueing if the next token arrives after we would give up
+                        if now + wait > deadline:
+                            return False
+                    else:
+                        wait = deadline - now
+                        if wait <= 0:
+                            return False
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(me)
+                self._cond.notify_all()
+
+    def penalize(self, seconds):
+        """Empties the bucket and blocks it for a while after the upstream reported throttling."""
+        with self._cond:
+            self.tokens = 0.0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def exhaust_day(self):
+        """Refuses tokens until the next daily reset (midnight UTC), leaving the configured limit alone."""
+        with self._cond:
+            midnight = datetime.combine(datetime.now(timezone.utc).date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+            self.day_blocked_until = midnight
+            self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "tokens": round(self.tokens, 2),
+                "queued": len(self._waiters),
+                "blocked_for": max(0.0, round(self.blocked_until - time.monotonic(), 1)),
+                "used_today": self.used_today,
+                "daily_limit": self.daily_limit,
+                "day_blocked_until": self.day_blocked_until.isoformat() if self.day_blocked_until else None,
+            }
+
 
 class StockService:
-    def __init__(self, api_key):
+    def __init__(self, api_key, timeout=10):
         self.api_key = api_key
         self.base_url = "https://www.alphavantage.co/query"
+        self.timeout = timeout
+        # Alpha Vantage's free tier allows 25 requests a day, so quotes are held for a few minutes
+        self.quote_cache = TTLCache("stock", ttl=300)
+        self.news_cache = TTLCache("market-news", ttl=900)
+        # Every call on this key goes through one bucket, so concurrent users cannot trip the per-minute limit
+        self.bucket = TokenBucket(
+            int(os.getenv("ALPHA_VANTAGE_RATE_PER_MIN", "5")),
+            daily_limit=int(os.getenv("ALPHA_VANTAGE_DAILY_LIMIT", "25")),
+        )
+        self.max_wait = float(os.getenv("ALPHA_VANTAGE_MAX_WAIT", "20"))
+
+    def _query(self, parameters):
+        """Runs one Alpha Vantage call through the token bucket and raises UpstreamError on throttle responses."""
+        if not self.bucket.acquire(self.max_wait):
+            if self.bucket.daily_exhausted():
+                raise UpstreamError("⚠️ The daily stock data quota has been used up. Please try again tomorrow.")
+            raise UpstreamError("⚠️ Stock data is busy right now. Please try again in a minute.")
+
+        response = requests.get(self.base_url, params=dict(parameters, apikey=self.api_key), timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+
+        # Throttled calls still return 200, with the explanation in "Note" or "Information"
+        notice = data.get("Note") or data.get("Information")
+        if notice:
+            print(f"Alpha Vantage throttled: {notice}")
+            if "per day" in notice.lower() or "daily" in notice.lower():
+                self.bucket.exhaust_day()
+                raise UpstreamError("⚠️ The daily stock data quota has been used up. Please try again tomorrow.")
+            self.bucket.penalize(60)
+            raise UpstreamError("⚠️ Stock data is busy right now. Please try again in a minute.")
+        return data
 
     def get_stock_price(self, symbol):
         """Fetches the latest price for a given stock symbol (e.g., AAPL, TSLA)."""
         if not self.api_key:
             return "Alpha Vantage API key not configured."
 
-        parameters = {
-            "function": "GLOBAL_QUOTE",
-            "symbol": symbol.upper(),
-            "apikey": self.api_key
-        }
-
         try:
-            response = requests.get(self.base_url, params=parameters)
-            response.raise_for_status()
-            data = response.json()
-            
-            if "Global Quote" in data and data["Global Quote"]:
-                quote = data["Global Quote"]
-                price = float(quote["05. price"])
-                change_percent = quote["10. change percent"]
-                return f"The current price of {symbol.upper()} is ${price:,.2f} ({change_percent})."
-            else:
-                return f"Sorry, I couldn't find stock data for {symbol.upper()}. Please check the symbol."
+            return self.quote_cache.get_or_load(symbol.upper(), lambda: self._fetch_stock_price(symbol.upper()))
+        except UpstreamError as e:
+            return str(e)
         except Exception as e:
             print(f"Error fetching stock price: {e}")
             return f"Error fetching stock data for {symbol.upper()}."
 
+    def _fetch_stock_price(self, symbol):
+        data = self._query({
+            "function": "GLOBAL_QUOTE",
+            "symbol": symbol,
+        })
+
+        if "Global Quote" in data and data["Global Quote"]:
+            quote = data["Global Quote"]
+            price = float(quote["05. price"])
+            change_percent = quote["10. change percent"]
+            return f"The current price of {symbol} is ${price:,.2f} ({change_percent})."
+        else:
+            raise UpstreamError(f"Sorry, I couldn't find stock data for {symbol}. Please check the symbol.")
+
     def get_market_news(self, symbol=None):
         """Fetches market news, optionally filtered by symbol."""
+        key = symbol.upper() if symbol else ""
+        try:
+            return self.news_cache.get_or_load(key, lambda: self._fetch_market_news(key))
+        except UpstreamError as e:
+            return str(e)
+        except Exception as e:
+            print(f"Error fetching market news: {e}")
+            return "Error fetching market news."
+
+    def _fetch_market_news(self, symbol):
         parameters = {
             "function": "NEWS_SENTIMENT",
-            "apikey": self.api_key
         }
         if symbol:
-            parameters["tickers"] = symbol.upper()
+            parameters["tickers"] = symbol
 
-        try:
-            response = requests.get(self.base_url, params=parameters)
-            response.raise_for_status()
-            data = response.json()
-            
-            if "feed" in data:
-                articles = data["feed"][:3]
-                news_text = "Latest Stock Market News:\n"
-                for article in articles:
-                    news_text += f"- {article['title']} ({article['source']})\n"
-                return news_text
-            else:
-                return "No recent market news found."
-        except Exception as e:
-            print(f"Error fetching market news: {e}")
-            return "Error fetching market news."
+        data = self._query(parameters)
+
+        if "feed" in data:
+            articles = data["feed"][:3]
+            news_text = "Latest Stock Market News:\n"
+            for article in articles:
+                news_text += f"- {article['title']} ({article['source']})\n"
+            return news_text
+        else:
+            raise UpstreamError("No recent market news found.")
@@ -0,0 +1,169 @@
+"""
+GlobleXGPT Text Pipeline
+The pure-CPU text steps of /ask: keyword intent detection, image/video prompt cleaning, and
+the cleanup of model output that leaks JSON around the answer. They run on every request and
+do no I/O, so benchmarks/bench_cpu_paths.py can time them against stored baselines.
+"""
+
+import re
+import json
+
+# Direct-answer commands in the order ask() checks them; the first match wins
+COMMAND_RULES = [
+    ("screenshot", ("screenshot",)),
+    ("camera", ("camera", "photo")),
+    ("open", ("open",)),
+    ("weather", ("weather",)),
+    ("news", ("news",)),
+    # Ahead of crypto_price, which would otherwise claim "stock price of apple" and "price for MSFT shares"
+    ("stock", ("stock", "share price", "shares")),
+    ("crypto_price", ("price of", "price for")),
+    ("crypto", ("crypto", "cryptocurrency")),
+    ("youtube", ("youtube",)),
+    ("my_name", ("what is my name",)),
+    ("wikipedia", ("wikipedia", "wekippidea", "wekipedia", "weikedia")),
+    ("nasa", ("nasa", "space", "astronomy", "apod", "galaxy", "planet")),
+    ("qr", ("generate qr code", "genrate qr code", "create qr code", "make qr code", "qr code for")),
+]
+
+IMAGE_TRIGGERS = ("generate", "genraitve", "genrate", "create", "make", "paint", "draw", "render", "show me",
+                  "enrate", "genrrate", "generrate", "design", "imagine", "visualize")
+IMAGE_KEYWORDS = ("image", "picture", "photo", "art", "illustration", "portrait", "landscape", "sketch", "drawing",
+                  "painting", "wallpaper", "avatar", "masterpiece", "cyber", "icon", "graphic")
+IMPLICIT_IMAGE_KEYWORDS = ("image", "picture", "photo", "art", "illustration", "sketch", "painting", "visual")
+IMPLICIT_IMAGE_ACTIONS = ("me", "give", "want", "need", "could you")
+
+VIDEO_TRIGGERS = ("generate", "create", "make", "animate", "render", "show me", "genrate", "enrate", "genrrate", "generrate")
+VIDEO_HINTS = ("video", "clip", "movie", "animation", "motion")
+VIDEO_ACTIONS = ("me", "give", "want", "need", "animate")
+VIDEO_KEYWORDS = ("video", "clip", "movie", "animate", "animation", "motion")
+
+# Expanded keywords for cleaning, including typos
+IMAGE_PROMPT_WORDS = re.compile(r'\b(' + '|'.join([
+    "generate", "genraitve", "genrate", "create", "make", "paint", "draw", "render", "show", "me", "an", "a", "of",
+    "image", "picture", "photo", "art", "illustration", "portrait", "landscape", "sketch", "drawing", "painting",
+    "wallpaper", "avatar", "enrate", "genrrate", "generrate", "logo", "design", "imagine", "visualize", "could",
+    "you", "please", "give", "want"]) + r')\b')
+VIDEO_PROMPT_WORDS = re.compile(r'\b(' + '|'.join([
+    "generate", "create", "make", "animate", "render", "show", "me", "a", "an", "of", "video", "clip", "movie",
+    "animation", "motion", "enrate", "genrate", "genrrate", "generrate"]) + r')\b')
+QR_PREFIX = re.compile(r'(?i)\b(generate|genrate|create|make|show|give|want|need)\b\s+(a\s+|an\s+)?qr\s+code\s+(for\s+|of\s+|with\s+|to\s+)?')
+
+# Common AI-generated JSON prefixes
+RESPONSE_PREFIXES = [re.compile(p, re.IGNORECASE) for p in (
+    r'^\{"final":\s*\{"response":\s*"',
+    r'^\{"response":\s*"',
+    r'^AI:\s*',
+    r'^Response:\s*',
+)]
+# Trailing JSON garbage (handles cases like: " , "emotion": "Happy" }} )
+RESPONSE_GARBAGE = [re.compile(p, re.DOTALL) for p in (
+    # Trailing blocks like: )>```json { "response": "...", "emotion": "..." } ```
+    r'\s*\)?\s*>?\s*```json\s*\{.*\}\s*```\s*$',
+    # Trailing blocks without backticks: )> { "response": "...", ... }
+    r'\s*\)?\s*>?\s*\{\s*"response"\s*:\s*".*\}\s*$',
+    r'[,]?\s*"?\s*emotion\s*"?\s*:\s*"[^"]*"\s*\}*$',
+    r'[,]?\s*"?\s*response\s*"?\s*:\s*"[^"]*"\s*\}*$',
+    r'"\s*,\s*"[^"]*"\s*:\s*"[^"]*"\s*\}*$',
+    r'"\s*\}\s*$',
+    r'\}\s*$',
+)]
+
+
+def detect_command(text):
+    """The direct-answer command a prompt asks for (see COMMAND_RULES), or None."""
+    lowered = text.lower()
+    for intent, keywords in COMMAND_RULES:
+        if any(kw in lowered for kw in keywords):
+            return intent
+    return None
+
+
+def image_request_kind(text):
+    """'logo', 'explicit' or 'implicit' for image generation requests, else None."""
+    lowered = text.lower()
+    if "logo" in lowered:
+        return "logo"
+    if any(t in lowered for t in IMAGE_TRIGGERS) and any(k in lowered for k in IMAGE_KEYWORDS):
+        return "explicit"
+    if any(k in lowered for k in IMPLICIT_IMAGE_KEYWORDS) and any(a in lowered for a in IMPLICIT_IMAGE_ACTIONS):
+        return "implicit"
+    return None
+
+
+def is_video_request(text):
+    lowered = text.lower()
+    return (any(t in lowered for t in VIDEO_TRIGGERS) or
+            (any(h in lowered for h in VIDEO_HINTS) and any(a in lowered for a in VIDEO_ACTIONS))) and \
+        any(k in lowered for k in VIDEO_KEYWORDS)
+
+
+def clean_image_prompt(text):
+    return IMAGE_PROMPT_WORDS.sub('', text.lower()).strip()
+
+
+def clean_video_prompt(text):
+    return VIDEO_PROMPT_WORDS.sub('', text.lower()).strip()
+
+
+def extract_qr_content(text):
+    """The URL or text to encode from a 'generate a qr code for ...' prompt."""
+    return QR_PREFIX.sub('', text).strip().strip(': ').strip()
+
+
+def clean_model_response(raw_response):
+    """
+    Strips the JSON wrappers and fragments that models leak around their answer
+    ({"response": ...}, trailing "emotion" keys, ```json blocks) and returns the plain text.
+    """
+    raw_response = raw_response.strip()
+
+    # 1. Check for standard JSON structures first
+    if (raw_response.startswith("{") or raw_response.startswith('```json\n{')) and '"' in raw_response:
+        try:
+            temp_resp = raw_response
+            if temp_resp.startswith('```json'):
+                temp_resp = temp_resp.replace('```json', '').replace('```', '').strip()
+
+            cleaned_data = json.loads(temp_resp)
+            if isinstance(cleaned_data, dict):
+                if "final" in cleaned_data:
+                    inner = cleaned_data["final"]
+                    if isinstance(inner, dict):
+                        raw_response = inner.get("response", str(inner))
+                    else:
+                        raw_response = str(inner)
+                elif "response" in cleaned_data:
+                    raw_response = cleaned_data.get("response", raw_response)
+        except Exception:
+            pass
+
+    # 2. Aggressive regex-based stripping of common failure patterns (leaked JSON fragments)
+    for pattern in RESPONSE_PREFIXES:
+        raw_response = pattern.sub('', raw_response)
+    for pattern in RESPONSE_GARBAGE:
+        raw_response = pattern.sub('', raw_response).strip()
+
+    # Final cleanup: if we're left with a leading or trailing quote that was part of the JSON, remove it
+    if raw_response.startswith('"') and raw_response.endswith('"') and len(raw_response) > 1:
+        raw_response = raw_response[1:-1]
+    elif raw_response.startswith('"'):
+        raw_response = raw_response[1:]
+    elif raw_response.endswith('"'):
+        raw_response = raw_response[:-1]
+
+    # Remove any standing { or } at the very start or end
+    raw_response = raw_response.strip()
+    while raw_response.startswith('{') or raw_response.endswith('}'):
+        if raw_response.startswith('{'): raw_response = raw_response[1:].strip()
+        if raw_response.endswith('}'): raw_response = raw_response[:-1].strip()
+        if not raw_response: break
+
+    # Additional cleanup for escaped characters if they were left raw
+    raw_response = raw_response.replace('\\n', '\n').replace('\\"', '"').replace('\\t', '\t')
+    raw_response = raw_response.strip()
+
+    # If after all cleaning we have nothing, provide a generic success message
+    if not raw_response:
+        raw_response = "I have processed your request successfully."
+    return raw_response
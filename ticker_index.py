@@ -0,0 +1,150 @@
+"""
+GlobleXGPT Ticker Index
+Resolves company names, aliases and ticker symbols mentioned in free text to stock symbols,
+offline, from the bundled data/tickers.tsv. Lookups are bisect searches over sorted arrays.
+"""
+
+import os
+import re
+import logging
+import threading
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TICKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tickers.tsv")
+
+# Legal-form words dropped so "Apple Inc." and "apple" produce the same key
+NAME_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited", "plc", "holdings",
+    "holding", "group", "the", "class", "a", "b", "c", "n.v", "s.a", "se", "a/s", "trust", "and",
+}
+
+# Lowercase words that are also tickers; they only count as symbols when typed in capitals
+SYMBOL_STOPWORDS = {
+    "a", "all", "an", "and", "are", "at", "be", "by", "c", "can", "de", "do", "f", "for", "ge", "go",
+    "has", "hd", "how", "in", "is", "it", "key", "low", "ma", "me", "ms", "my", "net", "now", "of", "on",
+    "or", "price", "see", "share", "shares", "so", "stock", "stocks", "t", "the", "to", "today", "us",
+    "v", "well", "what", "whats", "tell", "show", "give", "quote", "value", "current",
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9&][a-z0-9&.'/\-]*")
+
+
+def _tokens(text):
+    return [t.rstrip(".'").replace("'s", "") for t in TOKEN_RE.findall(text.lower())]
+
+
+def _key(text):
+    return " ".join(_tokens(text))
+
+
+class TickerIndex:
+    def __init__(self, path=None):
+        self.path = path or os.getenv("TICKER_INDEX_PATH", DEFAULT_TICKER_PATH)
+        self._symbols = []
+        self._name_keys = []
+        self._name_symbols = []
+        self._max_words = 1
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Reads the ticker file once into sorted parallel arrays."""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            symbols, names = set(), {}
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if not line.strip() or line.startswith("#"):
+                            continue
+                        parts = line.rstrip("\n").split("\t")
+                        symbol, name = parts[0].strip().upper(), parts[1] if len(parts) > 1 else ""
+                        aliases = parts[2].split(",") if len(parts) > 2 else []
+                        symbols.add(symbol)
+                        full = _key(name)
+                        short = " ".join(t for t in full.split() if t not in NAME_SUFFIXES)
+                        for key in [full, short] + [_key(a) for a in aliases]:
+                            # First listing wins, so the primary share class keeps the plain company name
+                            if key and key not in names:
+                                names[key] = symbol
+            except OSError as e:
+                logger.error(f"Could not load ticker index from {self.path}: {e}")
+
+            pairs = sorted(names.items())
+            self._symbols = sorted(symbols)
+            self._name_keys = [k for k, _ in pairs]
+            self._name_symbols = [s for _, s in pairs]
+            self._max_words = max((len(k.split()) for k in self._name_keys), default=1)
+            self._loaded = True
+            logger.info(f"[Stocks] Ticker index loaded: {len(self._symbols)} symbols, {len(self._name_keys)} names")
+
+    def is_symbol(self, symbol):
+        self._load()
+        symbol = symbol.upper()
+        i = bisect_left(self._symbols, symbol)
+        return i < len(self._symbols) and self._symbols[i] == symbol
+
+    def lookup_name(self, name):
+        """Exact company name or alias lookup (any case, legal suffixes optional). Returns a symbol or None."""
+        self._load()
+        key = _key(name)
+        for candidate in (key, " ".join(t for t in key.split() if t not in NAME_SUFFIXES)):
+            i = bisect_left(self._name_keys, candidate)
+            if candidate and i < len(self._name_keys) and self._name_keys[i] == candidate:
+                return self._name_symbols[i]
+        return None
+
+    def _prefix_match(self, word):
+        """The first name starting with word as a whole word, e.g. "berkshire" -> "berkshire hathaway"."""
+        i = bisect_left(self._name_keys, word + " ")
+        if i < len(self._name_keys) and self._name_keys[i].startswith(word + " "):
+            return self._name_symbols[i]
+        return None
+
+    def find_symbols(self, text):
+        """
+        Returns every stock symbol mentioned in text, in order.
+        Names and aliases match in any case (longest first); tickers match when typed in capitals
+        or when they are not ordinary words.
+        """
+        self._load()
+        raw = re.findall(r"[A-Za-z0-9&][A-Za-z0-9&.'/\-]*", text)
+        tokens = [t.rstrip(".'?!,").replace("'s", "") for t in raw]
+        lowered = [t.lower() for t in tokens]
+        found, i = [], 0
+        while i < len(tokens):
+            match = None
+            for n in range(min(self._max_words, len(tokens) - i), 0, -1):
+                key = " ".join(lowered[i:i + n])
+                if n == 1 and key in SYMBOL_STOPWORDS:
+                    continue
+                j = bisect_left(self._name_keys, key)
+                if j < len(self._name_keys) and self._name_keys[j] == key:
+                    match = (self._name_symbols[j], n)
+                    break
+            if not match and self.is_symbol(tokens[i]) and (tokens[i].isupper() or lowered[i] not in SYMBOL_STOPWORDS):
+                match = (tokens[i].upper(), 1)
+            if not match and len(lowered[i]) >= 4 and lowered[i] not in SYMBOL_STOPWORDS:
+                symbol = self._prefix_match(lowered[i])
+                if symbol:
+                    match = (symbol, 1)
+            if match:
+                if match[0] not in found:
+                    found.append(match[0])
+                i += match[1]
+            else:
+                i += 1
+        return found
+
+    @staticmethod
+    def looks_like_symbol(word):
+        """True for ticker-shaped words (1-5 letters, optional exchange suffix) that are not common words."""
+        return bool(re.fullmatch(r"[A-Za-z]{1,5}(\.[A-Za-z]{1,4})?", word)) and word.lower() not in SYMBOL_STOPWORDS
+
+
+ticker_index = TickerIndex()
@@ -0,0 +1,133 @@
+"""
+GlobleXGPT Request Tracing
+Lightweight per-request spans for attributing latency to a stage (PRO lookup, intent routing,
+each AI tier, response cleanup, ...). Spans are kept on flask.g, so they cost a few
+perf_counter() calls and list appends per request and need no locking.
+
+The breakdown is returned in a Server-Timing header (visible in the browser's network panel),
+and requests slower than TRACE_SLOW_REQUEST_MS are logged as one JSON line.
+Outside a request every function here is a no-op.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+# 0 disables slow-request logging
+SLOW_REQUEST_MS = float(os.getenv("TRACE_SLOW_REQUEST_MS", "5000"))
+
+TOKEN_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class Span:
+    __slots__ = ("name", "start", "end")
+
+    def __init__(self, name, start):
+        self.name = name
+        self.start = start
+        self.end = None
+
+
+class Trace:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = []
+        self._open = {}
+
+    def begin(self, name):
+        span = Span(name, time.perf_counter())
+        self.spans.append(span)
+        self._open[name] = span
+        return span
+
+    def end(self, name):
+        span = self._open.pop(name, None)
+        if span is not None:
+            span.end = time.perf_counter()
+
+    def finish(self):
+        """Closes spans left open by an early return and returns the total duration in ms."""
+        now = time.perf_counter()
+        for span in self._open.values():
+            span.end = now
+        self._open.clear()
+        return (now - self.start) * 1000
+
+    def server_timing(self, total_ms):
+        entries = []
+        for span in self.spans:
+            token = TOKEN_RE.sub("-", span.name).strip("-").lower() or "span"
+            entry = f"{token};dur={(span.end - span.start) * 1000:.1f}"
+            if token != span.name:
+                entry += ';desc="' + span.name.replace('"', "'") + '"'
+            entries.append(entry)
+        entries.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self, total_ms):
+        return {
+            "total_ms": round(total_ms, 1),
+            "spans": [{
+                "name": s.name,
+                "offset_ms": round((s.start - self.start) * 1000, 1),
+                "duration_ms": round((s.end - s.start) * 1000, 1),
+            } for s in self.spans],
+        }
+
+
+def current():
+    return g.get("trace") if has_request_context() else None
+
+
+def start_trace():
+    g.trace = Trace()
+
+
+def begin(name):
+    """Opens a span that ends with end(name), or when the request finishes."""
+    trace = current()
+    if trace is not None:
+        trace.begin(name)
+
+
+def end(name):
+    trace = current()
+    if trace is not None:
+        trace.end(name)
+
+
+@contextmanager
+def span(name):
+    trace = current()
+    if trace is None:
+        yield
+        return
+    trace.begin(name)
+    try:
+        yield
+    finally:
+        trace.end(name)
+
+
+def finish_trace(response):
+    """Adds the Server-Timing header and logs the trace of slow requests."""
+    trace = current()
+    if trace is None:
+        return response
+    g.trace = None
+    total_ms = trace.finish()
+    if SERVER_TIMING_ENABLED:
+        response.headers["Server-Timing"] = trace.server_timing(total_ms)
+    if SLOW_REQUEST_MS and total_ms >= SLOW_REQUEST_MS:
+        record = dict(event="slow_request", method=request.method,
+                      route=request.url_rule.rule if request.url_rule else request.path,
+                      status=response.status_code, **trace.to_dict(total_ms))
+        logger.warning(json.dumps(record))
+    return response
@@ -0,0 +1,193 @@
+"""
+GlobleXGPT TTL Cache
+Shared in-process cache for upstream data services (weather, news, crypto, stocks).
+- Fresh entries are served directly.
+- Stale entries (within the stale window) are served immediately while a single
+  background thread refreshes them (stale-while-revalidate).
+- Failures are cached for a short negative TTL so a broken upstream is not hammered.
+- Concurrent misses for the same key share one upstream call.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class UpstreamError(Exception):
+    """An upstream failure whose message is safe to show to the user."""
+
+
+class _Entry:
+    __slots__ = ("value", "error", "stored_at", "ttl")
+
+    def __init__(self, value, error, ttl):
+        self.value = value
+        self.error = error
+        self.stored_at = time.monotonic()
+        self.ttl = ttl
+
+
+class _Flight:
+    __slots__ = ("event", "entry")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.entry = None
+
+
+class TTLCache:
+    def __init__(self, name, ttl, stale_ttl=None, negative_ttl=None, max_entries=1024):
+        """
+        name: used for env overrides (<NAME>_CACHE_TTL) and stats
+        ttl: seconds an entry is fresh
+        stale_ttl: extra seconds a stale entry may be served while it refreshes (default: ttl)
+        negative_ttl: seconds a failure is remembered (default: min(30, ttl))
+        """
+        env_prefix = name.upper().replace("-", "_")
+        self.name = name
+        self.ttl = float(os.getenv(f"{env_prefix}_CACHE_TTL", ttl))
+        self.stale_ttl = float(stale_ttl if stale_ttl is not None else self.ttl)
+        self.negative_ttl = float(negative_ttl if negative_ttl is not None else min(30.0, self.ttl))
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "negative_hits": 0, "refreshes": 0, "errors": 0}
+
+        with _registry_lock:
+            _registry[name] = self
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load(self, key, loader):
+        """Calls the loader and converts its outcome into a cache entry."""
+        try:
+            return _Entry(loader(), None, self.ttl)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"[Cache] {self.name} load failed for {key!r}: {e}")
+            return _Entry(None, e, self.negative_ttl)
+
+    def _refresh(self, key, loader):
+        try:
+            entry = self._load(key, loader)
+            # Keep serving the old value if the refresh failed and it is still within its stale window
+            if entry.error is None:
+                self._store(key, entry)
+                self.stats["refreshes"] += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    @staticmethod
+    def _resolve(entry):
+        if entry.error is not None:
+            raise entry.error
+        return entry.value
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the cached value for key, loading it with loader() when needed.
+        Exceptions raised by loader are cached for negative_ttl and re-raised to every caller.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.stored_at
+                if age < entry.ttl:
+                    self._entries.move_to_end(key)
+                    self.stats["negative_hits" if entry.error is not None else "hits"] += 1
+                    return self._resolve(entry)
+                if entry.error is None and age < entry.ttl + self.stale_ttl:
+                    self.stats["stale_hits"] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(target=self._refresh, args=(key, loader), daemon=True,
+                                         name=f"cache-refresh-{self.name}").start()
+                    return entry.value
+
+            self.stats["misses"] += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+
+        if not leader:
+            # Another request is already fetching this key; share its result
+            flight.event.wait()
+            return self._resolve(flight.entry)
+
+        try:
+            flight.entry = self._load(key, loader)
+            self._store(key, flight.entry)
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+        return self._resolve(flight.entry)
+
+    def get_fresh(self, key, record=True):
+        """Returns the value only if it is within its TTL, without loading; counts as a hit or miss unless record=False."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.error is None and time.monotonic() - entry.stored_at < entry.ttl:
+                if record:
+                    self.stats["hits"] += 1
+                return entry.value
+            if record:
+                self.stats["misses"] += 1
+        return None
+
+    def peek(self, key):
+        """Returns the cached value (fresh or stale) without loading, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry.error is not None:
+            return None
+        return entry.value
+
+    def set(self, key, value):
+        self._store(key, _Entry(value, None, self.ttl))
+
+    def refresh(self, key, loader):
+        """Loads key now and stores the result; a failure is raised and leaves the old entry in place."""
+        value = loader()
+        self.set(key, value)
+        self.stats["refreshes"] += 1
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def snapshot(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"] + self.stats["negative_hits"]
+        served = self.stats["hits"] + self.stats["stale_hits"] + self.stats["negative_hits"]
+        return dict(self.stats, name=self.name, size=size, ttl=self.ttl,
+                    hit_rate=round(served / lookups, 4) if lookups else 0.0)
+
+
+def all_caches():
+    """Every TTLCache created in this process, by name."""
+    with _registry_lock:
+        return dict(_registry)
@@ -1,12 +1,15 @@
 import requests
 import time
 import os
+from rate_limit import check_rate_limit
 
 class VeoClient:
-    def __init__(self, api_key, model=None):
+    def __init__(self, api_key, model=None, base_url=None, key_pool=None):
         self.api_key = api_key
+        self.key_pool = key_pool
         self.model = model or "veo3"
-        self.base_url = "https://veo3api.com"
+        self.base_url = base_url or os.getenv("VEO_BASE_URL", "https://veo3api.com")
+        self.poll_interval = float(os.getenv("VEO_POLL_INTERVAL", "10"))
 
     def generate_video(self, prompt, image_url=None):
         """
@@ -33,6 +36,7 @@ class VeoClient:
             endpoint = f"{self.base_url}/generate"
             
             response = requests.post(endpoint, headers=headers, json=payload, timeout=30)
+            check_rate_limit(response, self.key_pool, self.api_key, "Veo")
             
             if response.status_code >= 400:
                 err_msg = f"Veo API Error {response.status_code}: {response.text[:200]}"
@@ -62,12 +66,12 @@ class VeoClient:
                     if status_response.status_code >= 400: 
                         print(f"Veo Poll Error: {status_response.status_code}")
                         retries += 1
-                        time.sleep(10)
+                        time.sleep(self.poll_interval)
                         continue
                 except Exception as e:
                     print(f"Veo Poll Exception: {e}")
                     retries += 1
-                    time.sleep(10)
+                    time.sleep(self.poll_interval)
                     continue
 
                 status_data = status_response.json()
@@ -103,7 +107,7 @@ class VeoClient:
                     raise Exception(f"Veo Task {task_id} failed: {err_detail}")
                 
                 retries += 1
-                time.sleep(10)
+                time.sleep(self.poll_interval)
             
             raise Exception(f"Veo generation timed out for task {task_id}")
 
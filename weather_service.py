@@ -1,43 +1,62 @@
 import requests
 import os
+from ttl_cache import TTLCache, UpstreamError
+from city_gazetteer import city_gazetteer, City, normalize
 
 class WeatherService:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, timeout=10):
         self.api_key = (api_key or os.getenv("OPENWEATHER_API_KEY", "")).strip()
-        self.base_url = "https://api.openweathermap.org/data/2.5/weather"
+        self.base_url = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5/weather")
+        self.timeout = timeout
+        # Current conditions change slowly; 10 minutes matches OpenWeather's own update interval
+        self.cache = TTLCache("weather", ttl=600)
 
     def get_weather(self, city):
+        """city: a gazetteer City (queried by OpenWeather id) or a free-text city name."""
         if not self.api_key or self.api_key == "YOUR_OPENWEATHER_API_KEY":
             return "Weather API key is not configured. Please add your OpenWeather API key to the .env file."
         
+        if isinstance(city, str):
+            city = city_gazetteer.lookup(city) or city
+        # Ids give every spelling of a known city the same cache entry
+        key = f"id:{city.id}" if isinstance(city, City) else f"q:{normalize(city)}"
         try:
-            params = {
-                "q": city,
-                "appid": self.api_key,
-                "units": "metric"
-            }
-            response = requests.get(self.base_url, params=params)
-            data = response.json()
-            
-            if response.status_code == 200:
-                main = data["main"]
-                temp = main["temp"]
-                feels_like = main["feels_like"]
-                temp_min = main["temp_min"]
-                temp_max = main["temp_max"]
-                desc = data["weather"][0]["description"].capitalize()
-                humidity = main["humidity"]
-                wind_speed = data["wind"]["speed"]
-                
-                return (f"--- 🌍 Weather Details for {data['name']} ---\n"
-                        f"🌡️ **Temperature**: {temp}°C (Feels like {feels_like}°C)\n"
-                        f"🔼 **High/Low**: {temp_max}°C / {temp_min}°C\n"
-                        f"☁️ **Condition**: {desc}\n"
-                        f"💧 **Humidity**: {humidity}%\n"
-                        f"💨 **Wind Speed**: {wind_speed} m/s")
-            elif response.status_code == 401:
-                return f"⚠️ **Weather API Error**: Your OpenWeather API key is invalid or not yet active. If you just created it, it can take up to 2 hours to activate. Please verify your key in the .env file."
-            else:
-                return f"Could not get weather for {city}. Error: {data.get('message', 'Unknown error')}"
+            return self.cache.get_or_load(key, lambda: self._fetch_weather(city))
+        except UpstreamError as e:
+            return str(e)
         except Exception as e:
             return f"Error fetching weather: {str(e)}"
+
+    def _fetch_weather(self, city):
+        params = {
+            "appid": self.api_key,
+            "units": "metric"
+        }
+        if isinstance(city, City):
+            params["id"] = city.id
+            city = city.name
+        else:
+            params["q"] = city
+        response = requests.get(self.base_url, params=params, timeout=self.timeout)
+        data = response.json()
+
+        if response.status_code == 200:
+            main = data["main"]
+            temp = main["temp"]
+            feels_like = main["feels_like"]
+            temp_min = main["temp_min"]
+            temp_max = main["temp_max"]
+            desc = data["weather"][0]["description"].capitalize()
+            humidity = main["humidity"]
+            wind_speed = data["wind"]["speed"]
+            
+            return (f"--- 🌍 Weather Details for {data['name']} ---\n"
+                    f"🌡️ **Temperature**: {temp}°C (Feels like {feels_like}°C)\n"
+                    f"🔼 **High/Low**: {temp_max}°C / {temp_min}°C\n"
+                    f"☁️ **Condition**: {desc}\n"
+                    f"💧 **Humidity**: {humidity}%\n"
+                    f"💨 **Wind Speed**: {wind_speed} m/s")
+        elif response.status_code == 401:
+            raise UpstreamError(f"⚠️ **Weather API Error**: Your OpenWeather API key is invalid or not yet active. If you just created it, it can take up to 2 hours to activate. Please verify your key in the .env file.")
+        else:
+            raise UpstreamError(f"Could not get weather for {city}. Error: {data.get('message', 'Unknown error')}")
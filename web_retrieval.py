@@ -0,0 +1,338 @@
+"""
+GlobleXGPT Web Retrieval
+Optional stage after web search: fetches the top result pages concurrently, extracts their
+main text, ranks passages against the question with a small in-memory BM25 index and returns
+the best ones that fit a token budget. Pages are cached on disk so a popular result is only
+downloaded once per WEB_PAGE_CACHE_TTL; expired pages are deleted and the cache is kept under
+WEB_PAGE_CACHE_MAX_MB.
+
+app.py only runs it when WEB_RETRIEVAL_ENABLED=true.
+"""
+
+import os
+import re
+import json
+import math
+import time
+import hashlib
+import logging
+import threading
+import requests
+from html.parser import HTMLParser
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+# Use /tmp on Vercel since the root is read-only
+if os.environ.get('VERCEL'):
+    DEFAULT_PAGE_CACHE_DIR = "/tmp/pages"
+else:
+    DEFAULT_PAGE_CACHE_DIR = os.path.join("cache", "pages")
+
+# Elements whose text is never main content
+SKIP_TAGS = {"script", "style", "noscript", "svg", "nav", "header", "footer", "aside", "form", "button", "iframe", "template"}
+BLOCK_TAGS = {"p", "div", "li", "h1", "h2", "h3", "h4", "h5", "h6", "td", "th", "pre", "blockquote", "section", "article", "br", "tr", "dd", "dt"}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "how", "i", "in", "is",
+    "it", "its", "me", "of", "on", "or", "that", "the", "this", "to", "was", "were", "what", "when",
+    "where", "which", "who", "why", "will", "with", "you", "your", "about", "search", "find", "look", "up",
+    "tell", "please", "information",
+}
+
+USER_AGENT = "Mozilla/5.0 (compatible; GlobleXGPT/1.0; +https://globlexgpt.vercel.app)"
+
+CHARSET_RE = re.compile(r"charset\s*=\s*[\"']?\s*([A-Za-z0-9._:-]+)", re.IGNORECASE)
+META_CHARSET_RE = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([A-Za-z0-9._:-]+)", re.IGNORECASE)
+
+
+def decode_html(body, content_type=""):
+    """
+    Decodes a page with the charset from the Content-Type header, else from <meta charset>, else
+    as UTF-8 when it is valid UTF-8, else as windows-1252 like browsers do. (requests assumes
+    ISO-8859-1 for text/html without a charset, which garbles UTF-8 pages.)
+    """
+    candidates = []
+    match = CHARSET_RE.search(content_type or "")
+    if match:
+        candidates.append(match.group(1))
+    match = META_CHARSET_RE.search(body[:4096])
+    if match:
+        candidates.append(match.group(1).decode("ascii"))
+    for encoding in candidates:
+        try:
+            return body.decode(encoding, errors="replace")
+        except LookupError:
+            continue
+    try:
+        return body.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        # A body cut at max_page_bytes can end inside a multi-byte character
+        if e.start >= len(body) - 3:
+            return body[:e.start].decode("utf-8-sig", errors="replace")
+        # Byte-based statistical detection misreads short Western pages, so use the browsers' default
+        return body.decode("cp1252", errors="replace")
+
+
+def tokenize(text):
+    return [t for t in re.findall(r"\w+", text.lower()) if t not in STOPWORDS]
+
+
+class TextExtractor(HTMLParser):
+    """Collects visible text in block-sized chunks, skipping scripts, navigation and boilerplate."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.blocks = []
+        self._current = []
+        self._skip_depth = 0
+        self._in_title = False
+
+    def _flush(self):
+        text = " ".join("".join(self._current).split())
+        if text:
+            self.blocks.append(text)
+        self._current = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skip_depth:
+            self._current.append(data)
+
+    def text(self):
+        self._flush()
+        # Short fragments are menus, bylines and buttons rather than content
+        return "\n".join(b for b in self.blocks if len(b.split()) >= 6)
+
+
+def extract_text(html):
+    """(title, main text) of an HTML page."""
+    parser = TextExtractor()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception as e:
+        logger.debug(f"[Retrieval] HTML parse stopped early: {e}")
+    return " ".join(parser.title.split()), parser.text()
+
+
+class BM25:
+    """Okapi BM25 over a small list of passages, built per question."""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = [Counter(tokenize(d)) for d in documents]
+        self.lengths = [sum(d.values()) for d in self.docs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+        df = Counter()
+        for doc in self.docs:
+            df.update(doc.keys())
+        n = len(self.docs)
+        self.idf = {term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()}
+
+    def scores(self, query):
+        terms = set(tokenize(query))
+        results = []
+        for doc, length in zip(self.docs, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+            for term in terms:
+                tf = doc.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+
+class WebRetriever:
+    def __init__(self):
+        self.max_pages = int(os.getenv("WEB_RETRIEVAL_PAGES", "3"))
+        self.token_budget = int(os.getenv("WEB_RETRIEVAL_TOKEN_BUDGET", "1200"))
+        self.page_timeout = float(os.getenv("WEB_RETRIEVAL_PAGE_TIMEOUT", "4"))
+        self.deadline = float(os.getenv("WEB_RETRIEVAL_DEADLINE", "6"))
+        self.max_page_bytes = int(os.getenv("WEB_RETRIEVAL_MAX_PAGE_BYTES", str(2 * 1024 * 1024)))
+        self.passage_words = 120
+        self.cache_dir = os.getenv("WEB_PAGE_CACHE_DIR", DEFAULT_PAGE_CACHE_DIR)
+        self.cache_ttl = int(os.getenv("WEB_PAGE_CACHE_TTL", "86400"))
+        self.max_cache_bytes = int(os.getenv("WEB_PAGE_CACHE_MAX_MB", "64")) * 1024 * 1024
+        # The directory is pruned on the first write and then every prune_every writes
+        self.prune_every = 50
+        self._writes = 0
+        self._prune_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=int(os.getenv("WEB_RETRIEVAL_WORKERS", "4")),
+                                            thread_name_prefix="retrieval")
+
+    def _cache_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _read_cache(self, url):
+        try:
+            path = self._cache_path(url)
+            if time.time() - os.path.getmtime(path) > self.cache_ttl:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, url, page):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._cache_path(url)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(page, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not cache page {url}: {e}")
+            return
+        with self._prune_lock:
+            due = self._writes % self.prune_every == 0
+            self._writes += 1
+        if due:
+            self._prune_cache()
+
+    def _prune_cache(self):
+        """Deletes expired pages, then the oldest ones until the cache fits max_cache_bytes."""
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.time()
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(path)
+                    if now - st.st_mtime > self.cache_ttl:
+                        os.remove(path)
+                        continue
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+            entries.sort()
+            while total > self.max_cache_bytes and entries:
+                _, size, path = entries.pop(0)
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+        except Exception as e:
+            logger.error(f"Page cache prune failed: {e}")
+        finally:
+            self._prune_lock.release()
+
+    def fetch_page(self, url):
+        """{"url", "title", "text"} for an HTML page, from the disk cache when fresh. None on failure."""
+        page = self._read_cache(url)
+        if page is not None:
+            return page
+        try:
+            # (connect, read) timeouts; the read timeout applies between chunks, the size cap bounds the rest
+            with requests.get(url, headers={"User-Agent": USER_AGENT, "Accept": "text/html"},
+                              timeout=(min(3.0, self.page_timeout), self.page_timeout), stream=True) as resp:
+                if resp.status_code != 200 or "html" not in resp.headers.get("Content-Type", "html"):
+                    return None
+                body = b""
+                for chunk in resp.iter_content(64 * 1024):
+                    body += chunk
+                    if len(body) >= self.max_page_bytes:
+                        break
+                html = decode_html(body, resp.headers.get("Content-Type", ""))
+        except Exception as e:
+            logger.info(f"[Retrieval] Fetch failed for {url}: {e}")
+            return None
+
+        title, text = extract_text(html)
+        page = {"url": url, "title": title, "text": text}
+        # Empty pages are cached too, so a script-only page is not re-downloaded every time
+        self._write_cache(url, page)
+        return page
+
+    def _passages(self, page):
+        """Splits page text into ~passage_words windows that overlap by a quarter."""
+        words = page["text"].split()
+        step = max(1, self.passage_words * 3 // 4)
+        for start in range(0, max(len(words) - self.passage_words // 4, 1), step):
+            chunk = words[start:start + self.passage_words]
+            if len(chunk) >= 12:
+                yield " ".join(chunk)
+
+    def fetch_pages(self, urls):
+        """Fetches pages concurrently; pages still downloading at the deadline are left out."""
+        futures = {self._executor.submit(self.fetch_page, url): url for url in urls}
+        done, not_done = wait(futures, timeout=self.deadline)
+        if not_done:
+            logger.info(f"[Retrieval] {len(not_done)} page(s) missed the {self.deadline}s deadline")
+        pages = {}
+        for future in done:
+            page = future.result()
+            if page and page.get("text"):
+                pages[futures[future]] = page
+        # Keep search-result order
+        return [pages[url] for url in urls if url in pages]
+
+    def retrieve(self, query, results):
+        """
+        Best passages for query from the pages behind search results, formatted as context
+        within the token budget. Returns "" when nothing useful could be fetched.
+        """
+        urls = [r["link"] for r in results if r.get("link", "").startswith("http")][:self.max_pages]
+        if not urls:
+            return ""
+        start = time.perf_counter()
+        pages = self.fetch_pages(urls)
+
+        candidates = [(page, passage) for page in pages for passage in self._passages(page)]
+        if not candidates:
+            return ""
+        scores = BM25([p for _, p in candidates]).scores(query)
+        ranked = sorted(zip(scores, range(len(candidates))), key=lambda x: (-x[0], x[1]))
+
+        # ~4 characters per token is close enough for budgeting English text
+        budget_chars = self.token_budget * 4
+        picked, used = [], 0
+        for score, i in ranked:
+            if score <= 0:
+                break
+            page, passage = candidates[i]
+            if used + len(passage) > budget_chars:
+                continue
+            picked.append((page, passage))
+            used += len(passage)
+
+        logger.info(f"[Retrieval] {len(pages)}/{len(urls)} pages, {len(picked)} passages in {(time.perf_counter() - start) * 1000:.0f} ms")
+        if not picked:
+            return ""
+        return "\n\n".join(f"[{p['title'] or p['url']}]({p['url']}):\n{passage}" for p, passage in picked)
+
+
+web_retriever = WebRetriever()
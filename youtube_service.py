@@ -1,68 +1,148 @@
-from googleapiclient.discovery import build
 import os
+import re
+import json
+import threading
+from datetime import datetime, timezone
+from ttl_cache import TTLCache
+
+# Units charged against the daily YouTube Data API quota per call
+# (https://developers.google.com/youtube/v3/determine_quota_cost)
+QUOTA_COST = {"search.list": 100, "videos.list": 1}
+
 
 class YouTubeService:
     def __init__(self, api_key):
         self.api_key = api_key
-        if api_key:
-            self.youtube = build('youtube', 'v3', developerKey=api_key)
-        else:
-            self.youtube = None
+        # Built on first use; building parses the discovery document, which is slow on cold starts
+        self._youtube = None
+        self._build_lock = threading.Lock()
+        self.discovery_doc = os.getenv("YOUTUBE_DISCOVERY_DOC")
+
+        self.search_cache = TTLCache("youtube-search", ttl=21600)
+        # The trending chart is the same for every user in a region and only reshuffles a few times a day
+        self.trending_cache = TTLCache("youtube-trending", ttl=7200)
+
+        self.daily_quota = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+        self.quota_day = datetime.now(timezone.utc).date()
+        self.quota_used = 0
+        self.calls = {name: 0 for name in QUOTA_COST}
+        self._quota_lock = threading.Lock()
+
+    @property
+    def youtube(self):
+        """The API client, built from the discovery document bundled with google-api-python-client (no network fetch)."""
+        if self._youtube is None and self.api_key:
+            with self._build_lock:
+                if self._youtube is None:
+                    from googleapiclient.discovery import build, build_from_document
+                    if self.discovery_doc:
+                        with open(self.discovery_doc, "r", encoding="utf-8") as f:
+                            self._youtube = build_from_document(json.load(f), developerKey=self.api_key)
+                    else:
+                        self._youtube = build('youtube', 'v3', developerKey=self.api_key,
+                                              static_discovery=True, cache_discovery=False)
+        return self._youtube
+
+    def _charge(self, method):
+        """Counts a call against the daily quota (resets at midnight UTC, like Google's); refuses once it is spent."""
+        with self._quota_lock:
+            today = datetime.now(timezone.utc).date()
+            if today != self.quota_day:
+                self.quota_day, self.quota_used = today, 0
+            cost = QUOTA_COST[method]
+            if self.quota_used + cost > self.daily_quota:
+                raise RuntimeError("quotaExceeded: daily YouTube quota used up")
+            self.quota_used += cost
+            self.calls[method] += 1
+
+    def quota_status(self):
+        with self._quota_lock:
+            return {
+                "day": self.quota_day.isoformat(),
+                "units_used": self.quota_used,
+                "daily_quota": self.daily_quota,
+                "calls": dict(self.calls),
+                "search_cache": self.search_cache.snapshot(),
+                "trending_cache": self.trending_cache.snapshot(),
+            }
+
+    @staticmethod
+    def normalize_query(query):
+        return " ".join(re.findall(r"\w+", query.lower()))
+
+    def _error_message(self, error_str, default_prefix):
+        if "quotaexceeded" in error_str.lower().replace(" ", ""):
+            with self._quota_lock:
+                self.quota_used = max(self.quota_used, self.daily_quota)
+            return "⚠️ The YouTube search quota for today has been used up. Please try again tomorrow."
+        return f"{default_prefix}: {error_str}"
 
     def search_videos(self, query, max_results=5):
-        if not self.youtube:
+        if not self.api_key:
             return "YouTube API key not configured."
-        
+
         try:
-            request = self.youtube.search().list(
-                q=query,
-                part='snippet',
-                type='video',
-                maxResults=max_results
-            )
-            response = request.execute()
-            
-            videos = []
-            for item in response.get('items', []):
-                title = item['snippet']['title']
-                video_id = item['id']['videoId']
-                video_url = f"https://www.youtube.com/watch?v={video_id}"
-                videos.append(f"- **{title}**\n  [Watch on YouTube]({video_url})")
-            
-            if not videos:
-                return "No videos found for that search."
-                
-            return "\n\n".join(videos)
-            
+            key = (self.normalize_query(query), max_results)
+            return self.search_cache.get_or_load(key, lambda: self._fetch_search(query, max_results))
         except Exception as e:
             error_str = str(e)
             if "referer" in error_str.lower() or "blocked" in error_str.lower():
                 return "⚠️ **YouTube API Restriction Error**: Your API key has 'Website Restrictions' enabled in Google Cloud Console. \n\n**To fix this:**\n1. Go to [Google Cloud Credentials](https://console.cloud.google.com/apis/credentials).\n2. Edit your YouTube API Key.\n3. Under 'Application restrictions', set it to **'None'** for local testing.\n4. Save and try again."
-            return f"Error searching YouTube: {error_str}"
+            return self._error_message(error_str, "Error searching YouTube")
+
+    def _fetch_search(self, query, max_results):
+        self._charge("search.list")
+        request = self.youtube.search().list(
+            q=query,
+            part='snippet',
+            type='video',
+            maxResults=max_results
+        )
+        response = request.execute()
+
+        videos = []
+        for item in response.get('items', []):
+            title = item['snippet']['title']
+            video_id = item['id']['videoId']
+            video_url = f"https://www.youtube.com/watch?v={video_id}"
+            videos.append(f"- **{title}**\n  [Watch on YouTube]({video_url})")
+
+        if not videos:
+            return "No videos found for that search."
+
+        return "\n\n".join(videos)
 
     def get_trending_videos(self, region_code='US', max_results=5):
-        if not self.youtube:
+        if not self.api_key:
             return "YouTube API key not configured."
-            
+
         try:
-            request = self.youtube.videos().list(
-                part='snippet,contentDetails,statistics',
-                chart='mostPopular',
-                regionCode=region_code,
-                maxResults=max_results
-            )
-            response = request.execute()
-            
-            videos = []
-            for item in response.get('items', []):
-                title = item['snippet']['title']
-                video_id = item['id']
-                video_url = f"https://www.youtube.com/watch?v={video_id}"
-                videos.append(f"- **{title}**\n  [Watch on YouTube]({video_url})")
-                
-            return "\n\n".join(videos)
+            return self.trending_cache.get_or_load((region_code.upper(), max_results), lambda: self._fetch_trending(region_code.upper(), max_results))
         except Exception as e:
             error_str = str(e)
             if "referer" in error_str.lower() or "blocked" in error_str.lower():
                 return "⚠️ **YouTube API Restriction Error**: Your API Key is restricted. Please go to your Google Cloud Console and set 'Application restrictions' to **'None'** for testing."
-            return f"Error getting trending videos: {error_str}"
+            return self._error_message(error_str, "Error getting trending videos")
+
+    def refresh_trending(self, region_code='US', max_results=5):
+        """Fetches the trending chart into the cache ahead of user requests. Raises on failure."""
+        return self.trending_cache.refresh((region_code.upper(), max_results), lambda: self._fetch_trending(region_code.upper(), max_results))
+
+    def _fetch_trending(self, region_code, max_results):
+        self._charge("videos.list")
+        request = self.youtube.videos().list(
+            part='snippet,contentDetails,statistics',
+            chart='mostPopular',
+            regionCode=region_code,
+            maxResults=max_results
+        )
+        response = request.execute()
+
+        videos = []
+        for item in response.get('items', []):
+            title = item['snippet']['title']
+            video_id = item['id']
+            video_url = f"https://www.youtube.com/watch?v={video_id}"
+            videos.append(f"- **{title}**\n  [Watch on YouTube]({video_url})")
+
+        return "\n\n".join(videos)